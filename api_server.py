@@ -0,0 +1,491 @@
+"""
+Render API: HTTP محلي (stdlib، من غير Streamlit ولا أي cloud) لإرسال jobs تصدير من أنظمة تانية.
+
+    python api_server.py [--host 127.0.0.1] [--port 8765] [--concurrency 2] [--max-queue 16] [--token SECRET]
+                         [--max-upload MB]
+
+Endpoints (JSON):
+  POST   /uploads?name=clip.mp4    رفع ملف (الـ body كله، أو Transfer-Encoding: chunked) → {"id", "size", "complete"}
+  PUT    /uploads/<id>             رفع على أجزاء: Content-Range: bytes <start>-<end>/<total> (بالترتيب؛
+                                   start لازم = الحجم الحالي وإلا 409 ومعاه الحجم عشان العميل يكمل منه)
+  GET    /uploads/<id>             الحجم اللي وصل لحد دلوقتي (استكمال بعد انقطاع)
+  POST   /jobs                     {"upload": id, "actions": [...] | "template": "اسم", "formats": ["mp4"],
+                                    "music_upload": id} → 202 {"id"}؛ أوامر غلط = 422 قبل أي decode
+  GET    /jobs | /jobs/<id>        الحالة (progress / ETA / fps) + روابط التحميل
+  DELETE /jobs/<id>                إلغاء
+  GET    /jobs/<id>/output/<fmt>   تحميل الناتج (Range: bytes=... → 206، للاستكمال والـ seeking)
+  GET    /health
+
+- الـ jobs بتتنفذ بـ RenderService (apply_edit_actions + export_video / parallel_render، بنفس التقدم والإلغاء):
+  --concurrency = عدد التصديرات الشغالة في نفس الوقت على الجهاز ده (encoder_profile بيوزع الأنوية عليهم)،
+  و--max-queue = أقصى شغال + مستني؛ بعده 429 + Retry-After (backpressure للعميل بدل طابور مالوش آخر).
+- الرفع بيتكتب streaming في temp_manager (kind "upload") فبيخضع لنفس الـ quota والـ LRU، وبحد أقصى
+  --max-upload (أكبر = 413). الرفع بيفضل محجوز (owner "upload:<id>") لحد ما الـ jobs اللي بتستخدمه تخلص،
+  وبعدها بيتساب للـ LRU ويتشال من الـ API؛ ورفع ما اتستخدمش في أي job بيتشال بعد UPLOAD_TTL.
+- الافتراضي 127.0.0.1؛ --token = Authorization: Bearer مطلوب مع كل طلب.
+  مسارات محلية ("path" بدل "upload") مقفولة إلا بـ --allow-paths.
+"""
+import argparse
+import hmac
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from utils import action_schema, render_service, temp_manager, template_plans
+
+CHUNK = 1024 * 1024
+RETRY_AFTER = 5
+JOB_TTL = 24 * 3600  # jobs خلصت من أكتر من كده بتتشال من الذاكرة (والنواتج بتفضل في OUTPUT_DIR)
+UPLOAD_TTL = 6 * 3600  # رفع من غير أي job من آخر استخدام بيتمسح
+RELEASE_GRACE = 60  # بعد آخر job ما تخلص: مهلة لطلب بيستخدم نفس الرفع في نفس اللحظة
+MAX_UPLOAD = 2 * 1024 ** 3
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+# ==================== Uploads ====================
+
+class Uploads:
+    """ملفات مرفوعة (في الذاكرة: id → metadata؛ المحتوى في temp_manager)."""
+
+    def __init__(self, max_size: int = MAX_UPLOAD, ttl: float = UPLOAD_TTL):
+        self.items: Dict[str, Dict] = {}
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def create(self, name: str) -> Dict:
+        upload_id = uuid.uuid4().hex[:12]
+        suffix = os.path.splitext(os.path.basename(name or ""))[1].lower()[:8]
+        path = temp_manager.new_path("upload", suffix, owner=f"upload:{upload_id}")
+        open(path, "wb").close()
+        item = {'id': upload_id, 'name': name, 'path': path, 'size': 0, 'total': None,
+                'complete': False, 'lock': threading.Lock(), 'jobs': set(), 'touched': time.time()}
+        with self._lock:
+            self.items[upload_id] = item
+        return item
+
+    def get(self, upload_id: str) -> Dict:
+        item = self.items.get(upload_id)
+        if item is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Upload not found: {upload_id}")
+        return item
+
+    def path(self, upload_id: str) -> str:
+        item = self.get(upload_id)
+        if not item['complete']:
+            raise ApiError(HTTPStatus.CONFLICT, f"Upload incomplete: {upload_id}", size=item['size'])
+        item['touched'] = time.time()
+        return item['path']
+
+    def attach(self, upload_id: str, job_id: str):
+        """الرفع محجوز لحد ما الـ job دي تخلص."""
+        item = self.items.get(upload_id)
+        if item is not None:
+            item['jobs'].add(job_id)
+            item['touched'] = time.time()
+
+    def check_size(self, size: Optional[int]):
+        if size is not None and size > self.max_size:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Upload too large", max_size=self.max_size)
+
+    def write(self, item: Dict, chunks: Iterator[bytes], start: int, total: Optional[int], final: bool = False):
+        """
+        كتابة جزء عند start (لازم = الحجم الحالي). total = الحجم الكلي لو معروف،
+        وfinal = الجزء ده آخر الملف (body كامل من غير Content-Range).
+        لو الملف عدى max_size الجزء ده بيتلغي (الحجم يرجع start) و413.
+        """
+        self.check_size(total)
+        with item['lock']:
+            if item['complete']:
+                raise ApiError(HTTPStatus.CONFLICT, "Upload already complete", size=item['size'])
+            if start != item['size']:
+                raise ApiError(HTTPStatus.CONFLICT, "Unexpected offset", size=item['size'])
+            item['touched'] = time.time()
+            with open(item['path'], "r+b") as f:
+                f.seek(start)
+                for chunk in chunks:
+                    if f.tell() + len(chunk) > self.max_size:
+                        f.truncate(start)
+                        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Upload too large",
+                                       max_size=self.max_size)
+                    f.write(chunk)
+                item['size'] = f.tell()
+            item['total'] = item['size'] if final else total
+            item['complete'] = item['total'] is not None and item['size'] >= item['total']
+            item['touched'] = time.time()
+        if item['complete']:
+            temp_manager.register(item['path'], "upload")  # الحجم الحقيقي للـ quota
+
+    def prune(self, service: render_service.RenderService):
+        """
+        رفع كل الـ jobs بتاعته خلصت (أو اتشالت) → owner بيتساب والملف للـ LRU؛
+        رفع من غير jobs من أكتر من ttl → بيتمسح (ناقص أو ما اتستخدمش).
+        """
+        now = time.time()
+        with self._lock:
+            for upload_id, item in list(self.items.items()):
+                if item['lock'].locked():
+                    continue  # بيتكتب دلوقتي
+                if item['jobs']:
+                    jobs = [service.get(job_id) for job_id in item['jobs']]
+                    expired = (all(job is None or job.status in render_service.FINISHED for job in jobs)
+                               and now - item['touched'] > RELEASE_GRACE)
+                else:
+                    expired = now - item['touched'] > self.ttl
+                if not expired:
+                    continue
+                del self.items[upload_id]
+                if item['jobs']:
+                    temp_manager.release_owner(f"upload:{upload_id}")
+                else:
+                    temp_manager.remove(item['path'])
+
+    @staticmethod
+    def public(item: Dict) -> Dict:
+        return {k: item[k] for k in ('id', 'name', 'size', 'total', 'complete')}
+
+# ==================== Handler ====================
+
+class RenderApiHandler(BaseHTTPRequestHandler):
+    server_version = "AIVideoRender/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # الـ server بيحط: service / uploads / max_queue / token / allow_paths
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write(f"{self.address_string()} {fmt % args}\n")
+
+    # ---------- IO ----------
+
+    def _send_json(self, status: HTTPStatus, payload, headers: Dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunked(self) -> bool:
+        return "chunked" in self.headers.get("Transfer-Encoding", "").lower()
+
+    def _content_length(self) -> Optional[int]:
+        """Content-Length كرقم (None لو مش موجود أو الـ body chunked)؛ قيمة غلط = 400."""
+        value = self.headers.get("Content-Length")
+        if value is None or self._chunked():
+            return None
+        if not value.strip().isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid Content-Length: {value}")
+        return int(value)
+
+    def _body(self) -> Iterator[bytes]:
+        """الـ body بالـ chunks: Content-Length أو Transfer-Encoding: chunked."""
+        if self._chunked():
+            while True:
+                line = self.rfile.readline(1024)
+                try:
+                    size = int(line.split(b";")[0].strip() or b"0", 16)
+                except ValueError:
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid chunk size")
+                if size < 0:
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid chunk size")
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    return
+                remaining = size
+                while remaining:
+                    data = self.rfile.read(min(CHUNK, remaining))
+                    if not data:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, "Truncated chunked body")
+                    remaining -= len(data)
+                    yield data
+                self.rfile.readline()
+        remaining = self._content_length() or 0
+        while remaining:
+            data = self.rfile.read(min(CHUNK, remaining))
+            if not data:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Truncated body")
+            remaining -= len(data)
+            yield data
+
+    def _json_body(self) -> Dict:
+        raw = b"".join(self._body())
+        try:
+            data = json.loads(raw or b"{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid JSON")
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+        return data
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        # مقارنة بوقت ثابت: الـ == بتقف عند أول حرف مختلف فالتوقيت بيسرّب الـ token
+        supplied = self.headers.get("Authorization", "").encode()
+        return hmac.compare_digest(supplied, f"Bearer {token}".encode())
+
+    # ---------- Dispatch ----------
+
+    ROUTES = (
+        ("POST", re.compile(r"/uploads"), "create_upload"),
+        ("PUT", re.compile(r"/uploads/(\w+)"), "append_upload"),
+        ("GET", re.compile(r"/uploads/(\w+)"), "upload_status"),
+        ("POST", re.compile(r"/jobs"), "submit_job"),
+        ("GET", re.compile(r"/jobs"), "list_jobs"),
+        ("GET", re.compile(r"/jobs/(\w+)"), "job_status"),
+        ("DELETE", re.compile(r"/jobs/(\w+)"), "cancel_job"),
+        ("GET", re.compile(r"/jobs/(\w+)/output/(\w+)"), "download"),
+        ("GET", re.compile(r"/health"), "health"),
+    )
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        self.query = parse_qs(url.query)
+        try:
+            if not self._authorized():
+                raise ApiError(HTTPStatus.UNAUTHORIZED, "Missing or invalid token")
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(url.path.rstrip("/") or "/")
+                if match and route_method == method:
+                    return getattr(self, name)(*match.groups())
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No route: {method} {url.path}")
+        except ApiError as e:
+            headers = {}
+            if e.status == HTTPStatus.TOO_MANY_REQUESTS:
+                headers["Retry-After"] = str(RETRY_AFTER)
+            elif e.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                headers["Content-Range"] = f"bytes */{e.extra['size']}"
+            self.close_connection = True  # ممكن يكون فيه body ما اتقراش
+            self._send_json(e.status, {'error': str(e), **e.extra}, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # ---------- Uploads ----------
+
+    def create_upload(self):
+        name = (self.query.get("name") or [""])[0]
+        uploads = self.server.uploads
+        length = self._content_length()
+        uploads.check_size(length)  # قبل ما نعمل ملف
+        self._prune()
+        item = uploads.create(name)
+        if length or self._chunked():
+            uploads.write(item, self._body(), 0, None, final=True)
+        self._send_json(HTTPStatus.CREATED, uploads.public(item))
+
+    def append_upload(self, upload_id: str):
+        uploads = self.server.uploads
+        item = uploads.get(upload_id)
+        length = self._content_length()
+        header = self.headers.get("Content-Range")
+        if header:
+            match = _CONTENT_RANGE.fullmatch(header.strip())
+            if not match:
+                raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid Content-Range: {header}")
+            # "/*" = الحجم الكلي لسه مش معروف: الرفع يفضل مفتوح لحد جزء بالحجم
+            total = None if match.group(3) == "*" else int(match.group(3))
+            start = int(match.group(1))
+            uploads.check_size(max(int(match.group(2)) + 1, start + (length or 0)))
+            uploads.write(item, self._body(), start, total)
+        else:
+            uploads.check_size(item['size'] + (length or 0))
+            uploads.write(item, self._body(), item['size'], None, final=True)
+        self._send_json(HTTPStatus.OK, uploads.public(item))
+
+    def upload_status(self, upload_id: str):
+        self._send_json(HTTPStatus.OK, Uploads.public(self.server.uploads.get(upload_id)))
+
+    # ---------- Jobs ----------
+
+    def _media(self, data: Dict, upload_key: str, path_key: str) -> Optional[str]:
+        if data.get(upload_key):
+            return self.server.uploads.path(data[upload_key])
+        if data.get(path_key):
+            if not self.server.allow_paths:
+                raise ApiError(HTTPStatus.FORBIDDEN, "Local paths are disabled (--allow-paths)")
+            if not os.path.isfile(data[path_key]):
+                raise ApiError(HTTPStatus.NOT_FOUND, f"File not found: {data[path_key]}")
+            return data[path_key]
+        return None
+
+    def _active_jobs(self) -> int:
+        return sum(job.status not in render_service.FINISHED for job in self.server.service.list_jobs())
+
+    def _prune(self):
+        service, now = self.server.service, time.time()
+        for job in service.list_jobs("api"):
+            if job.finished_at and now - job.finished_at > JOB_TTL:
+                service.forget(job.id)
+        self.server.uploads.prune(service)
+
+    def submit_job(self):
+        data = self._json_body()
+        self._prune()
+        if self._active_jobs() >= self.server.max_queue:
+            raise ApiError(HTTPStatus.TOO_MANY_REQUESTS, "Render queue is full")
+        video_path = self._media(data, "upload", "path")
+        if not video_path:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "upload (or path) is required")
+        music_path = self._media(data, "music_upload", "music_path")
+        if data.get("template"):
+            plan = template_plans.plan_for(data["template"])
+            if plan is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Template not found: {data['template']}")
+            actions = plan['actions']
+        else:
+            actions = data.get("actions") or []
+        formats = data.get("formats") or ["mp4"]
+        if not isinstance(formats, list) or any(f not in ("mp4", "webm", "gif") for f in formats):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Unsupported formats: {formats}")
+        try:
+            job_id = self.server.service.submit(video_path, actions, music_path, formats, owner="api")
+        except action_schema.ActionError as e:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e), index=e.index)
+        for key in ("upload", "music_upload"):
+            if data.get(key):
+                self.server.uploads.attach(data[key], job_id)
+        self._send_json(HTTPStatus.ACCEPTED, self._job_payload(job_id), {"Location": f"/jobs/{job_id}"})
+
+    def _job_payload(self, job_id: str) -> Dict:
+        snapshot = self.server.service.status(job_id)
+        if snapshot is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Job not found: {job_id}")
+        outputs = snapshot.pop('outputs')
+        snapshot['downloads'] = {fmt: f"/jobs/{job_id}/output/{fmt}" for fmt in outputs}
+        if snapshot['error']:
+            snapshot['error'] = snapshot['error'].split("\n", 1)[0]  # من غير الـ traceback
+        return snapshot
+
+    def list_jobs(self):
+        jobs = sorted(self.server.service.list_jobs("api"), key=lambda j: j.created_at)
+        self._send_json(HTTPStatus.OK, {'jobs': [self._job_payload(job.id) for job in jobs]})
+
+    def job_status(self, job_id: str):
+        self._send_json(HTTPStatus.OK, self._job_payload(job_id))
+
+    def cancel_job(self, job_id: str):
+        payload = self._job_payload(job_id)
+        payload['cancelled'] = self.server.service.cancel(job_id)
+        self._send_json(HTTPStatus.OK, payload)
+
+    # ---------- Download ----------
+
+    def _byte_range(self, size: int) -> Optional[Tuple[int, int]]:
+        """(start, end) شاملين من هيدر Range (range واحد)، أو None = الملف كله."""
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        match = _RANGE.fullmatch(header.strip())
+        if not match or not (match.group(1) or match.group(2)):
+            return None  # صيغة مش مدعومة (multi-range مثلاً) = الملف كله زي ما RFC 9110 بيسمح
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            start, end = max(0, size - int(match.group(2))), size - 1
+        if start >= size or start > end:
+            raise ApiError(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, "Range not satisfiable", size=size)
+        return start, end
+
+    def download(self, job_id: str, fmt: str):
+        job = self.server.service.get(job_id)
+        path = job.outputs.get(fmt) if job else None
+        if not path or not os.path.isfile(path):
+            raise ApiError(HTTPStatus.NOT_FOUND, f"No {fmt} output for job {job_id}")
+        size = os.path.getsize(path)
+        byte_range = self._byte_range(size)
+        start, end = byte_range or (0, size - 1)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(CHUNK, remaining))
+                if not data:
+                    break
+                self.wfile.write(data)
+                remaining -= len(data)
+
+    def health(self):
+        self._send_json(HTTPStatus.OK, {'status': 'ok', 'active_jobs': self._active_jobs(),
+                                        'max_queue': self.server.max_queue,
+                                        'concurrency': self.server.concurrency})
+
+# ==================== Server ====================
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, concurrency: int = None, max_queue: int = None,
+                token: str = None, allow_paths: bool = False, max_upload: int = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), RenderApiHandler)
+    server.daemon_threads = True
+    server.concurrency = concurrency or 2
+    server.service = render_service.RenderService(max_workers=server.concurrency)
+    server.uploads = Uploads(max_upload or MAX_UPLOAD)
+    server.max_queue = max_queue or server.concurrency * 8
+    server.token = token
+    server.allow_paths = allow_paths
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API محلي لتصدير الفيديوهات")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, help="عدد التصديرات المتزامنة على الجهاز ده (افتراضي 2)")
+    parser.add_argument("--max-queue", type=int, help="أقصى jobs شغالة + مستنية قبل 429")
+    parser.add_argument("--token", default=os.getenv("RENDER_API_TOKEN"), help="Bearer token (اختياري)")
+    parser.add_argument("--allow-paths", action="store_true", help="السماح بمسارات محلية بدل الرفع")
+    parser.add_argument("--max-upload", type=int, help=f"أقصى حجم للرفع بالـ MB (افتراضي {MAX_UPLOAD // 1024 ** 2})")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.concurrency, args.max_queue, args.token, args.allow_paths,
+                         args.max_upload * 1024 ** 2 if args.max_upload else None)
+    print(f"🎬 Render API on http://{args.host}:{args.port} | concurrency={server.concurrency} "
+          f"max_queue={server.max_queue}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
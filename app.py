@@ -1,20 +1,19 @@
 import os
 import sys
 import streamlit as st
-import tempfile
 import time
 import json
+import uuid
 from dotenv import load_dotenv
 
 
 
 
-from utils import (ui_utils, ai_engine, media_engine, command_cache, 
-                   preview_engine, session_manager, undo_redo, batch_processor, subtitle_engine)
+# الموديولات الخفيفة هنا؛ التقيلة (moviepy / pydantic) بتتحمل عند أول utils.<name> → الهيدر بيظهر قبلها
+import utils
+from utils import (ui_utils, command_cache, session_manager, undo_redo,
+                   app_cache, temp_manager, action_schema, template_plans)
 from utils.config import validate_dependencies, get_ffmpeg_path
-from moviepy.editor import VideoFileClip
-
-from audiorecorder import audiorecorder
 
 
 
@@ -77,54 +76,168 @@ if 'show_stats' not in st.session_state:
     st.session_state.show_stats = False
 if 'selected_formats' not in st.session_state:
     st.session_state.selected_formats = ['mp4']
+if 'profile_render' not in st.session_state:
+    st.session_state.profile_render = False
+if 'last_render_profile' not in st.session_state:
+    st.session_state.last_render_profile = None
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'render_jobs' not in st.session_state:
+    st.session_state.render_jobs = []
 
 # ============================================
 # 📦 HELPER FUNCTIONS
 # ============================================
 
+@st.cache_resource
+def get_render_service():
+    """Render Service واحد مشترك لكل الجلسات (التصدير في الخلفية)."""
+    return utils.render_service.RenderService()
+
 def execute_editing(video_path, actions, music_file=None, formats=None):
-    """تنفيذ التعديلات مع دعم تصدير متعدد الصيغ."""
-    err = media_engine.validate_actions(actions, video_path)
+    """إرسال التعديلات للتصدير في الخلفية (الواجهة تفضل شغالة أثناء التصدير)."""
+    err = action_schema.check(actions, video_path, app_cache.video_metadata(video_path))
     if err:
         st.error(f"⚠️ {err}")
         return
     
-    try:
-        with st.spinner("🚀 جاري المونتاج... قد يستغرق دقائق"):
-            clip = VideoFileClip(video_path)
-            final = media_engine.apply_edit_actions(clip, actions, music_file)
-            
-            if formats and len(formats) > 1:
-                results = media_engine.export_multiple_formats(final, formats)
-                st.success("✅ تم التصدير بعدة صيغ!")
-                for fmt, path in results.items():
-                    if path:
-                        col1, col2 = st.columns([3, 1])
-                        with col1:
-                            st.video(path)
-                        with col2:
-                            st.metric(f"📁 {fmt.upper()}", f"{os.path.getsize(path) / (1024*1024):.1f} MB")
-            else:
-                fmt = formats[0] if formats else "mp4"
-                out = media_engine.export_video(final, format=fmt)
-                st.video(out)
-                st.success(f"✅ تم التصدير بنجاح!")
-                st.caption(f"📁 الملف: {os.path.basename(out)}")
-            
-            # حفظ في Undo/Redo
-            st.session_state.undo_redo_manager.add_state(video_path, actions, music_file)
-            
-            # تنظيف الذاكرة
-            clip.close()
-            final.close()
-            st.session_state.ai_result = None
-            st.session_state.waiting_confirmation = False
-            st.balloons()
-            
-    except Exception as e:
-        st.error(f"❌ خطأ: {str(e)}")
-        import traceback
-        st.code(traceback.format_exc())
+    job_id = get_render_service().submit(
+        video_path, actions, music_file, formats or ["mp4"],
+        owner=st.session_state.session_id,
+        profile=st.session_state.profile_render
+    )
+    st.session_state.render_jobs.append({'id': job_id, 'video_path': video_path,
+                                         'actions': actions, 'music_file': music_file})
+    st.session_state.ai_result = None
+    st.session_state.waiting_confirmation = False
+    st.rerun()
+
+def submit_template_folder(name, folder, recursive=False):
+    """قالب على فولدر: job لكل فيديو في الـ Render Service بنفس الـ plan (الواجهة ما بتستناش)."""
+    plan = template_plans.plan_for(name)
+    videos = template_plans.find_videos(folder, recursive)
+    if plan is None or not videos:
+        st.warning("⚠️ مفيش فيديوهات في الفولدر" if plan else "⚠️ القالب غير موجود")
+        return
+    errors = []
+    for video_path in videos:
+        try:
+            job_id = get_render_service().submit(video_path, plan['actions'], st.session_state.music_path,
+                                                 owner=st.session_state.session_id, plan=plan)
+        except action_schema.ActionError as e:
+            errors.append(f"{os.path.basename(video_path)}: {e}")
+            continue
+        st.session_state.render_jobs.append({'id': job_id, 'video_path': video_path, 'actions': plan['actions'],
+                                             'music_file': st.session_state.music_path, 'batch': True})
+    if errors:
+        st.session_state.folder_errors = errors
+    st.rerun()
+
+def _show_job_result(job):
+    """عرض ملفات الـ job (فيديو + الحجم لكل صيغة)."""
+    for fmt, path in job.outputs.items():
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.video(path)
+        with col2:
+            st.metric(f"📁 {fmt.upper()}", f"{os.path.getsize(path) / (1024*1024):.1f} MB")
+            st.caption(os.path.basename(path))
+
+def _finish_job(entry, job):
+    """أول مرة الـ job يخلص: Undo/Redo + Profiling، ثم إعادة تشغيل الصفحة عشان الـ polling يقف."""
+    if job.status == "done" and not entry.get('batch'):  # فيديوهات فولدر القالب مش جزء من تاريخ الفيديو الحالي
+        manager = st.session_state.undo_redo_manager
+        if manager.matches_current(entry['actions']):
+            manager.attach_artifacts(outputs=dict(job.outputs))  # إعادة تصدير لحالة موجودة
+        else:
+            manager.add_state(entry['video_path'], entry['actions'], entry['music_file'], outputs=dict(job.outputs))
+        if st.session_state.ai_result is None:
+            st.session_state.ai_result = {'actions': entry['actions'], 'source': 'آخر تصدير'}
+        entry['celebrate'] = True
+        if job.profiler and job.outputs:
+            first = next(iter(job.outputs.values()))
+            st.session_state.last_render_profile = {
+                'rows': job.profiler.summary(),
+                'trace': job.profiler.save_trace(os.path.splitext(first)[0] + ".trace.json")
+            }
+    entry['finished'] = True
+    st.rerun()
+
+def _jobs_panel():
+    service = get_render_service()
+    for entry in list(st.session_state.render_jobs):
+        job = service.get(entry['id'])
+        if job is None:
+            st.session_state.render_jobs.remove(entry)
+            continue
+        
+        if job.status not in utils.render_service.FINISHED:
+            snap = job.snapshot()
+            col_bar, col_cancel = st.columns([5, 1])
+            with col_bar:
+                details = ui_utils.format_progress(job.last_event)
+                label = "⏳ في الانتظار..." if job.status == "queued" else f"🚀 {snap['format'].upper()} {details}"
+                if entry.get('batch'):
+                    label = f"{os.path.basename(entry['video_path'])} — {label}"
+                st.progress(snap['progress'], text=label)
+            with col_cancel:
+                if st.button("⛔ إلغاء", key=f"cancel_{job.id}"):
+                    service.cancel(job.id)
+            continue
+        
+        if not entry.get('finished'):
+            _finish_job(entry, job)
+        
+        if job.status == "done":
+            if entry.pop('celebrate', False):
+                st.balloons()
+            st.success("✅ تم التصدير بنجاح!")
+            _show_job_result(job)
+        elif job.status == "cancelled":
+            st.warning("⛔ تم إلغاء التصدير")
+        else:
+            st.error(f"❌ خطأ: {job.error.splitlines()[0]}")
+            st.code(job.error)
+        
+        if st.button("✖️ إخفاء", key=f"dismiss_{job.id}"):
+            service.forget(job.id)
+            st.session_state.render_jobs.remove(entry)
+            st.rerun()
+
+def render_jobs_panel():
+    """لوحة التصديرات: تتحدث كل ثانية (fragment) طول ما فيه تصدير شغال."""
+    if not st.session_state.render_jobs:
+        return
+    service = get_render_service()
+    jobs = [service.get(e['id']) for e in st.session_state.render_jobs]
+    active = any(job and job.status not in utils.render_service.FINISHED for job in jobs)
+    st.markdown("### 📤 التصدير")
+    st.fragment(_jobs_panel, run_every=1.0 if active else None)()
+
+def _restore_state(state):
+    """Undo/Redo: الـ actions + ملفات الحالة من الديسك (من غير إعادة تصدير لو لسه موجودة)."""
+    st.session_state.ai_result = {'actions': state['actions'], 'source': 'التاريخ (Undo/Redo)'}
+    st.session_state.waiting_confirmation = False
+    st.session_state.history_view = state
+    st.rerun()
+
+def _history_view(result):
+    """ناتج حالة التاريخ المعروضة (فوراً من الديسك)، أو إعادة تصدير لو الملفات اتمسحت."""
+    view = st.session_state.get('history_view')
+    if not view or view['actions'] != result['actions']:
+        return
+    if view['needs_render']:
+        st.warning("⚠️ ملفات الحالة دي مش موجودة (اتمسحت أو ما اتصدرتش)")
+        if st.button("🔁 إعادة التصدير", use_container_width=True):
+            execute_editing(view['video_path'], view['actions'], view['music_path'],
+                            view['formats'] or st.session_state.selected_formats)
+    else:
+        st.success("⚡ ناتج الحالة دي من الديسك (بدون إعادة تصدير)")
+        for fmt, path in view['outputs'].items():
+            st.video(path)
+            st.caption(f"{fmt.upper()} • {os.path.basename(path)}")
+    for path in view['previews']:
+        st.video(path)
 
 def render_header():
     """عرض الهيدر الفرعوني."""
@@ -147,7 +260,7 @@ with st.sidebar:
     
     # AI Status
     try:
-        ai_engine.configure_ai()
+        utils.ai_engine.configure_ai()
         st.success("✅ AI متصل")
     except:
         st.error("❌ خطأ في API")
@@ -159,7 +272,7 @@ with st.sidebar:
     # ========================================
     with st.expander("🧠 إحصائيات الذكاء الهجين", expanded=False):
         try:
-            ai_stats = ai_engine.get_ai_optimization_stats()
+            ai_stats = app_cache.ai_stats()
             
             # Header Metrics
             col1, col2 = st.columns(2)
@@ -262,6 +375,23 @@ with st.sidebar:
         except Exception as e:
             st.error(f"خطأ في تحميل الإحصائيات: {e}")
     
+    # ⏱️ Render Profiling (اختياري)
+    with st.expander("⏱️ تحليل سرعة التصدير", expanded=False):
+        st.session_state.profile_render = st.checkbox(
+            "قياس مراحل التصدير (Profiling)",
+            st.session_state.profile_render,
+            help="وقت كل مرحلة وكل تعديل لكل فريم + ملف Chrome Trace"
+        )
+        profile = st.session_state.last_render_profile
+        if profile:
+            st.caption("آخر تصدير:")
+            st.dataframe(profile['rows'], use_container_width=True, hide_index=True)
+            if os.path.exists(profile['trace']):
+                with open(profile['trace'], 'rb') as f:
+                    st.download_button("📥 Trace (chrome://tracing / speedscope)", f.read(),
+                                       file_name=os.path.basename(profile['trace']),
+                                       mime="application/json")
+    
     st.markdown("---")
     
     # Cache Settings
@@ -280,7 +410,7 @@ with st.sidebar:
     
     # Export/Import
     with st.expander("💾 نسخ احتياطي"):
-        json_data = command_cache.export_db_to_json()
+        json_data = app_cache.backup_json()
         st.download_button(
             "📥 تحميل Backup",
             data=json_data,
@@ -299,6 +429,9 @@ with st.sidebar:
     
     # Reset Button
     if st.button("🔄 مشروع جديد", type="primary", use_container_width=True):
+        # ملفات الجلسة القديمة تبقى من غير صاحب → temp_manager يمسحها بالـ LRU
+        temp_manager.release_owner(app_cache.session_owner())
+        temp_manager.release_owner(f"preview:{st.session_state.session_id}")
         st.session_state.clear()
         st.session_state.undo_redo_manager = undo_redo.UndoRedoManager()
         st.rerun()
@@ -310,6 +443,9 @@ with st.sidebar:
 # Header
 render_header()
 
+# Background exports (progress / results)
+render_jobs_panel()
+
 # Main Container
 main_container = st.container()
 
@@ -326,8 +462,15 @@ with main_container:
     )
     
     if uploaded_file:
-        temp_path = media_engine.save_uploaded_file(uploaded_file)
+        temp_path = app_cache.persist_upload(uploaded_file)
+        if not temp_path:
+            st.error("تعذر حفظ الفيديو")
+            st.stop()
         st.session_state.current_video_path = temp_path
+        # تاريخ Undo/Redo مربوط بمحتوى الفيديو (مش اسمه) وبيرجع بعد إعادة التشغيل / استيراد مشروع
+        history_key = app_cache.history_key(temp_path)
+        if st.session_state.undo_redo_manager.persist_key != history_key:
+            st.session_state.undo_redo_manager.bind(history_key)
         
         # Video Player + Info
         col_video, col_info = st.columns([3, 1])
@@ -338,16 +481,14 @@ with main_container:
         
         with col_info:
             st.markdown("#### 📋 معلومات الملف")
-            file_size = os.path.getsize(temp_path) / (1024 * 1024)
-            st.metric("الحجم", f"{file_size:.1f} MB")
-            
-            try:
-                with VideoFileClip(temp_path) as clip:
-                    duration = clip.duration
-                    st.metric("المدة", f"{int(duration // 60)}:{int(duration % 60):02d}")
-                    st.metric("الأبعاد", f"{clip.w}×{clip.h}")
-                    st.metric("FPS", f"{clip.fps:.1f}")
-            except:
+            info = app_cache.video_metadata(temp_path)
+            if info:
+                duration = info['duration']
+                st.metric("الحجم", f"{info['size_mb']:.1f} MB")
+                st.metric("المدة", f"{int(duration // 60)}:{int(duration % 60):02d}")
+                st.metric("الأبعاد", f"{info['width']}×{info['height']}")
+                st.metric("FPS", f"{info['fps']:.1f}")
+            else:
                 st.warning("تعذر قراءة المعلومات")
         
         # ────────────────────────────────────────
@@ -357,7 +498,7 @@ with main_container:
         st.markdown("### 🎞️ خط الزمن (Timeline)")
         
         with st.spinner("⏳ جاري تحميل الفريمات..."):
-            frames = media_engine.extract_timeline_frames(temp_path, num_frames=10)
+            frames = app_cache.timeline_frames(temp_path, num_frames=10)
             if frames:
                 try:
                     st.markdown(
@@ -388,16 +529,15 @@ with main_container:
             col_rec, col_music = st.columns(2)
             
             with col_rec:
+                from audiorecorder import audiorecorder  # (pydub) بعد أول رسم للصفحة
                 audio = audiorecorder("اضغط للتسجيل", "جاري التسجيل...")
                 if len(audio) > 0:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as fp:
-                        audio.export(fp.name, format="wav")
-                        audio_path = fp.name
+                    audio_path = app_cache.persist_recording(audio)
                     st.audio(audio_path)
                     
                     if st.button("🧠 تحليل الأمر الصوتي", type="primary", use_container_width=True):
                         with st.spinner("جاري الفهم..."):
-                            result = ai_engine.analyze_command(
+                            result = utils.ai_engine.analyze_command(
                                 audio_path=audio_path,
                                 cache_threshold=st.session_state.cache_threshold
                             )
@@ -410,7 +550,7 @@ with main_container:
                 st.markdown("#### 🎵 موسيقى خلفية (اختياري)")
                 music = st.file_uploader("ارفع ملف صوتي", type=["mp3", "wav"], key="music_voice")
                 if music:
-                    st.session_state.music_path = media_engine.save_uploaded_file(music)
+                    st.session_state.music_path = app_cache.persist_upload(music)
                     st.audio(st.session_state.music_path)
                     st.success("✅ جاهز!")
         
@@ -429,7 +569,7 @@ with main_container:
                 
                 if st.button("🧠 تحليل النص", type="primary", use_container_width=True) and user_text:
                     with st.spinner("جاري الفهم..."):
-                        result = ai_engine.analyze_command(
+                        result = utils.ai_engine.analyze_command(
                             text_prompt=user_text,
                             cache_threshold=st.session_state.cache_threshold
                         )
@@ -442,13 +582,13 @@ with main_container:
                 st.markdown("#### 🎵 موسيقى خلفية (اختياري)")
                 music2 = st.file_uploader("ارفع ملف صوتي", type=["mp3", "wav"], key="music_text")
                 if music2:
-                    st.session_state.music_path = media_engine.save_uploaded_file(music2)
+                    st.session_state.music_path = app_cache.persist_upload(music2)
                     st.audio(st.session_state.music_path)
                     st.success("✅ جاهز!")
         
         # ─── TAB 3: Templates ───
         with tab_templates:
-            templates = command_cache.get_all_templates()
+            templates = app_cache.templates()
             
             if templates:
                 st.info("📑 اختر قالباً جاهزاً أو أنشئ واحداً جديداً")
@@ -481,6 +621,17 @@ with main_container:
                         st.success("تم الحذف!")
                         time.sleep(0.5)
                         st.rerun()
+                
+                with st.expander("📂 تشغيل القالب على فولدر"):
+                    folder = st.text_input("مسار الفولدر:", key="template_folder")
+                    recursive = st.checkbox("يشمل الفولدرات الفرعية", key="template_folder_recursive")
+                    if st.button("▶️ تشغيل", key="run_template_folder") and selected and folder:
+                        if not os.path.isdir(folder):
+                            st.error("⚠️ الفولدر غير موجود")
+                        else:
+                            submit_template_folder(selected, folder, recursive)
+                    for error in st.session_state.pop('folder_errors', []):
+                        st.error(f"❌ {error}")
             else:
                 st.warning("لا توجد قوالب محفوظة. قم بإنشاء واحد بعد تنفيذ أمر!")
         
@@ -498,17 +649,18 @@ with main_container:
                 st.success(f"تم رفع {len(batch_files)} فيديو")
                 
                 if st.button("🚀 معالجة الكل", type="primary", use_container_width=True):
-                    video_paths = [media_engine.save_uploaded_file(f) for f in batch_files]
+                    video_paths = [app_cache.persist_upload(f) for f in batch_files]
                     actions = st.session_state.ai_result['actions']
                     
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    def update_progress(current, total):
-                        progress_bar.progress(current / total)
-                        status_text.text(f"معالجة {current}/{total}...")
+                    def update_progress(current, total, event=None):
+                        progress_bar.progress((event or {}).get('overall', current / total))
+                        details = ui_utils.format_progress(event)
+                        status_text.text(f"معالجة {current}/{total}... {details}")
                     
-                    results = batch_processor.batch_process(
+                    results = utils.batch_processor.batch_process(
                         video_paths,
                         actions,
                         st.session_state.music_path,
@@ -551,15 +703,13 @@ with main_container:
                 if st.button("⏪ تراجع", disabled=not st.session_state.undo_redo_manager.can_undo()):
                     prev = st.session_state.undo_redo_manager.undo()
                     if prev:
-                        st.session_state.ai_result = {'actions': prev['actions']}
-                        st.rerun()
+                        _restore_state(prev)
             
             with col_redo:
                 if st.button("⏩ إعادة", disabled=not st.session_state.undo_redo_manager.can_redo()):
                     next_state = st.session_state.undo_redo_manager.redo()
                     if next_state:
-                        st.session_state.ai_result = {'actions': next_state['actions']}
-                        st.rerun()
+                        _restore_state(next_state)
             
             # Transcription
             st.markdown(f"**🗣️ فهمت:** {result.get('transcription', 'أمر مباشر')}")
@@ -568,6 +718,8 @@ with main_container:
             with st.expander("📋 الخطوات المطلوبة", expanded=True):
                 st.json(result['actions'])
             
+            _history_view(result)
+            
             # Quick Actions
             col_preview, col_save, col_export = st.columns(3)
             
@@ -575,12 +727,18 @@ with main_container:
                 if st.button("👁️ معاينة سريعة", use_container_width=True):
                     st.session_state.preview_mode = True
                     with st.spinner("جاري إنشاء المعاينة..."):
-                        previews = preview_engine.preview_all_steps(
+                        preview_owner = f"preview:{st.session_state.session_id}"
+                        temp_manager.release_owner(preview_owner)  # المعاينات القديمة
+                        previews = utils.preview_engine.preview_all_steps(
                             temp_path,
                             result['actions'],
                             preview_duration=5.0,
-                            music_path=st.session_state.music_path
+                            music_path=st.session_state.music_path,
+                            owner=preview_owner
                         )
+                        manager = st.session_state.undo_redo_manager
+                        if manager.matches_current(result['actions']):
+                            manager.attach_artifacts(previews=[p['preview_path'] for p in previews])
                         for p in previews:
                             st.caption(f"خطوة {p['step_index']+1}: {p['action']}")
                             st.video(p['preview_path'])
@@ -590,7 +748,8 @@ with main_container:
                     tmpl_name = st.text_input("اسم القالب:")
                     tmpl_desc = st.text_input("وصف (اختياري):")
                     if st.button("حفظ") and tmpl_name:
-                        command_cache.save_template(tmpl_name, result['actions'], tmpl_desc)
+                        if command_cache.save_template(tmpl_name, result['actions'], tmpl_desc):
+                            template_plans.plan_for(tmpl_name)  # الـ plan بتتعمل مرة واحدة وقت الحفظ
                         st.success("تم!")
                         time.sleep(1)
                         st.rerun()
@@ -602,6 +761,23 @@ with main_container:
                     default=st.session_state.selected_formats
                 )
             
+            # Subtitle File (SRT / VTT)
+            with st.expander("📝 ملف ترجمة (SRT / VTT)"):
+                sub_file = st.file_uploader("ارفع ملف الترجمة", type=["srt", "vtt"], key="subtitle_file")
+                sub_mode = st.radio(
+                    "طريقة الإضافة:",
+                    ["burn", "soft"],
+                    format_func=lambda m: "🔥 حرق على الفيديو" if m == "burn" else "💬 مسار ترجمة (بدون إعادة ترميز)",
+                    horizontal=True
+                )
+                st.session_state.subtitle_action = None
+                if sub_file:
+                    st.session_state.subtitle_action = {
+                        'action': 'subtitle_file',
+                        'path': app_cache.persist_upload(sub_file),
+                        'mode': sub_mode
+                    }
+            
             # Warning Messages
             if any(a['action'] == 'music' for a in result['actions']) and not st.session_state.music_path:
                 st.warning("⚠️ الأمر يتطلب موسيقى! ارفع ملف صوتي في تبويب الصوت/النص")
@@ -615,9 +791,10 @@ with main_container:
                 
                 with col_confirm:
                     if st.button("✅ تنفيذ الآن", type="primary", use_container_width=True):
+                        sub_action = st.session_state.get('subtitle_action')
                         execute_editing(
                             temp_path,
-                            result['actions'],
+                            result['actions'] + ([sub_action] if sub_action else []),
                             st.session_state.music_path,
                             st.session_state.selected_formats
                         )
@@ -0,0 +1,79 @@
+"""
+Benchmark: مقارنة سرعة Frame Kernels المدمجة مع سلسلة MoviePy fx القديمة.
+
+التشغيل (من جذر المشروع):
+    python -m benchmarks.bench_frame_kernels --frames 200 --size 1920x1080
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from moviepy.editor import VideoClip
+from utils import frame_kernels
+
+SCENARIOS = {
+    "black_white": [{"action": "black_white"}],
+    "crop_9_16": [{"action": "crop", "aspect_ratio": "9:16"}],
+    "rotate_90": [{"action": "rotate", "angle": 90}],
+    "reels_bw": [{"action": "crop", "aspect_ratio": "9:16"}, {"action": "rotate", "angle": 180},
+                 {"action": "black_white"}],
+}
+
+def _synthetic_clip(width: int, height: int, duration: float = 3600.0) -> VideoClip:
+    """كليب بفريم noise ثابت (محجوز مرة واحدة) حتى نقيس الفلاتر فقط."""
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return VideoClip(lambda t: frame, duration=duration)
+
+def _fps(clip, frames: int) -> float:
+    start = time.perf_counter()
+    for i in range(frames):
+        clip.get_frame(i / 25.0)
+    return frames / (time.perf_counter() - start)
+
+def _steady_state_allocations(kernel, frame: np.ndarray, frames: int) -> int:
+    """حجم الذاكرة الجديدة المحجوزة أثناء تشغيل الـ kernel بعد التسخين (bytes/frame)."""
+    kernel(frame)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(frames):
+        kernel(frame)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, 'filename') if stat.size_diff > 0)
+    return grown // frames
+
+def run(frames: int, width: int, height: int) -> list:
+    results = []
+    source = _synthetic_clip(width, height)
+    frame = source.get_frame(0)
+    for name, steps in SCENARIOS.items():
+        kernel = frame_kernels.build_kernel(steps, (width, height))
+        batch = np.stack([frame] * 8)
+        out = None
+        start = time.perf_counter()
+        for _ in range(frames // 8):
+            out = kernel.apply_batch(batch, out)
+        batch_fps = (frames // 8) * 8 / (time.perf_counter() - start)
+        results.append({
+            "scenario": name,
+            "fx_chain_fps": round(_fps(frame_kernels.apply_fx_chain(source, steps), frames), 1),
+            "kernel_fps": round(_fps(source.fl_image(kernel), frames), 1),
+            "kernel_batch_fps": round(batch_fps, 1),
+            "kernel_bytes_per_frame": _steady_state_allocations(kernel, frame, frames),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame kernels vs MoviePy fx chain")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--size", default="1920x1080")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    print(f"{'scenario':<14}{'fx chain':>12}{'kernel':>12}{'batch':>12}{'alloc/frame':>14}")
+    for row in run(args.frames, width, height):
+        print(f"{row['scenario']:<14}{row['fx_chain_fps']:>12}{row['kernel_fps']:>12}"
+              f"{row['kernel_batch_fps']:>12}{row['kernel_bytes_per_frame']:>13}B")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark: مستويات الذكاء الهجين في ai_engine (Quick Match / Local Parser / Cache / analyze_command).
+
+- Corpus مولد (عربي + إنجليزي، أخطاء كتابة، أرقام هندية، أوامر مركبة).
+- الـ AI متبدل بـ stub (مفيش أي اتصال شبكة).
+- الكاش في قاعدة بيانات مؤقتة بيكبر تدريجياً (100 → 1M) وبيتقاس عند كل حجم.
+
+التشغيل (من جذر المشروع):
+    python -m benchmarks.bench_parser --queries 2000 --sizes 100,1000,10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from utils import ai_engine, command_cache
+
+AR_DIGITS = str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩')
+
+TEMPLATES = [
+    "قص اول {n} ثواني", "خد من {a} ل {b}", "first {n} seconds", "trim from {a} to {b}",
+    "سرع الفيديو {f}x", "speed {f}x", "خليه بطيء", "slow motion",
+    "ارفع الصوت {p}%", "قلل الصوت {p}", "increase {p} volume", "كتم الصوت", "mute",
+    "ريلز", "tiktok", "youtube", "مربع للانستجرام", "دور {angle}", "rotate {angle}",
+    "ابيض واسود", "black and white", "حط موسيقى {p}%", "add background music",
+]
+JOINERS = [" و ", " ثم ", " and ", " then ", " + "]
+NOISE = ["اعمل حاجه حلوه للفيديو", "make it look cinematic", "فلتر قديم", "zoom on the face",
+         "ضيف انتقالات", "color grade warm", "ازاله الخلفيه", "stabilize the shaky parts"]
+
+def _fill(template: str, rng: random.Random) -> str:
+    a = rng.randint(0, 60)
+    return template.format(n=rng.choice([5, 10, 15, 30]), a=a, b=a + rng.randint(1, 60),
+                           f=rng.choice([1.5, 2, 3]), p=rng.choice([20, 30, 50, 80]),
+                           angle=rng.choice([90, 180, 270]))
+
+def _typo(text: str, rng: random.Random) -> str:
+    if len(text) < 4:
+        return text
+    i = rng.randrange(len(text) - 1)
+    kind = rng.random()
+    if kind < 0.4:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]   # تبديل حرفين
+    if kind < 0.7:
+        return text[:i] + text[i + 1:]                              # حذف حرف
+    return text[:i] + text[i] + text[i:]                            # تكرار حرف
+
+def generate_command(rng: random.Random) -> str:
+    """أمر واحد: بسيط / مركب / بأخطاء / بأرقام هندية / أو كلام مش مفهوم محلياً."""
+    roll = rng.random()
+    if roll < 0.15:
+        text = rng.choice(NOISE)
+    elif roll < 0.45:
+        text = rng.choice(JOINERS).join(_fill(t, rng) for t in rng.sample(TEMPLATES, rng.randint(2, 3)))
+    else:
+        text = _fill(rng.choice(TEMPLATES), rng)
+    if rng.random() < 0.2:
+        text = text.translate(AR_DIGITS)
+    if rng.random() < 0.25:
+        text = _typo(text, rng)
+    return text
+
+def generate_corpus(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [generate_command(rng) for _ in range(size)]
+
+# ==================== الكاش المؤقت ====================
+
+def _fill_cache(target: int, current: int, rng: random.Random) -> int:
+    """إضافة أوامر فريدة للكاش لحد ما يوصل target (executemany مباشرة للسرعة)."""
+    conn = sqlite3.connect(command_cache.DB_PATH)
+    actions = json.dumps([{'action': 'mute'}])
+    while current < target:
+        batch = min(50_000, target - current)
+        rows = []
+        for i in range(current, current + batch):
+            text = f"{generate_command(rng)} #{i}"
+            rows.append((text, command_cache._hash_command(text), actions, text))
+        conn.executemany("INSERT OR IGNORE INTO commands (command_text, command_hash, actions_json, transcription) "
+                         "VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        current += batch
+    conn.close()
+    return current
+
+def _stub_ai(calls: List[str]) -> Callable:
+    def fallback(audio_path=None, text_prompt=None, use_cache=True):
+        calls.append(text_prompt)
+        result = {'transcription': text_prompt, 'actions': [{'action': 'mute'}],
+                  'from_cache': False, 'source': 'AI 🤖', 'tokens_saved': 0}
+        if use_cache:
+            command_cache.save_command(text_prompt or '', result['actions'], text_prompt)
+        return result
+    return fallback
+
+# ==================== القياس ====================
+
+def _measure(func: Callable, queries: List[str], budget: float) -> Dict:
+    """Latency لكل استعلام + hit rate (الاستعلامات تقف لو الوقت عدى الـ budget)."""
+    latencies, hits = [], 0
+    started = time.perf_counter()
+    for text in queries:
+        t0 = time.perf_counter()
+        result = func(text)
+        latencies.append(time.perf_counter() - t0)
+        hits += result is not None
+        if time.perf_counter() - started > budget and len(latencies) >= 5:
+            break
+    ordered = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'n': len(latencies),
+        'ops_per_s': round(len(latencies) / total, 1) if total else None,
+        'p50_us': round(statistics.median(ordered) * 1e6, 1),
+        'p99_us': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e6, 1),
+        'hit_rate': round(hits / len(latencies), 3),
+    }
+
+def run(queries: int, sizes: List[int], budget: float, seed: int = 0) -> List[Dict]:
+    corpus = generate_corpus(queries, seed)
+    parser = ai_engine.EnhancedLocalParser()
+    ai_calls: List[str] = []
+    original_fallback = ai_engine._ai_fallback
+    ai_engine._ai_fallback = _stub_ai(ai_calls)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        original_db = command_cache.DB_PATH
+        command_cache.DB_PATH = os.path.join(tmp, "bench_cache.db")
+        command_cache.init_database()
+        try:
+            rng, filled = random.Random(seed + 1), 0
+            for size in sizes:
+                filled = _fill_cache(size, filled, rng)
+                tiers = {
+                    'quick_match': ai_engine.quick_match,
+                    'local_parser': parser.parse,
+                    'cache': command_cache.find_similar_command,
+                    'analyze_command': lambda text: ai_engine.analyze_command(text_prompt=text),
+                }
+                for tier, func in tiers.items():
+                    ai_calls.clear()
+                    row = {'cache_size': size, 'tier': tier, **_measure(func, corpus, budget)}
+                    if tier == 'analyze_command':
+                        row['ai_rate'] = round(len(ai_calls) / row['n'], 3)
+                    results.append(row)
+                    _print_row(row)
+        finally:
+            command_cache.DB_PATH = original_db
+            ai_engine._ai_fallback = original_fallback
+    return results
+
+def _print_row(row: Dict):
+    extra = f"  ai={row['ai_rate']:.1%}" if 'ai_rate' in row else ""
+    print(f"{row['cache_size']:>9} {row['tier']:<16}{row['n']:>7}{row['ops_per_s'] or 0:>12.1f}"
+          f"{row['p50_us']:>11.1f}{row['p99_us']:>12.1f}{row['hit_rate']:>8.1%}{extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid intelligence tiers benchmark")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--sizes", default="100,1000,10000,100000,1000000")
+    parser.add_argument("--budget", type=float, default=20.0,
+                        help="أقصى ثواني لكل tier عند كل حجم كاش (الكاش الكبير بطيء)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="حفظ النتائج في ملف JSON")
+    args = parser.parse_args()
+
+    print(f"{'cache':>9} {'tier':<16}{'n':>7}{'ops/s':>12}{'p50 µs':>11}{'p99 µs':>12}{'hit':>8}")
+    results = run(args.queries, [int(s) for s in args.sizes.split(",")], args.budget, args.seed)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
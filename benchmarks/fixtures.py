@@ -0,0 +1,52 @@
+"""
+Fixtures صناعية للـ Benchmarks: فيديوهات (color bars / noise) + صوت tone بـ FFmpeg lavfi.
+الملفات بتتولد مرة واحدة في benchmarks/fixtures/ وبيُعاد استخدامها.
+"""
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict
+from utils.config import get_ffmpeg_path
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+RESOLUTIONS = {"480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+
+# مصدر الصورة: bars سهلة في الترميز، noise أصعب حالة للـ encoder
+VIDEO_SOURCES = {
+    "bars": "smptehdbars=size={w}x{h}:rate=30",
+    "noise": "testsrc2=size={w}x{h}:rate=30,noise=alls=40:allf=t",
+}
+
+def _run(args: list):
+    subprocess.run([get_ffmpeg_path(), '-y', '-v', 'error'] + args, check=True)
+
+def video_fixture(source: str = "bars", resolution: str = "720p", duration: int = 10) -> str:
+    """فيديو H.264 + صوت sine 440Hz (يتولد لو مش موجود)."""
+    path = FIXTURES_DIR / f"{source}_{resolution}_{duration}s.mp4"
+    if not path.exists():
+        FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+        w, h = RESOLUTIONS[resolution]
+        _run(['-f', 'lavfi', '-i', VIDEO_SOURCES[source].format(w=w, h=h),
+              '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+              '-t', str(duration), '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+              '-c:a', 'aac', '-shortest', str(path)])
+    return str(path)
+
+def music_fixture(duration: int = 7) -> str:
+    """موسيقى خلفية (tone 220Hz متقطع) أقصر من الفيديو عشان الـ loop يتقاس."""
+    path = FIXTURES_DIR / f"music_{duration}s.m4a"
+    if not path.exists():
+        FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+        _run(['-f', 'lavfi', '-i', 'sine=frequency=220:sample_rate=44100,tremolo=f=2:d=0.8',
+              '-t', str(duration), '-c:a', 'aac', str(path)])
+    return str(path)
+
+def parse_fixture(spec: str) -> Dict:
+    """'bars-720p-10s' → {'source': 'bars', 'resolution': '720p', 'duration': 10}"""
+    source, resolution, duration = spec.split("-")
+    return {'source': source, 'resolution': resolution, 'duration': int(duration.rstrip("s"))}
+
+def clear_fixtures():
+    for name in os.listdir(FIXTURES_DIR) if FIXTURES_DIR.exists() else []:
+        os.remove(FIXTURES_DIR / name)
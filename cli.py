@@ -0,0 +1,224 @@
+"""
+CLI: تنفيذ أوامر المونتاج من سطر الأوامر / السكربتات / CI من غير الواجهة.
+
+    python cli.py INPUT... (--actions JSON|FILE | --template NAME | --command "نص الأمر")
+                  [--formats mp4,webm] [--workers N] [--output DIR] [--music PATH] [--json] [--dry-run]
+                  [--farm [DB]]
+
+- INPUT: ملفات، فولدرات (كل الفيديوهات جواها) أو globs ("clips/**/*.mp4").
+- الأوامر: JSON (نص أو مسار ملف: list أو {"actions": [...]})، أو قالب محفوظ، أو أمر نصي بيتحل
+  بالمستويات المحلية بس (Quick Match → Local Parser → Cache) — مفيش أي نداء AI من هنا.
+- التنفيذ عبر الـ Batch بـ render plan (fast path FFmpeg لو الأوامر تسمح، وإلا MoviePy)، صيغة صيغة.
+- --farm: بدل الريندر هنا، job لكل فيديو × صيغة في الـ job store المشترك (render_worker.py بيصدرها).
+- --json: كل event سطر JSON على stdout (start / progress / result / summary) للسكربتات؛
+  من غيره التقدم على stderr والنواتج على stdout.
+- Exit code: 0 كله نجح، 1 فيه فيديوهات فشلت، 2 مدخلات أو أوامر غلط.
+- التحميل خفيف: Streamlit عمره ما بيتحمل، وMoviePy / FFmpeg بس لما الريندر يبدأ فعلاً.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE = 0, 1, 2
+FORMATS = ("mp4", "webm", "gif")
+
+class UsageError(Exception):
+    """مدخلات أو أوامر غلط (exit code 2)."""
+
+# ==================== Output ====================
+
+class Reporter:
+    def __init__(self, as_json: bool):
+        self.as_json = as_json
+        self._inline = False  # سطر تقدم مفتوح على stderr (\r)
+
+    def emit(self, event: str, **fields):
+        if self.as_json:
+            sys.stdout.write(json.dumps({'event': event, **fields}, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+            return
+        if event == "progress":
+            fps = f" {fields['fps']:.0f}fps" if fields.get('fps') else ""
+            sys.stderr.write(f"\r[{fields['format']}] {fields['completed']}/{fields['total']} "
+                             f"{fields['overall'] * 100:5.1f}%{fps}   ")
+            sys.stderr.flush()
+            self._inline = True
+            return
+        if self._inline:
+            sys.stderr.write("\n")
+            self._inline = False
+        if event == "result":
+            if fields['status'] == 'success':
+                print(fields['output'])
+            elif fields['status'] == 'valid':
+                print(f"✅ {fields['input']}", file=sys.stderr)
+            else:
+                print(f"❌ {fields['input']}: {fields['error']}", file=sys.stderr)
+        elif event == "start":
+            print(f"▶ {fields['inputs']} فيديو × {', '.join(fields['formats'])} ({fields['source']})", file=sys.stderr)
+        elif event == "queued":
+            print(f"📥 {len(fields['jobs'])} job ({fields['format']}) → {fields['store']}", file=sys.stderr)
+        elif event == "error":
+            print(f"❌ {fields['error']}", file=sys.stderr)
+
+# ==================== Inputs ====================
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """الملفات من المسارات / الفولدرات / الـ globs (بنفس الترتيب، من غير تكرار)."""
+    from utils import template_plans
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = template_plans.find_videos(pattern)
+        elif glob.has_magic(pattern):
+            matches = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            raise UsageError(f"الملف غير موجود: {pattern}")
+        paths.extend(os.path.abspath(p) for p in matches)
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        raise UsageError("مفيش فيديوهات في المدخلات")
+    return paths
+
+def parse_formats(value: str) -> List[str]:
+    formats = list(dict.fromkeys(f.strip().lower() for f in value.split(",") if f.strip()))
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"صيغة غير مدعومة: {', '.join(unknown) or value} ({' / '.join(FORMATS)})")
+    return formats
+
+def load_actions(value: str) -> List[Dict]:
+    """--actions: نص JSON أو مسار ملف JSON (list أو {"actions": [...]})."""
+    try:
+        if os.path.isfile(value):
+            with open(value, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = json.loads(value)
+    except (OSError, ValueError) as e:
+        raise UsageError(f"--actions مش JSON صالح: {e}")
+    if isinstance(data, dict):
+        data = data.get("actions")
+    if not isinstance(data, list):
+        raise UsageError("--actions لازم يكون list أو {\"actions\": [...]}")
+    return data
+
+def resolve(args, first_input: str):
+    """(plan, وصف المصدر) من --actions / --template / --command."""
+    from utils import action_schema, template_plans
+    if args.template:
+        plan = template_plans.plan_for(args.template)
+        if plan is None:
+            raise UsageError(f"القالب غير موجود: {args.template}")
+        return plan, f"template:{args.template}"
+    if args.command:
+        from utils import ai_engine
+        info = action_schema.media_info(first_input) or {}
+        result = ai_engine.analyze_command(text_prompt=args.command, video_duration=info.get('duration'),
+                                           allow_ai=False)
+        if not result or not result.get('actions'):
+            raise UsageError(f"الأمر ما اتفهمش محلياً (من غير AI): {args.command}")
+        actions, source = result['actions'], f"command:{result.get('source', 'local')}"
+    else:
+        actions, source = load_actions(args.actions), "actions"
+    error = action_schema.check(actions)
+    if error:
+        raise UsageError(error)
+    return template_plans.compile_plan(actions), source
+
+# ==================== Run ====================
+
+def run(args, reporter: Reporter) -> int:
+    inputs = expand_inputs(args.inputs)
+    plan, source = resolve(args, inputs[0])
+    reporter.emit("start", inputs=len(inputs), formats=args.formats, source=source,
+                  actions=plan['actions'], fast_path=bool(plan.get('ffmpeg')))
+    if args.dry_run:
+        from utils import action_schema
+        failed = 0
+        for path in inputs:
+            error = action_schema.check(plan['actions'], path)
+            failed += bool(error)
+            reporter.emit("result", input=path, format=None, output=None,
+                          status='error' if error else 'valid', error=error or None)
+        return EXIT_FAILED if failed else EXIT_OK
+    if args.farm is not None:
+        return enqueue(args, inputs, plan, reporter)
+
+    from utils import batch_processor
+    started, ok, failed = time.time(), 0, 0
+    for fmt in args.formats:
+        def on_progress(completed, total, event, fmt=fmt):
+            video = event.get('video_index')
+            reporter.emit("progress", format=fmt, completed=completed, total=total,
+                          overall=round(event.get('overall', 0.0), 4), fps=event.get('fps'),
+                          video=inputs[video] if video is not None else None)
+
+        results = batch_processor.batch_process(inputs, plan['actions'], args.music, args.workers, on_progress,
+                                                args.output, plan=plan, format=fmt)
+        for result in results:
+            ok += result['status'] == 'success'
+            failed += result['status'] != 'success'
+            reporter.emit("result", format=fmt, input=result['input'], output=result.get('output'),
+                          status=result['status'], error=result.get('error'))
+    reporter.emit("summary", ok=ok, failed=failed, seconds=round(time.time() - started, 2))
+    return EXIT_FAILED if failed else EXIT_OK
+
+def enqueue(args, inputs: List[str], plan: Dict, reporter: Reporter) -> int:
+    """--farm: الـ jobs للـ job store (المسارات absolute عشان الـ workers التانيين)."""
+    from utils import job_store
+    if args.farm:
+        job_store.DB_PATH = os.path.abspath(args.farm)
+    output_dir = os.path.abspath(args.output) if args.output else None
+    music = os.path.abspath(args.music) if args.music else None
+    total = 0
+    for fmt in args.formats:
+        if args.template:
+            ids = job_store.enqueue(inputs, music_path=music, format=fmt, template=args.template, output_dir=output_dir)
+        else:
+            ids = job_store.enqueue(inputs, plan['actions'], music, fmt, output_dir=output_dir)
+        total += len(ids)
+        reporter.emit("queued", format=fmt, jobs=ids, store=job_store.DB_PATH)
+    reporter.emit("summary", queued=total)
+    return EXIT_OK
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="تنفيذ أوامر المونتاج على فيديو أو أكتر من سطر الأوامر")
+    parser.add_argument("inputs", nargs="+", help="ملفات / فولدرات / globs")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--actions", help="JSON (نص أو مسار ملف)")
+    source.add_argument("--template", help="اسم قالب محفوظ")
+    source.add_argument("--command", help="أمر نصي (بيتحل محلياً من غير AI)")
+    parser.add_argument("--formats", type=parse_formats, default=["mp4"], help="صيغ الإخراج: mp4,webm,gif")
+    parser.add_argument("--workers", type=int, help="عدد الفيديوهات المتوازية (افتراضي حسب الأنوية)")
+    parser.add_argument("--output", help="مجلد الإخراج (افتراضي OUTPUT_DIR)")
+    parser.add_argument("--music", help="ملف موسيقى لأمر music")
+    parser.add_argument("--json", action="store_true", help="events كسطور JSON على stdout")
+    parser.add_argument("--dry-run", action="store_true", help="التحقق من الأوامر على كل فيديو من غير ريندر")
+    parser.add_argument("--farm", nargs="?", const="", metavar="DB",
+                        help="إضافة jobs للـ render farm بدل الريندر (ملف الـ job store اختياري)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(args.json)
+    if args.music and not os.path.isfile(args.music):
+        reporter.emit("error", error=f"الملف غير موجود: {args.music}")
+        return EXIT_USAGE
+    try:
+        return run(args, reporter)
+    except UsageError as e:
+        reporter.emit("error", error=str(e))
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        reporter.emit("error", error="cancelled")
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
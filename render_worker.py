@@ -0,0 +1,178 @@
+"""
+Render Worker: worker في الـ render farm — بيسحب jobs من الـ job store المشترك (utils/job_store.py) ويصدرها.
+
+    python render_worker.py [--db //nas/farm/render_farm.db] [--slots 1] [--output DIR] [--once]
+    python render_worker.py --status [--window 3600] [--json]      # عرض الـ coordinator
+
+- كل worker = process عادي (على نفس الجهاز أو أجهزة تانية شايفة نفس الـ storage)؛ --slots = كام job
+  في نفس الوقت جوه الـ process (كل slot ليه صف في workers، وencoder_profile بيوزع الأنوية).
+- أثناء الريندر: heartbeat كل HEARTBEAT_SECONDS بيمد الـ lease وبيبعت التقدم. لو heartbeat رجعت False
+  (الـ job اتلغت أو اتاخدت من الـ worker ده بعد ما الـ lease خلصت) الريندر بيقف عند أول progress event.
+- worker مات (kill -9 / الجهاز وقع): الـ lease بتخلص، وأول claim من أي worker تاني بيرجّع الـ job للطابور.
+- Ctrl+C / SIGTERM: ما بياخدش jobs جديدة وبيخلص اللي في إيده.
+- الـ jobs بتتضاف بـ `python cli.py ... --farm` أو job_store.enqueue().
+"""
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict
+
+from utils import action_schema, batch_processor, job_store
+from utils.progress import RenderCancelled
+
+class RenderWorker:
+    def __init__(self, slots: int = 1, output_dir: str = None, poll: float = 2.0, once: bool = False,
+                 lease: float = job_store.LEASE_SECONDS):
+        self.slots = max(1, slots)
+        self.output_dir = output_dir
+        self.poll = poll
+        self.once = once
+        self.lease = lease
+        self.stopping = threading.Event()
+
+    def _heartbeat(self, worker_id: str, job_id: int, state: Dict, lost: threading.Event, done: threading.Event):
+        while not done.wait(min(job_store.HEARTBEAT_SECONDS, self.lease / 3)):
+            try:
+                if not job_store.heartbeat(worker_id, job_id, state['progress'], self.lease):
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                print(f"⚠️ heartbeat failed ({e}); retrying", file=sys.stderr)  # الـ lease فيها سماح
+
+    def run_job(self, worker_id: str, job: Dict):
+        plan, state = job['plan'], {'progress': 0.0}
+        lost, done = threading.Event(), threading.Event()
+
+        def on_progress(event):
+            if lost.is_set():
+                raise RenderCancelled()
+            if event.get('stage') == 'video':
+                state['progress'] = event.get('progress', 0.0)
+
+        beat = threading.Thread(target=self._heartbeat, args=(worker_id, job['id'], state, lost, done), daemon=True)
+        beat.start()
+        started = time.time()
+        try:
+            result = batch_processor.process_single_video(job['video_path'], plan['actions'], job['music_path'],
+                                                          job['output_dir'] or self.output_dir, on_progress,
+                                                          plan=plan, format=job['format'])
+        finally:
+            done.set()
+            beat.join()
+        seconds = round(time.time() - started, 2)
+        name = os.path.basename(job['video_path'])
+
+        if lost.is_set():
+            if result.get('output') and os.path.exists(result['output']):
+                os.remove(result['output'])  # الـ job بقت بتاعة worker تاني
+            print(f"↩️ [{worker_id}] #{job['id']} {name}: lease lost / cancelled")
+        elif result['status'] == 'success':
+            info = action_schema.media_info(result['output']) or {}
+            try:
+                completed = job_store.complete(job['id'], worker_id, result['output'], seconds, info.get('duration'))
+            except Exception:
+                os.remove(result['output'])  # الـ job هترجع الطابور؛ مفيش نسختين من نفس الناتج
+                raise
+            if completed:
+                print(f"✅ [{worker_id}] #{job['id']} {name} → {result['output']} ({seconds}s)")
+            else:
+                os.remove(result['output'])  # الـ lease خلصت والـ job اتاخدت من worker تاني قبل ما نخلص
+                print(f"↩️ [{worker_id}] #{job['id']} {name}: lease lost")
+        else:
+            job_store.fail(job['id'], worker_id, result.get('error'), seconds)
+            print(f"❌ [{worker_id}] #{job['id']} {name} (attempt {job['attempts']}/{job['max_attempts']}): "
+                  f"{result.get('error')}")
+
+    def _fail(self, worker_id: str, job: Dict, error: Exception):
+        """job وقعت برة process_single_video (مثلاً sqlite3.Error من complete): تتسجل فشل والـ slot يكمل."""
+        print(f"💥 [{worker_id}] #{job['id']}: {type(error).__name__}: {error}", file=sys.stderr)
+        try:
+            job_store.fail(job['id'], worker_id, f"{type(error).__name__}: {error}")
+        except sqlite3.Error as e:
+            # الـ job هترجع الطابور لما الـ lease تخلص
+            print(f"⚠️ [{worker_id}] couldn't record failure of #{job['id']} ({e})", file=sys.stderr)
+
+    def _loop(self, worker_id: str):
+        job_store.register_worker(worker_id, self.slots)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    job = job_store.claim(worker_id, self.lease)
+                except sqlite3.Error as e:
+                    print(f"⚠️ [{worker_id}] claim failed ({e}); retrying", file=sys.stderr)
+                    self.stopping.wait(self.poll)
+                    continue
+                if job is None:
+                    if self.once:
+                        return
+                    self.stopping.wait(self.poll)
+                    continue
+                try:
+                    self.run_job(worker_id, job)
+                except Exception as e:
+                    self._fail(worker_id, job, e)
+        finally:
+            try:
+                job_store.unregister_worker(worker_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ [{worker_id}] unregister failed ({e})", file=sys.stderr)
+
+    def run(self):
+        names = [job_store.worker_name(slot if self.slots > 1 else None) for slot in range(self.slots)]
+        print(f"🛠️ Worker {job_store.worker_name()} | slots={self.slots} | store={job_store.DB_PATH}")
+        threads = [threading.Thread(target=self._loop, args=(name,), name=name) for name in names]
+        for thread in threads:
+            thread.start()
+        while any(t.is_alive() for t in threads):
+            for thread in threads:
+                thread.join(0.5)
+
+    def stop(self, *_):
+        if not self.stopping.is_set():
+            print("⏳ مش هاخد jobs جديدة؛ مستني الشغال يخلص...")
+        self.stopping.set()
+
+def print_status(window: float, as_json: bool):
+    summary, nodes = job_store.queue_summary(), job_store.node_stats(window)
+    if as_json:
+        print(json.dumps({'queue': summary, 'nodes': nodes}, ensure_ascii=False))
+        return
+    print("Queue: " + "  ".join(f"{status}={count}" for status, count in summary.items()))
+    print(f"{'worker':<28} {'state':<8} {'job':>6} {'done':>5} {'fail':>5} {'jobs/h':>7} {'x realtime':>10} {'seen':>7}")
+    for node in nodes:
+        factor = f"{node['realtime_factor']:.2f}" if node['realtime_factor'] else "-"
+        print(f"{node['worker']:<28} {node['state']:<8} {node['current_job'] or '-':>6} {node['done']:>5} "
+              f"{node['failed']:>5} {node['jobs_per_hour']:>7} {factor:>10} {node['last_seen']:>6}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render farm worker (job store مشترك)")
+    parser.add_argument("--db", help="ملف الـ job store المشترك (افتراضي RENDER_FARM_DB أو DATA_DIR/render_farm.db)")
+    parser.add_argument("--slots", type=int, default=1, help="عدد الـ jobs المتزامنة في الـ process ده")
+    parser.add_argument("--output", help="مجلد الإخراج لو الـ job ما حددتش")
+    parser.add_argument("--poll", type=float, default=2.0, help="ثواني بين كل محاولة claim والطابور فاضي")
+    parser.add_argument("--lease", type=float, default=job_store.LEASE_SECONDS, help="مدة الـ lease بالثواني")
+    parser.add_argument("--once", action="store_true", help="اخرج لما الطابور يفضى")
+    parser.add_argument("--status", action="store_true", help="عرض الطابور والـ throughput لكل worker")
+    parser.add_argument("--window", type=float, default=3600.0, help="فترة الـ throughput في --status (ثواني)")
+    parser.add_argument("--json", action="store_true", help="--status كـ JSON")
+    args = parser.parse_args(argv)
+    if args.db:
+        job_store.DB_PATH = os.path.abspath(args.db)
+
+    if args.status:
+        print_status(args.window, args.json)
+        return 0
+    worker = RenderWorker(args.slots, args.output, args.poll, args.once, args.lease)
+    signal.signal(signal.SIGINT, worker.stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, worker.stop)
+    worker.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
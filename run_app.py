@@ -1,6 +1,14 @@
 import os
 import sys
-import streamlit.web.cli as stcli
+import time
+import subprocess
+import importlib
+import multiprocessing
+
+# موديولات app.py قبل أول رسم للصفحة / والتقيلة اللي بتتحمل عند أول استخدام
+STARTUP_MODULES = ["streamlit", "dotenv", "utils", "utils.config", "utils.ui_utils", "utils.app_cache",
+                   "utils.undo_redo", "utils.ai_engine", "utils.command_cache"]
+ON_DEMAND_MODULES = ["moviepy.editor", "google.generativeai", "audiorecorder"]
 
 def resolve_path(path):
     """تحديد المسار الصحيح سواء في الوضع العادي أو بعد التغليف"""
@@ -10,10 +18,53 @@ def resolve_path(path):
         base_path = os.path.dirname(__file__)
     return os.path.join(base_path, path)
 
+def _importtime(modules, top):
+    """python -X importtime في process جديد: أعلى الموديولات بالوقت التراكمي."""
+    code = "import importlib\n" + "".join(f"importlib.import_module({m!r})\n" for m in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True,
+                            text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:>9.1f} ms  {name}")
+    total = sum(c for c, name in rows if not name.startswith("  "))  # الموديولات top-level بس
+    print(f"  {total / 1000:>9.1f} ms  = الإجمالي")
+
+def _timed_imports(modules):
+    """نفس القياس جوه الـ process (الـ .exe مفيهوش -X importtime)."""
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            status = ""
+        except Exception as e:
+            status = f"  ❌ {type(e).__name__}"
+        print(f"  {(time.perf_counter() - start) * 1000:>9.1f} ms  {name}{status}")
+
+def startup_report(top=15):
+    """تقرير وقت الـ imports: المطلوب قبل أول رسم، والتقيل اللي بيتأجل لأول استخدام."""
+    frozen = getattr(sys, 'frozen', False)
+    print("⏱️ Startup imports (قبل أول رسم):")
+    _timed_imports(STARTUP_MODULES) if frozen else _importtime(STARTUP_MODULES, top)
+    print("\n⏳ On-demand (أول استخدام):")
+    _timed_imports(ON_DEMAND_MODULES)
+
 if __name__ == "__main__":
+    # ضروري للـ Parallel Render (ProcessPool) بعد التغليف بـ PyInstaller
+    multiprocessing.freeze_support()
+
+    if "--startup-report" in sys.argv:
+        startup_report()
+        sys.exit(0)
+
+    import streamlit.web.cli as stcli
+
     # 1. تحديد مسار التطبيق الرئيسي
     app_path = resolve_path("app.py")
-    
+
     # 2. إعداد أوامر تشغيل Streamlit
     sys.argv = [
         "streamlit",
@@ -23,7 +74,9 @@ if __name__ == "__main__":
         "--server.headless=true",  # تشغيل بدون واجهة تحكم
         "--theme.base=dark"        # فرض الثيم الداكن
     ]
-    
+    if getattr(sys, 'frozen', False):
+        sys.argv.append("--server.fileWatcherType=none")  # مفيش ملفات بتتعدل في الـ .exe
+
     # 3. التشغيل
     print(f"🚀 Launching AI Editor from: {app_path}")
-    sys.exit(stcli.main())
\ No newline at end of file
+    sys.exit(stcli.main())
@@ -1,4 +1,37 @@
 # Export modules for easy imports
-from . import ai_engine, media_engine, ui_utils, command_cache, preview_engine, session_manager, undo_redo, batch_processor, subtitle_engine
+# الموديولات بتتحمل عند أول وصول (PEP 562): `import utils` مبيحملش حاجة، و`utils.media_engine`
+# (أو `from utils import media_engine`) بيعمل import عادي كامل ساعتها.
+# مفيش LazyLoader: الـ module الفاضي كان بيبان لـ threads تانية (Batch / watch_folder / render_worker)
+# قبل ما يكمل تحميل → AttributeError. الـ import بيحصل تحت _lock فبيبان كامل أو ما يبانش.
+import importlib
+import importlib.util
+import sys
+import threading
 
-__all__ = ['ai_engine', 'media_engine', 'ui_utils', 'command_cache', 'preview_engine', 'session_manager', 'undo_redo', 'batch_processor', 'subtitle_engine']
+__all__ = ['ai_engine', 'media_engine', 'ui_utils', 'command_cache', 'preview_engine', 'session_manager', 'undo_redo', 'batch_processor', 'subtitle_engine', 'parallel_render']
+
+_lock = threading.RLock()  # RLock: import موديول بيعمل `from . import ...` لموديولات تانية من نفس الـ thread
+
+def _loaded(fullname: str):
+    """الـ module لو متحمل بالكامل (مش في نص import في thread تاني)."""
+    module = sys.modules.get(fullname)
+    spec = getattr(module, '__spec__', None)
+    if module is not None and not getattr(spec, '_initializing', False):
+        return module
+    return None
+
+def __getattr__(name: str):
+    if name.startswith('_'):
+        raise AttributeError(name)
+    fullname = f"{__name__}.{name}"
+    module = _loaded(fullname)
+    if module is None:
+        with _lock:
+            if importlib.util.find_spec(fullname) is None:
+                raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+            module = importlib.import_module(fullname)
+    globals()[name] = module
+    return module
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,191 @@
+"""
+Action Schema: validator واحد لقوائم الـ actions من أي مصدر (AI / Local Parser / Cache / قوالب / جلسات).
+
+- SPEC بيتحول (compile) مرة واحدة عند الـ import لـ checks جاهزة لكل action، فالتحقق = لفة واحدة
+  على القائمة من غير أي parsing.
+- لو مدة وأبعاد الفيديو معروفة (metadata جاهزة أو media_info: ffmpeg -i واحد لكل (path, size, mtime))
+  بيتعمل محاكاة للمدة والأبعاد خطوة بخطوة: قص بعد نهاية الفيديو، سرعة بتطلع ناتج أقل من فريم،
+  crop على فريم متقصوص قبل كده بيطلع أصغر من MIN_SIDE، ترجمة بعد نهاية الناتج.
+- بيشتغل عند كل مدخل قبل أي decode، فالـ job الغلط بيفشل في ملي ثواني مش في نص الريندر.
+"""
+import os
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from .frame_kernels import crop_box
+
+ASPECT_RATIOS = ("9:16", "16:9", "1:1")
+SUBTITLE_MODES = ("burn", "soft")
+MIN_SIDE = 16  # أصغر عرض/ارتفاع بعد الـ crop
+
+class Field(NamedTuple):
+    kind: str                      # num / str / choice / file
+    low: Optional[float] = None
+    high: Optional[float] = None
+    open_low: bool = False         # الحد الأدنى نفسه مش مسموح (مثلاً speed > 0)
+    choices: Tuple = ()
+    required: bool = False
+
+SPEC: Dict[str, Dict[str, Field]] = {
+    "trim": {"start": Field("num", 0), "end": Field("num", 0)},
+    "trim_last": {"duration": Field("num", 0, open_low=True)},
+    "mute": {},
+    "volume": {"level": Field("num", 0.0, 3.0)},
+    "speed": {"factor": Field("num", 0, 10, open_low=True)},
+    "black_white": {},
+    "music": {"volume": Field("num", 0.0, 2.0), "duck": Field("num", 0.0, 1.0)},
+    "rotate": {"angle": Field("num", -360, 360)},
+    "crop": {"aspect_ratio": Field("choice", choices=ASPECT_RATIOS)},
+    "subtitle": {"text": Field("str"), "start": Field("num", 0), "end": Field("num", 0),
+                 "fontsize": Field("num", 1, 500)},
+    "subtitle_file": {"path": Field("file", required=True), "mode": Field("choice", choices=SUBTITLE_MODES),
+                      "fontsize": Field("num", 1, 500)},
+    "normalize": {"target": Field("num", -40.0, -5.0)},
+}
+
+class ActionError(ValueError):
+    """action list مش صالحة (index = رقم الخطوة لو الخطأ في خطوة معينة)."""
+
+    def __init__(self, message: str, index: int = None):
+        super().__init__(message)
+        self.index = index
+
+# ==================== Compile ====================
+
+def _compile_field(name: str, field: Field) -> Callable[[object], Optional[str]]:
+    if field.kind == "num":
+        def check(value):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                return f"{name} لازم يكون رقم"
+            if field.low is not None and (number < field.low or (field.open_low and number == field.low)):
+                return f"{name} لازم يكون {'أكبر من' if field.open_low else 'على الأقل'} {field.low:g}"
+            if field.high is not None and number > field.high:
+                return f"{name} لازم يكون {field.high:g} بالكتير"
+            return None
+    elif field.kind == "choice":
+        def check(value):
+            return None if value in field.choices else f"{name} = {value} غير مدعوم ({' / '.join(field.choices)})"
+    elif field.kind == "file":
+        def check(value):
+            return None if isinstance(value, str) and os.path.exists(value) else f"الملف {value} غير موجود"
+    else:
+        def check(value):
+            return None if isinstance(value, str) else f"{name} لازم يكون نص"
+    return check
+
+def _compile(spec: Dict[str, Dict[str, Field]]) -> Dict[str, Tuple]:
+    return {action: tuple((name, _compile_field(name, field), field.required) for name, field in fields.items())
+            for action, fields in spec.items()}
+
+_COMPILED = _compile(SPEC)
+
+# ==================== Media ====================
+
+@lru_cache(maxsize=128)
+def _probe(path: str, size: int, mtime_ns: int) -> Optional[Dict]:
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    try:
+        infos = ffmpeg_parse_infos(path)
+    except Exception:
+        return None
+    width, height = infos.get('video_size') or (None, None)
+    return {'duration': infos.get('duration'), 'width': width, 'height': height, 'fps': infos.get('video_fps'),
+            'audio_rate': infos.get('audio_fps') if isinstance(infos.get('audio_fps'), int) else None}
+
+def media_info(path: str) -> Optional[Dict]:
+    """{'duration', 'width', 'height', 'fps', 'audio_rate'} من غير decode (محفوظة لحد ما الملف يتغير)."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return _probe(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+# ==================== Validation ====================
+
+def _step_error(step) -> Optional[str]:
+    if not isinstance(step, dict):
+        return "الخطوة لازم تكون object"
+    checks = _COMPILED.get(step.get("action"))
+    if checks is None:
+        return f"أمر غير معروف: {step.get('action')}"
+    for name, check, required in checks:
+        value = step.get(name)
+        if value is None:
+            if required:
+                return f"{name} مطلوب"
+            continue
+        message = check(value)
+        if message:
+            return message
+    if step["action"] in ("trim", "subtitle"):
+        start, end = float(step.get("start") or 0), step.get("end")
+        if end is not None and float(end) > 0 and float(end) <= start:
+            return "التوقيت غير منطقي (النهاية قبل البداية)"
+    return None
+
+def _simulate(actions: List[Dict], meta: Dict) -> Optional[Tuple[int, str]]:
+    """محاكاة المدة والأبعاد بنفس ترتيب media_engine.apply_edit_actions."""
+    duration = float(meta['duration'])
+    fps = float(meta.get('fps') or 0)
+    width, height = meta.get('width'), meta.get('height')
+    for i, step in enumerate(actions):
+        action = step["action"]
+        if action == "trim":
+            start, end = float(step.get("start") or 0), float(step.get("end") or 0)
+            if start >= duration:
+                return i, f"القص بيبدأ عند {start:g}ث والفيديو {duration:.1f}ث بس"
+            duration = (min(end, duration) if end > 0 else duration) - start
+        elif action == "trim_last":
+            duration = min(float(step.get("duration") or 0), duration)
+        elif action == "speed":
+            duration /= float(step.get("factor") or 1.0)
+            if fps and duration * fps < 1:
+                return i, f"السرعة دي هتطلع فيديو أقل من فريم واحد ({duration:.3f}ث)"
+        elif action == "crop" and width and height:
+            box = crop_box(step.get("aspect_ratio", "9:16"), width, height)
+            if box is None or min(box[2], box[3]) < MIN_SIDE:
+                return i, f"مينفعش قص {step.get('aspect_ratio', '9:16')} من فريم {width}x{height} (متقصوص قبل كده؟)"
+            width, height = box[2], box[3]
+        elif action == "rotate" and width and height:
+            angle = int(float(90 if step.get("angle") is None else step["angle"]))
+            if angle % 90 == 0 and (angle // 90) % 2:
+                width, height = height, width
+    for i, step in enumerate(actions):
+        if step["action"] == "subtitle" and float(step.get("start") or 0) >= duration:
+            return i, f"الترجمة بتبدأ بعد نهاية الفيديو ({duration:.1f}ث)"
+    return None
+
+def find_error(actions: List[Dict], video_path: str = None, metadata: Dict = None) -> Optional[Tuple[Optional[int], str]]:
+    """(رقم الخطوة، الرسالة) لأول خطأ، أو None لو القائمة سليمة."""
+    if not actions:
+        return None
+    if not isinstance(actions, list):
+        return None, "الأوامر لازم تكون list"
+    for i, step in enumerate(actions):
+        message = _step_error(step)
+        if message:
+            return i, message
+    meta = metadata or (media_info(video_path) if video_path else None)
+    if meta and meta.get('duration'):
+        return _simulate(actions, meta)
+    return None
+
+def _describe(actions: List[Dict], error: Tuple[Optional[int], str]) -> str:
+    index, message = error
+    if index is None:
+        return message
+    step = actions[index]
+    return f"الخطوة {index + 1} ({step.get('action') if isinstance(step, dict) else '?'}): {message}"
+
+def check(actions: List[Dict], video_path: str = None, metadata: Dict = None) -> str:
+    """رسالة أول خطأ للعرض، أو "" لو القائمة سليمة."""
+    error = find_error(actions, video_path, metadata)
+    return _describe(actions, error) if error else ""
+
+def validate(actions: List[Dict], video_path: str = None, metadata: Dict = None) -> List[Dict]:
+    """نفس check بس بترمي ActionError (للـ services)؛ بترجع نفس القائمة لو سليمة."""
+    error = find_error(actions, video_path, metadata)
+    if error:
+        raise ActionError(_describe(actions, error), error[0])
+    return actions
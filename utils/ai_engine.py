@@ -1,11 +1,10 @@
 import os
+import sys
 import json
 import re
-import google.generativeai as genai
-import streamlit as st
 from pydantic import BaseModel, Field, ValidationError, field_validator
 from typing import List, Optional, Literal
-from . import command_cache
+from . import action_schema, command_cache
 
 # ============================================
 # 🧠 ENHANCED LOCAL PARSER
@@ -103,6 +102,9 @@ class EnhancedLocalParser:
         if any(k in text for k in ['ضعف الصوت', 'double volume']):
             return {'action': 'volume', 'level': 2.0}
         
+        if any(k in text for k in ['وحد الصوت', 'توحيد الصوت', 'ظبط الصوت', 'normalize', 'loudness']):
+            return {'action': 'normalize'}
+        
         return None
     
     def parse_crop(self, text: str) -> Optional[dict]:
@@ -269,13 +271,15 @@ def quick_match(text: str) -> Optional[dict]:
 # ============================================
 
 class EditAction(BaseModel):
-    action: Literal["trim", "mute", "volume", "speed", "black_white", "music", "rotate", "crop", "subtitle", "trim_last"]
+    action: Literal["trim", "mute", "volume", "speed", "black_white", "music", "rotate", "crop", "subtitle", "trim_last", "normalize"]
     
     start: Optional[float] = Field(None, ge=0)
     end: Optional[float] = Field(None, ge=0)
     factor: Optional[float] = Field(None, gt=0, le=10)
     volume: Optional[float] = Field(None, ge=0.0, le=2.0)
     level: Optional[float] = Field(None, ge=0.0, le=3.0)
+    duck: Optional[float] = Field(None, ge=0.0, le=1.0)
+    target: Optional[float] = Field(None, ge=-40.0, le=-5.0)
     angle: Optional[int] = Field(None)
     aspect_ratio: Optional[str] = Field(None)
     duration: Optional[float] = Field(None, ge=0)
@@ -301,15 +305,34 @@ class CommandResponse(BaseModel):
 # AI CONFIGURATION
 # ============================================
 
+_genai_module = None
+
 def configure_ai():
+    """التحقق من الـ API Key بس؛ مكتبة genai (تقيلة) بتتحمل عند أول استدعاء فعلي لـ AI."""
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("API Key not found")
-    genai.configure(api_key=api_key)
+
+def _genai():
+    """google.generativeai (lazy import + configure مرة واحدة)."""
+    global _genai_module
+    if _genai_module is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai_module = genai
+    return _genai_module
+
+def _show_error(message: str):
+    """st.error جوه الواجهة، وprint برا Streamlit (الـ CLI ما بيحملوش خالص)."""
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        st.error(message)
+    else:
+        print(message, file=sys.stderr)
 
 def _get_system_prompt() -> str:
     return """Video editor. JSON only.
-Actions: trim(start,end), mute(), volume(level), speed(factor), black_white(), rotate(angle), crop(aspect_ratio), music(volume), subtitle(text,start,end).
+Actions: trim(start,end), mute(), volume(level), speed(factor), black_white(), rotate(angle), crop(aspect_ratio), music(volume,duck), normalize(target LUFS), subtitle(text,start,end).
 Output: {"transcription":"...","actions":[...]}"""
 
 # ============================================
@@ -323,18 +346,19 @@ def analyze_command(
     text_prompt: str = None, 
     use_cache: bool = True, 
     cache_threshold: float = 0.85,
-    video_duration: float = None
+    video_duration: float = None,
+    allow_ai: bool = True
 ) -> dict:
     """
     نظام هجين 4-مستويات:
     1. Quick Match (⚡)
     2. Local Parser (🚀)
     3. Cache (💾)
-    4. AI (🤖) - آخر حل
+    4. AI (🤖) - آخر حل (allow_ai=False: المستويات المحلية بس، للـ CLI / الـ scripts)
     """
     
     if audio_path:
-        return _ai_fallback(audio_path, None, use_cache)
+        return _ai_fallback(audio_path, None, use_cache) if allow_ai else None
     
     if not text_prompt:
         return None
@@ -346,7 +370,7 @@ def analyze_command(
     
     # Level 2: Parser
     local_result = _parser.parse(text_prompt, video_duration)
-    if local_result:
+    if local_result and not action_schema.check(local_result['actions']):
         if use_cache:
             command_cache.save_command(text_prompt, local_result['actions'], local_result['transcription'])
         return local_result
@@ -354,7 +378,7 @@ def analyze_command(
     # Level 3: Cache
     if use_cache:
         cached = command_cache.find_similar_command(text_prompt, threshold=cache_threshold)
-        if cached:
+        if cached and not action_schema.check(cached['actions']):
             return {
                 'transcription': cached['transcription'] or text_prompt,
                 'actions': cached['actions'],
@@ -365,10 +389,11 @@ def analyze_command(
             }
     
     # Level 4: AI
-    return _ai_fallback(None, text_prompt, use_cache)
+    return _ai_fallback(None, text_prompt, use_cache) if allow_ai else None
 
 def _ai_fallback(audio_path: str = None, text_prompt: str = None, use_cache: bool = True) -> dict:
     """استدعاء AI."""
+    genai = _genai()
     model = genai.GenerativeModel('gemini-2.5-flash')
     prompt_content = [_get_system_prompt()]
     
@@ -386,6 +411,7 @@ def _ai_fallback(audio_path: str = None, text_prompt: str = None, use_cache: boo
         
         validated = CommandResponse(**data)
         result = validated.model_dump()
+        action_schema.validate(result['actions'])
         result['from_cache'] = False
         result['source'] = 'AI 🤖'
         result['tokens_saved'] = 0
@@ -395,7 +421,7 @@ def _ai_fallback(audio_path: str = None, text_prompt: str = None, use_cache: boo
         
         return result
     except Exception as e:
-        st.error(f"❌ AI Error: {e}")
+        _show_error(f"❌ AI Error: {e}")
         return None
 
 # ============================================
@@ -424,6 +450,7 @@ def parse_confirmation_command(audio_path: str = None, text: str = None) -> Opti
     
     if audio_path:
         try:
+            genai = _genai()
             model = genai.GenerativeModel('gemini-2.5-flash')
             res = model.generate_content(["yes/no/edit", genai.upload_file(audio_path)])
             txt = res.text.lower()
@@ -0,0 +1,137 @@
+"""
+App Cache: memoization لحسابات الواجهة الغالية عشان الـ rerun (slider / tab / زرار)
+ميعملش أي شغل على الميديا.
+
+- الرفع: الملف بيتحفظ مرة واحدة باسم = hash المحتوى في TEMP_DIR/uploads
+  (نفس الملف من أي جلسة = نفس المسار)، والجلسة بتفتكر file_id → path
+  ومتسجلة كـ owner للملف في temp_manager (الـ quota والتنظيف هناك).
+- metadata / فريمات الـ timeline: st.cache_data بمفتاح (path, size, mtime) + max_entries.
+- القوالب والإحصائيات والـ Backup: مفتاحها "نسخة" قاعدة البيانات (size + mtime)، فأي كتابة بتلغي الكاش لوحدها.
+"""
+import hashlib
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+import streamlit as st
+from . import action_schema, session_manager, temp_manager
+from .config import TEMP_DIR, DB_CACHE_PATH
+
+UPLOAD_DIR = TEMP_DIR / "uploads"
+RECORDINGS_DIR = TEMP_DIR / "recordings"
+HASH_CHUNK = 8 * 1024 * 1024
+
+# ==================== Upload Persistence ====================
+
+def _content_hash(buffer) -> str:
+    digest = hashlib.sha256()
+    view = memoryview(buffer)
+    for i in range(0, len(view), HASH_CHUNK):
+        digest.update(view[i:i + HASH_CHUNK])
+    return digest.hexdigest()[:32]
+
+def session_owner() -> str:
+    """owner الجلسة الحالية في temp_manager."""
+    return f"session:{st.session_state.setdefault('session_id', uuid.uuid4().hex)}"
+
+def _write_once(data, suffix: str) -> str:
+    """كتابة المحتوى باسم الـ hash بتاعه (لو موجود بيترجع زي ما هو)."""
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = str(UPLOAD_DIR / f"{_content_hash(data)}{suffix.lower()}")
+    if not os.path.exists(path):
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)  # atomic: جلسة تانية مش هتشوف ملف ناقص
+    return path
+
+def persist_upload(uploaded_file) -> Optional[str]:
+    """
+    بديل media_engine.save_uploaded_file للواجهة: نفس الرفع في reruns متتالية
+    بيرجع نفس المسار بدون قراءة أو كتابة أي bytes.
+    """
+    if uploaded_file is None:
+        return None
+    known: Dict[str, str] = st.session_state.setdefault('_persisted_uploads', {})
+    key = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    path = known.get(key)
+    if path and os.path.exists(path):
+        temp_manager.touch(path, session_owner())
+        return path
+    try:
+        path = _write_once(uploaded_file.getbuffer(), os.path.splitext(uploaded_file.name)[1])
+        temp_manager.register(path, "upload", session_owner())
+    except Exception as e:
+        print(f"File save error: {e}")
+        return None
+    known[key] = path
+    return path
+
+def history_key(path: str) -> str:
+    """مفتاح تاريخ Undo للرفع ده (اسم الملف = hash المحتوى)؛ نفس مفتاح project_bundle للفيديو ده."""
+    return session_manager.history_key(os.path.splitext(os.path.basename(path))[0])
+
+def persist_recording(audio) -> str:
+    """حفظ تسجيل audiorecorder (pydub AudioSegment) كـ wav مرة واحدة لكل تسجيل."""
+    RECORDINGS_DIR.mkdir(parents=True, exist_ok=True)
+    path = str(RECORDINGS_DIR / f"{_content_hash(audio.raw_data)}.wav")
+    if os.path.exists(path):
+        temp_manager.touch(path, session_owner())
+    else:
+        audio.export(path, format="wav")
+        temp_manager.register(path, "recording", session_owner())
+    return path
+
+# ==================== Media Work ====================
+
+def _file_key(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return path, stat.st_size, stat.st_mtime_ns
+
+def video_metadata(path: str) -> Optional[Dict]:
+    """المدة / الأبعاد / FPS / الحجم (None لو الملف مش مقروء) — نفس probe الـ validator (action_schema.media_info)."""
+    info = action_schema.media_info(path)
+    if not info or not info.get('duration'):
+        return None
+    return {**info, 'size_mb': os.path.getsize(path) / (1024 * 1024)}
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _frames(path: str, size: int, mtime_ns: int, num_frames: int) -> List:
+    from . import media_engine
+    return media_engine.extract_timeline_frames(path, num_frames=num_frames)
+
+def timeline_frames(path: str, num_frames: int = 10) -> List:
+    """فريمات الـ timeline [(t, PIL.Image)] لملف معين (بتتحسب مرة واحدة)."""
+    return _frames(*_file_key(path), num_frames)
+
+# ==================== Database Views ====================
+
+def _db_version() -> Tuple[int, int]:
+    try:
+        stat = os.stat(DB_CACHE_PATH)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return 0, 0
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _templates(version: Tuple[int, int]) -> List[Dict]:
+    from . import command_cache
+    return command_cache.get_all_templates()
+
+def templates() -> List[Dict]:
+    return _templates(_db_version())
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _ai_stats(version: Tuple[int, int]) -> Dict:
+    from . import ai_engine
+    return ai_engine.get_ai_optimization_stats()
+
+def ai_stats() -> Dict:
+    return _ai_stats(_db_version())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _backup_json(version: Tuple[int, int]) -> str:
+    from . import command_cache
+    return command_cache.export_db_to_json()
+
+def backup_json() -> str:
+    return _backup_json(_db_version())
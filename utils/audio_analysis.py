@@ -0,0 +1,188 @@
+"""
+Audio Analysis: قياس الـ Loudness (EBU R128 تقريبي) + منحنى نشاط الكلام للفيديو الأصلي
+في تمريرة FFmpeg واحدة، والنتيجة تتخزن في SQLite لكل ملف (مفيش إعادة حساب لنفس الملف).
+
+- FFmpeg يطلع 3 قنوات: K-weighted (L, R) + نطاق الكلام (300-3400 Hz) mono.
+- NumPy يحسب طاقة كل block (100ms) دفعة واحدة، ومنها:
+  momentary (400ms) / short-term (3s) / integrated LUFS مع الـ gating.
+- منحنى الكلام يُستخدم لخفض الموسيقى (sidechain ducking) في audio_mixer.
+"""
+import hashlib
+import os
+import subprocess
+from typing import List, Dict, Optional
+import numpy as np
+from . import command_cache, timeline
+from .config import get_ffmpeg_path
+
+ANALYSIS_RATE = 48000
+STEP_SECONDS = 0.1                # طول الـ block
+BLOCK_SAMPLES = int(ANALYSIS_RATE * STEP_SECONDS)
+READ_BLOCKS = 100                 # عدد الـ blocks في كل قراءة من الـ pipe
+MOMENTARY_BLOCKS = 4              # 400ms
+SHORT_TERM_BLOCKS = 30            # 3s
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+TARGET_LUFS = -16.0               # مستوى المنصات (YouTube / Reels) تقريباً
+MAX_GAIN_DB = 20.0
+SPEECH_FLOOR_DB = -45.0           # طاقة نطاق الكلام الأقل منها = صمت
+SPEECH_RATIO = 0.25               # نسبة طاقة نطاق الكلام من الإجمالي
+SPEECH_HOLD_BLOCKS = 5            # إبقاء الـ duck نص ثانية بعد آخر كلام
+DEFAULT_DUCK = 0.6
+ANALYSIS_VERSION = 1
+
+# K-weighting تقريبي: high-shelf (+4dB) + high-pass (RLB) - نفس فلاتر BS.1770
+_FILTERGRAPH = (
+    f"[0:a:0]aresample={ANALYSIS_RATE},aformat=sample_fmts=flt:channel_layouts=stereo,asplit=2[k][s];"
+    "[k]highshelf=f=1681:g=4:t=q:w=0.71,highpass=f=38:poles=2[kw];"
+    "[s]pan=mono|c0=0.5*c0+0.5*c1,highpass=f=300,lowpass=f=3400[sp];"
+    "[kw][sp]amerge=inputs=2[out]"
+)
+
+def _to_lufs(energy):
+    return -0.691 + 10 * np.log10(np.maximum(energy, 1e-12))
+
+def _moving_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """متوسط متحرك (نافذة تنتهي عند كل block)."""
+    if len(values) == 0:
+        return values
+    sums = np.convolve(values, np.ones(window, dtype=np.float64))[:len(values)]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+class AudioAnalysis:
+    """طاقات الـ blocks للمصدر + القياسات المشتقة منها."""
+
+    def __init__(self, k_energy: np.ndarray, speech_energy: np.ndarray):
+        self.k_energy = k_energy
+        self.speech_energy = speech_energy
+        self._speech = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.k_energy) * STEP_SECONDS
+
+    def _blocks(self, start: float = 0.0, end: float = None) -> slice:
+        first = max(0, int(start / STEP_SECONDS))
+        last = len(self.k_energy) if end is None else int(np.ceil(end / STEP_SECONDS))
+        return slice(first, max(first, last))
+
+    def short_term_loudness(self) -> np.ndarray:
+        """Short-term LUFS (نافذة 3 ثواني) لكل block."""
+        return _to_lufs(_moving_mean(self.k_energy, SHORT_TERM_BLOCKS))
+
+    def integrated_loudness(self, start: float = 0.0, end: float = None) -> Optional[float]:
+        """Integrated LUFS لفترة من المصدر (gating مطلق -70 ثم نسبي -10)."""
+        energy = self.k_energy[self._blocks(start, end)]
+        if len(energy) < MOMENTARY_BLOCKS:
+            return None
+        momentary = np.convolve(energy, np.ones(MOMENTARY_BLOCKS) / MOMENTARY_BLOCKS, mode='valid')
+        gated = momentary[_to_lufs(momentary) > ABSOLUTE_GATE]
+        if len(gated) == 0:
+            return None
+        relative = _to_lufs(gated.mean()) + RELATIVE_GATE
+        gated = gated[_to_lufs(gated) > relative]
+        return float(_to_lufs(gated.mean()))
+
+    def speech_envelope(self) -> np.ndarray:
+        """منحنى نشاط الكلام (0..1) لكل block."""
+        if self._speech is None:
+            speech_db = 10 * np.log10(np.maximum(self.speech_energy, 1e-12))
+            active = (speech_db > SPEECH_FLOOR_DB) & (self.speech_energy > SPEECH_RATIO * self.k_energy / 2)
+            held = active.astype(np.float32)
+            if len(held) >= SPEECH_HOLD_BLOCKS:
+                padded = np.concatenate([np.zeros(SPEECH_HOLD_BLOCKS - 1, np.float32), held])
+                held = np.lib.stride_tricks.sliding_window_view(padded, SPEECH_HOLD_BLOCKS).max(axis=1)
+            self._speech = _moving_mean(held, 3).astype(np.float32)
+        return self._speech
+
+# ==================== التحليل (FFmpeg + NumPy) ====================
+
+def _measure(path: str) -> Optional[AudioAnalysis]:
+    """تمريرة FFmpeg واحدة: طاقة كل block لقناتي K-weighted ونطاق الكلام."""
+    ffmpeg = get_ffmpeg_path()
+    if not ffmpeg:
+        return None
+    proc = subprocess.Popen(
+        [ffmpeg, '-v', 'error', '-i', path, '-vn', '-filter_complex', _FILTERGRAPH,
+         '-map', '[out]', '-f', 'f32le', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    block_bytes = BLOCK_SAMPLES * 3 * 4
+    energies, pending = [], b''
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes * READ_BLOCKS)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % block_bytes
+            pending = data[usable:]
+            blocks = np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, BLOCK_SAMPLES, 3)
+            energies.append(np.mean(np.square(blocks, dtype=np.float64), axis=1))
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if not energies:
+        return None
+    energy = np.concatenate(energies)
+    return AudioAnalysis(energy[:, 0] + energy[:, 1], energy[:, 2])
+
+def _file_key(path: str) -> str:
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|v{ANALYSIS_VERSION}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+def _connect():
+    """نفس قاعدة command_cache (الجدول بيتعمل في init_database، مرة لكل process وبعد clear_cache)."""
+    return command_cache._connect()
+
+def analyze(path: str) -> Optional[AudioAnalysis]:
+    """تحليل صوت الملف (من الكاش لو نفس الملف اتحلل قبل كده)."""
+    if not path or not os.path.exists(path):
+        return None
+    key = _file_key(path)
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT blocks, energies FROM audio_analysis WHERE file_key = ?", (key,)).fetchone()
+        if row:
+            energy = np.frombuffer(row[1], dtype=np.float64).reshape(2, row[0])
+            return AudioAnalysis(energy[0], energy[1])
+
+        analysis = _measure(path)
+        if analysis is not None:
+            blob = np.stack([analysis.k_energy, analysis.speech_energy]).tobytes()
+            conn.execute("INSERT OR REPLACE INTO audio_analysis (file_key, path, blocks, energies) VALUES (?, ?, ?, ?)",
+                         (key, path, len(analysis.k_energy), blob))
+            conn.commit()
+        return analysis
+    except Exception as e:
+        print(f"Audio analysis error: {e}")
+        return None
+    finally:
+        conn.close()
+
+# ==================== الاستخدام وقت التعديل ====================
+
+def normalize_gain(path: str, actions: List[Dict], duration: float, target: float = TARGET_LUFS) -> float:
+    """Gain خطي يوصل الجزء المستخدم من المصدر لـ target LUFS (1.0 لو مفيش قياس)."""
+    analysis = analyze(path)
+    if analysis is None:
+        return 1.0
+    start = timeline.output_to_source(0.0, actions)
+    end = timeline.output_to_source(duration, actions)
+    loudness = analysis.integrated_loudness(start, end)
+    if loudness is None:
+        return 1.0
+    gain_db = float(np.clip(target - loudness, -MAX_GAIN_DB, MAX_GAIN_DB))
+    return 10 ** (gain_db / 20)
+
+def output_speech_envelope(path: str, actions: List[Dict], duration: float) -> Optional[np.ndarray]:
+    """منحنى الكلام بزمن الناتج (block كل STEP_SECONDS) بعد trim / speed."""
+    analysis = analyze(path)
+    if analysis is None:
+        return None
+    envelope = analysis.speech_envelope()
+    times = np.arange(0.0, duration, STEP_SECONDS)
+    source_times = np.array([timeline.output_to_source(t, actions) for t in times])
+    return np.interp(source_times / STEP_SECONDS, np.arange(len(envelope)), envelope).astype(np.float32)
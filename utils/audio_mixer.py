@@ -0,0 +1,147 @@
+"""
+Audio Mixer متدفق: دمج صوت الفيديو مع الموسيقى الخلفية على دفعات (blocks) ثابتة الحجم
+بدل afx.audio_loop + CompositeAudioClip اللي بيبنوا مصفوفات صوت كبيرة في الذاكرة.
+
+- الموسيقى تُفك بـ FFmpeg كـ stream (PCM float32) وتتكرر بإعادة تشغيل الـ stream.
+- الـ volume / loop / ducking تتطبق بـ NumPy على كل block.
+  الـ ducking بيتبع منحنى الكلام من audio_analysis لو متاح، وإلا RMS الصوت الأصلي.
+- الناتج يُكتب مباشرة لـ FFmpeg encoder (stdin) كملف صوت جاهز للدمج مع الفيديو.
+استهلاك الذاكرة ثابت مهما كان طول الفيديو.
+"""
+import subprocess
+import numpy as np
+from .config import get_ffmpeg_path
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BLOCK_SECONDS = 1.0
+DUCK_THRESHOLD = 0.02  # RMS الصوت الأصلي اللي فوقه الموسيقى تنخفض
+AUDIO_EXTENSIONS = {"aac": ".m4a", "libvorbis": ".ogg"}
+
+class MusicStream:
+    """قراءة ملف الموسيقى كـ PCM على دفعات مع تكرار تلقائي (loop)."""
+
+    def __init__(self, path: str, sample_rate: int = SAMPLE_RATE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.proc = None
+        self._open()
+
+    def _open(self):
+        self.close()
+        self.proc = subprocess.Popen(
+            [get_ffmpeg_path(), '-v', 'error', '-i', self.path, '-vn',
+             '-f', 'f32le', '-ac', str(CHANNELS), '-ar', str(self.sample_rate), '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+
+    def read(self, frames: int) -> np.ndarray:
+        """قراءة عدد frames محدد (يرجع لأول الملف عند النهاية)."""
+        block = np.zeros((frames, CHANNELS), dtype=np.float32)
+        filled, restarts = 0, 0
+        while filled < frames:
+            wanted = (frames - filled) * CHANNELS * 4
+            data = self.proc.stdout.read(wanted)
+            if not data:
+                restarts += 1
+                if restarts > 1:  # ملف فاضي أو تالف: نكمل بصمت
+                    break
+                self._open()
+                continue
+            restarts = 0
+            samples = np.frombuffer(data[:len(data) - len(data) % (CHANNELS * 4)], dtype=np.float32)
+            chunk = samples.reshape(-1, CHANNELS)
+            block[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+        return block
+
+    def close(self):
+        if self.proc:
+            self.proc.stdout.close()
+            self.proc.kill()
+            self.proc.wait()
+            self.proc = None
+
+def _source_blocks(audio, duration: float, block_frames: int, sample_rate: int):
+    """دفعات صوت الفيديو (أو صمت لو الفيديو بدون صوت)."""
+    total = int(round(duration * sample_rate))
+    if audio is None:
+        for start in range(0, total, block_frames):
+            yield np.zeros((min(block_frames, total - start), CHANNELS), dtype=np.float32)
+        return
+    for chunk in audio.iter_chunks(chunksize=block_frames, fps=sample_rate, quantize=False):
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(len(chunk), -1)
+        if chunk.shape[1] != CHANNELS:
+            chunk = np.repeat(chunk[:, :1], CHANNELS, axis=1)
+        yield chunk
+
+def _duck_gain(source: np.ndarray, previous: float, duck: float) -> np.ndarray:
+    """منحنى gain للموسيقى داخل الـ block (ramp ناعم لتجنب الطقطقة)."""
+    rms = float(np.sqrt(np.mean(np.square(source)))) if len(source) else 0.0
+    target = 1.0 - duck if rms > DUCK_THRESHOLD else 1.0
+    return np.linspace(previous, target, len(source), dtype=np.float32)[:, None]
+
+def _speech_gain(speech: np.ndarray, speech_step: float, offset: int,
+                 frames: int, duck: float, sample_rate: int) -> np.ndarray:
+    """منحنى gain للموسيقى من منحنى الكلام (sidechain) بدقة الـ sample."""
+    times = (offset + np.arange(frames, dtype=np.float64)) / sample_rate
+    envelope = np.interp(times / speech_step, np.arange(len(speech)), speech)
+    return (1.0 - duck * envelope).astype(np.float32)[:, None]
+
+def mix_blocks(audio, duration: float, music_path: str, volume: float = 0.3,
+               duck: float = 0.0, sample_rate: int = SAMPLE_RATE,
+               speech: np.ndarray = None, speech_step: float = 0.1):
+    """Generator: دفعات الصوت النهائي (أصلي + موسيقى) كـ float32 (n, 2)."""
+    block_frames = int(BLOCK_SECONDS * sample_rate)
+    music = MusicStream(music_path, sample_rate) if music_path else None
+    gain, offset = 1.0, 0
+    try:
+        for source in _source_blocks(audio, duration, block_frames, sample_rate):
+            mixed = source
+            if music:
+                music_block = music.read(len(source))
+                music_block *= volume
+                if duck > 0 and speech is not None and len(speech):
+                    music_block *= _speech_gain(speech, speech_step, offset, len(source), duck, sample_rate)
+                elif duck > 0:
+                    ramp = _duck_gain(source, gain, duck)
+                    gain = float(ramp[-1, 0]) if len(ramp) else gain
+                    music_block *= ramp
+                mixed += music_block
+            offset += len(source)
+            np.clip(mixed, -1.0, 1.0, out=mixed)
+            yield mixed
+    finally:
+        if music:
+            music.close()
+
+def render_mixed_audio(audio, duration: float, output_path: str, music_path: str = None,
+                       volume: float = 0.3, duck: float = 0.0, codec: str = "aac",
+                       sample_rate: int = SAMPLE_RATE, speech: np.ndarray = None,
+                       speech_step: float = 0.1) -> str:
+    """
+    كتابة الصوت المدمج مباشرة لـ FFmpeg encoder (بدون تحميل المسار كامل).
+    فشل الـ encoder بيرمي RuntimeError: التصدير يفشل بدل فيديو من غير صوت.
+    """
+    encoder = subprocess.Popen(
+        [get_ffmpeg_path(), '-y', '-v', 'error', '-f', 'f32le', '-ar', str(sample_rate),
+         '-ac', str(CHANNELS), '-i', '-', '-c:a', codec, output_path],
+        stdin=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    broken = False
+    try:
+        for block in mix_blocks(audio, duration, music_path, volume, duck, sample_rate,
+                                speech, speech_step):
+            encoder.stdin.write(block.tobytes())
+    except BrokenPipeError:
+        broken = True  # الـ encoder وقف؛ السبب في stderr
+    finally:
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            broken = True
+        stderr = encoder.stderr.read()
+        encoder.wait()
+    if broken or encoder.returncode != 0:
+        raise RuntimeError(f"Audio mix failed: {stderr.decode(errors='replace').strip()[-500:]}")
+    return output_path
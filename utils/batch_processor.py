@@ -1,22 +1,31 @@
 """
 Batch Processing: معالجة عدة فيديوهات بنفس الأوامر.
+التقدم الحقيقي (فريمات / fps / ETA) من progress events لكل فيديو، ويتجمع في الـ thread الرئيسي.
 """
 import os
-import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import List, Dict, Callable
 from moviepy.editor import VideoFileClip
-from . import media_engine
+from . import action_schema, media_engine, encoder_profile, progress, template_plans
 
-def process_single_video(video_path: str, actions: List[Dict], music_path: str = None, output_dir: str = "My_Produced_Videos") -> Dict:
-    """معالجة فيديو واحد."""
+def process_single_video(video_path: str, actions: List[Dict], music_path: str = None, output_dir: str = None,
+                         progress_callback: Callable = None, plan: Dict = None, format: str = "mp4") -> Dict:
+    """معالجة فيديو واحد (progress_callback بياخد progress events؛ plan = render plan قالب جاهزة)."""
     try:
-        clip = VideoFileClip(video_path)
-        final_clip = media_engine.apply_edit_actions(clip, actions, music_path)
-        output_path = media_engine.export_video(final_clip, output_dir)
-        
-        clip.close()
-        final_clip.close()
+        action_schema.validate(actions, video_path)  # مدة/أبعاد الفيديو ده قبل ما يتفتح
+        # ترجمة soft بس: stream copy من غير ريندر
+        output_path = media_engine.remux_soft_subtitles(video_path, actions, output_dir, format)
+        if output_path is None and plan is not None:
+            output_path = template_plans.render_plan(plan, video_path, output_dir, format, music_path,
+                                                     progress_callback)
+        elif output_path is None:
+            clip = VideoFileClip(video_path)
+            final_clip = media_engine.apply_edit_actions(clip, actions, music_path)
+            output_path = media_engine.export_video(final_clip, output_dir, format, progress=progress_callback)
+            
+            clip.close()
+            final_clip.close()
         
         return {
             'input': video_path,
@@ -32,7 +41,8 @@ def process_single_video(video_path: str, actions: List[Dict], music_path: str =
         }
 
 def batch_process(video_paths: List[str], actions: List[Dict], music_path: str = None, 
-                  max_workers: int = 2, progress_callback: Callable = None) -> List[Dict]:
+                  max_workers: int = None, progress_callback: Callable = None,
+                  output_dir: str = None, plan: Dict = None, format: str = "mp4") -> List[Dict]:
     """
     معالجة عدة فيديوهات بشكل متوازي.
     
@@ -40,30 +50,62 @@ def batch_process(video_paths: List[str], actions: List[Dict], music_path: str =
         video_paths: قائمة بمسارات الفيديوهات
         actions: قائمة الأوامر
         music_path: مسار الموسيقى (اختياري)
-        max_workers: عدد العمال المتوازيين (افتراضي 2)
-        progress_callback: دالة callback للتقدم (current, total)
+        max_workers: عدد العمال المتوازيين (افتراضي حسب الأنوية - encoder_profile)
+        progress_callback: دالة callback للتقدم (current, total, event):
+            current = عدد الفيديوهات اللي خلصت، event = آخر progress event
+            (frame / fps / bytes / ETA + 'overall' نسبة الـ batch كلها + 'video_index')
+        output_dir: مجلد الإخراج (افتراضي OUTPUT_DIR من config)
+        plan: render plan قالب (template_plans) — بتتطبق على كل الفيديوهات من غير planning تاني
+        format: صيغة الإخراج
     
     Returns:
         قائمة بنتائج المعالجة
     """
+    error = action_schema.check(actions)
+    if error:
+        return [{'input': path, 'output': None, 'status': 'error', 'error': error} for path in video_paths]
+    
     results = []
     total = len(video_paths)
+    max_workers = encoder_profile.batch_workers(total, requested=max_workers)
+    # الـ events بتيجي من threads العمال؛ الـ callback بيتنادى من الـ thread ده بس (Streamlit)
+    events = queue.Queue()
+    fractions = [0.0] * total
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # حجز الـ jobs مقدماً: أول تصدير ما ياخدش كل الأنوية لوحده
+    with encoder_profile.reserve(max_workers), ThreadPoolExecutor(max_workers=max_workers) as executor:
         # إرسال المهام
         futures = {
-            executor.submit(process_single_video, path, actions, music_path): path
-            for path in video_paths
+            executor.submit(process_single_video, path, actions, music_path, output_dir,
+                            lambda event, i=i: events.put((i, event)), plan, format): i
+            for i, path in enumerate(video_paths)
         }
         
-        # جمع النتائج
+        # جمع النتائج + التقدم
         completed = 0
-        for future in as_completed(futures):
-            result = future.result()
-            results.append(result)
-            completed += 1
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=progress.MIN_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                results.append(future.result())
+                fractions[futures[future]] = 1.0
+                completed += 1
             
-            if progress_callback:
-                progress_callback(completed, total)
+            latest = _drain_events(events, fractions)
+            if progress_callback and (done or latest):
+                event = {**(latest or {}), 'overall': sum(fractions) / total}
+                progress_callback(completed, total, event)
     
     return results
+
+def _drain_events(events: queue.Queue, fractions: List[float]) -> Dict:
+    """تحديث نسبة كل فيديو من الـ events المتجمعة؛ يرجع آخر event (مع رقم الفيديو)."""
+    latest = None
+    while True:
+        try:
+            index, event = events.get_nowait()
+        except queue.Empty:
+            return latest
+        if event.get('stage') == 'video' and fractions[index] < 1.0:
+            fractions[index] = event['progress']
+        latest = {**event, 'video_index': index}
@@ -0,0 +1,139 @@
+"""
+رسم نصوص الـ Subtitles باستخدام Pillow بدل ImageMagick.
+كل نص فريد (النص + الخط + الحجم + الألوان + العرض) يُرسم مرة واحدة فقط
+كمصفوفة RGBA ويُحفظ في LRU Cache، ثم يُدمج على الفريمات بالـ alpha.
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, ImageColor, features
+
+# تشكيل الحروف العربية (اختياري) - نستخدمه فقط لو Pillow بدون libraqm
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:
+    arabic_reshaper = None
+    get_display = None
+
+CACHE_SIZE = 256
+PADDING = 10
+LINE_SPACING = 6
+
+_HAS_RAQM = features.check('raqm')
+_RTL_RE = re.compile('[\u0590-\u08FF\uFB1D-\uFDFF\uFE70-\uFEFF]')
+
+# أسماء خطوط ImageMagick -> ملفات خطوط حقيقية (Windows / Linux / Mac)
+_FONT_FILES = {
+    'arial': ['arial.ttf', 'Arial.ttf', 'DejaVuSans.ttf', 'NotoSansArabic-Regular.ttf'],
+    'arial-bold': ['arialbd.ttf', 'Arial Bold.ttf', 'DejaVuSans-Bold.ttf', 'NotoSansArabic-Bold.ttf'],
+}
+
+def is_rtl(text: str) -> bool:
+    """هل النص يحتوي حروف عربية/عبرية (اتجاه من اليمين لليسار)؟"""
+    return bool(_RTL_RE.search(text or ''))
+
+@lru_cache(maxsize=32)
+def load_font(font: str, fontsize: int) -> ImageFont.ImageFont:
+    """تحميل الخط مع fallback لخطوط النظام ثم خط Pillow الافتراضي."""
+    candidates = [font] + _FONT_FILES.get((font or '').lower(), _FONT_FILES['arial-bold'])
+    for name in candidates:
+        try:
+            return ImageFont.truetype(name, fontsize)
+        except (OSError, ValueError):
+            continue
+    return ImageFont.load_default(size=fontsize)
+
+def parse_color(color: Optional[str], default=(255, 255, 255, 255)) -> Tuple[int, int, int, int]:
+    """تحويل اسم اللون/Hex إلى RGBA. 'transparent' أو None = شفاف."""
+    if not color or str(color).lower() in ('transparent', 'none'):
+        return (0, 0, 0, 0)
+    try:
+        rgb = ImageColor.getrgb(str(color))
+        return rgb if len(rgb) == 4 else rgb + (255,)
+    except ValueError:
+        print(f"Caption color error: {color}")
+        return default
+
+def _shape(line: str) -> str:
+    """تشكيل السطر العربي وترتيبه بصرياً (عند غياب libraqm)."""
+    if _HAS_RAQM or not is_rtl(line) or arabic_reshaper is None:
+        return line
+    return get_display(arabic_reshaper.reshape(line))
+
+def _text_kwargs(text: str) -> dict:
+    """خيارات الرسم: libraqm يتولى التشكيل والاتجاه بنفسه."""
+    if _HAS_RAQM and is_rtl(text):
+        return {'direction': 'rtl', 'language': 'ar'}
+    return {}
+
+def _line_width(draw: ImageDraw.ImageDraw, line: str, font) -> float:
+    return draw.textlength(_shape(line), font=font, **_text_kwargs(line))
+
+def wrap_text(text: str, font, max_width: int) -> list:
+    """تقسيم النص لأسطر حسب العرض المتاح (بالترتيب المنطقي قبل التشكيل)."""
+    draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        current = ''
+        for word in paragraph.split():
+            candidate = f"{current} {word}".strip()
+            if current and _line_width(draw, candidate, font) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+@lru_cache(maxsize=CACHE_SIZE)
+def render_caption(text: str, font: str = 'Arial-Bold', fontsize: int = 50,
+                   color: str = 'white', bg_color: Optional[str] = 'black',
+                   max_width: int = 1000) -> np.ndarray:
+    """
+    رسم النص مرة واحدة كمصفوفة RGBA (H, W, 4) بعرض max_width.
+    النتيجة محفوظة في LRU Cache ومقفولة للكتابة (read-only).
+    """
+    pil_font = load_font(font, int(fontsize))
+    inner_width = max(1, int(max_width) - 2 * PADDING)
+    lines = wrap_text(text, pil_font, inner_width)
+
+    ascent, descent = pil_font.getmetrics()
+    line_height = ascent + descent
+    height = len(lines) * line_height + (len(lines) - 1) * LINE_SPACING + 2 * PADDING
+
+    canvas = Image.new('RGBA', (int(max_width), height), parse_color(bg_color, (0, 0, 0, 255)))
+    draw = ImageDraw.Draw(canvas)
+    fill = parse_color(color)
+    for i, line in enumerate(lines):
+        x = (int(max_width) - _line_width(draw, line, pil_font)) / 2
+        y = PADDING + i * (line_height + LINE_SPACING)
+        draw.text((x, y), _shape(line), font=pil_font, fill=fill, **_text_kwargs(line))
+
+    rgba = np.asarray(canvas, dtype=np.uint8)
+    rgba.flags.writeable = False
+    return rgba
+
+def composite_caption(frame: np.ndarray, caption: np.ndarray, x: int, y: int) -> np.ndarray:
+    """
+    دمج الـ caption (RGBA) على الفريم (RGB) بالـ alpha في نفس المكان.
+    الفريم لازم يكون قابل للكتابة. الأجزاء الخارجة عن الفريم يتم قصها.
+    """
+    fh, fw = frame.shape[:2]
+    ch, cw = caption.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(fw, x + cw), min(fh, y + ch)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    src = caption[y0 - y:y1 - y, x0 - x:x1 - x]
+    alpha = src[..., 3:4].astype(np.uint16)
+    region = frame[y0:y1, x0:x1, :3]
+    blended = (src[..., :3] * alpha + region * (255 - alpha) + 127) // 255
+    region[...] = blended.astype(np.uint8)
+    return frame
+
+def cache_info():
+    """إحصائيات الـ LRU Cache (hits / misses / currsize)."""
+    return render_caption.cache_info()
@@ -7,10 +7,13 @@ import json
 import os
 from typing import Optional, Dict, List
 from difflib import SequenceMatcher
+from . import action_schema
 from .config import DB_CACHE_PATH
 
 DB_PATH = str(DB_CACHE_PATH)
 
+_initialized = set()  # قواعد البيانات اللي اتعملها init في الـ process ده
+
 def init_database():
     """إنشاء قاعدة البيانات إذا لم تكن موجودة."""
     conn = sqlite3.connect(DB_PATH)
@@ -40,9 +43,32 @@ def init_database():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    # الـ render plan المحسوبة للقالب (template_plans) + مفتاحها (hash الـ actions + نسخة الـ compiler)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(templates)")}
+    if 'plan_json' not in columns:
+        cursor.execute("ALTER TABLE templates ADD COLUMN plan_json TEXT")
+        cursor.execute("ALTER TABLE templates ADD COLUMN plan_key TEXT")
+
+    # كاش تحليل الصوت (audio_analysis): energies لكل ملف (مفتاحها المسار + الحجم + mtime + نسخة التحليل)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS audio_analysis (
+            file_key TEXT PRIMARY KEY,
+            path TEXT,
+            blocks INTEGER,
+            energies BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     
     conn.commit()
     conn.close()
+    _initialized.add(DB_PATH)
+
+def _connect() -> sqlite3.Connection:
+    """اتصال بالقاعدة؛ الجداول بتتعمل عند أول اتصال (مش عند الـ import) عشان وقت التشغيل."""
+    if DB_PATH not in _initialized:
+        init_database()
+    return sqlite3.connect(DB_PATH)
 
 # --- دوال الكاش والأوامر (كما هي) ---
 def _hash_command(text: str) -> str:
@@ -53,8 +79,11 @@ def _hash_command(text: str) -> str:
 def _similarity(text1: str, text2: str) -> float:
     return SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
 
-def save_command(command_text: str, actions: List[Dict], transcription: str = None):
-    conn = sqlite3.connect(DB_PATH)
+def save_command(command_text: str, actions: List[Dict], transcription: str = None) -> bool:
+    """حفظ الأمر (أو زيادة usage_count لو موجود)؛ False لو الأوامر غلط واتشالت."""
+    if action_schema.check(actions):
+        return False  # أوامر غلط ما تدخلش الكاش
+    conn = _connect()
     cursor = conn.cursor()
     cmd_hash = _hash_command(command_text)
     actions_json = json.dumps(actions, ensure_ascii=False)
@@ -67,9 +96,10 @@ def save_command(command_text: str, actions: List[Dict], transcription: str = No
         conn.commit()
     finally:
         conn.close()
+    return True
 
 def find_similar_command(command_text: str, threshold: float = 0.85) -> Optional[Dict]:
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     cursor.execute("SELECT command_text, actions_json, transcription, usage_count FROM commands")
     rows = cursor.fetchall()
@@ -86,8 +116,7 @@ def find_similar_command(command_text: str, threshold: float = 0.85) -> Optional
     return best_match
 
 def get_usage_stats() -> dict:
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     c = conn.cursor()
     try:
         c.execute("SELECT COUNT(*) FROM commands")
@@ -104,8 +133,7 @@ def get_usage_stats() -> dict:
 
 def get_popular_commands(limit: int = 10) -> List[Dict]:
     """جلب الأوامر الأكثر استخداماً."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     cursor.execute("""
         SELECT command_text, actions_json, usage_count
@@ -122,12 +150,12 @@ def get_popular_commands(limit: int = 10) -> List[Dict]:
     return out
 
 def clear_cache():
+    """مسح القاعدة كلها (الأوامر + القوالب + كاش تحليل الصوت) وإنشاؤها من جديد."""
     if os.path.exists(DB_PATH): os.remove(DB_PATH)
     init_database()
 
 def export_db_to_json() -> str:
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     cursor.execute("SELECT command_text, actions_json, transcription, usage_count FROM commands")
     rows = cursor.fetchall()
@@ -143,15 +171,18 @@ def import_db_from_json(json_str: str) -> int:
         count = 0
         for item in data:
             if "command_text" in item and "actions" in item:
-                save_command(item["command_text"], item["actions"], item.get("transcription"))
-                count += 1
+                count += save_command(item["command_text"], item["actions"], item.get("transcription"))
         return count
     except: return 0
 
 # --- دوال القوالب (Templates) - الجديد ---
 def save_template(name: str, actions: List[Dict], description: str = ""):
     """حفظ مجموعة خطوات كقالب."""
-    conn = sqlite3.connect(DB_PATH)
+    error = action_schema.check(actions)
+    if error:
+        print(f"Template Error: {error}")
+        return False
+    conn = _connect()
     cursor = conn.cursor()
     actions_json = json.dumps(actions, ensure_ascii=False)
     try:
@@ -169,19 +200,38 @@ def save_template(name: str, actions: List[Dict], description: str = ""):
 
 def get_all_templates() -> List[Dict]:
     """جلب كل القوالب المحفوظة."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     cursor.execute("SELECT name, description, actions_json FROM templates ORDER BY created_at DESC")
     rows = cursor.fetchall()
     conn.close()
     return [{'name': r[0], 'description': r[1], 'actions': json.loads(r[2])} for r in rows]
 
+def get_template(name: str) -> Optional[Dict]:
+    """قالب واحد بالـ plan المحفوظة بتاعته (plan = None لو لسه ما اتعملهاش compile)."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT name, description, actions_json, plan_json, plan_key FROM templates WHERE name = ?",
+                           (name,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {'name': row[0], 'description': row[1], 'actions': json.loads(row[2]),
+            'plan': json.loads(row[3]) if row[3] else None, 'plan_key': row[4]}
+
+def save_template_plan(name: str, plan_key: str, plan: Dict):
+    conn = _connect()
+    try:
+        conn.execute("UPDATE templates SET plan_json = ?, plan_key = ? WHERE name = ?",
+                     (json.dumps(plan, ensure_ascii=False), plan_key, name))
+        conn.commit()
+    finally:
+        conn.close()
+
 def delete_template(name: str):
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM templates WHERE name = ?", (name,))
     conn.commit()
     conn.close()
-
-init_database()
\ No newline at end of file
@@ -61,8 +61,10 @@ def get_temp_dir() -> Path:
 
 BASE_DIR = get_base_path()
 DATA_DIR = get_data_dir()
-OUTPUT_DIR = get_output_dir()
-TEMP_DIR = get_temp_dir()
+# المجلدات بتتعمل عند أول كتابة (make_output_path / temp)، مش عند الـ import
+OUTPUT_DIR = DATA_DIR / "My_Produced_Videos"
+TEMP_DIR = DATA_DIR / "temp"
+MEDIA_DIR = DATA_DIR / "media"  # ميديا المشاريع المستوردة (content-addressed، نسخة واحدة لكل محتوى)
 
 # Database files
 DB_CACHE_PATH = DATA_DIR / "command_cache.db"
@@ -95,7 +97,7 @@ def check_ffmpeg() -> bool:
 
 def check_imagemagick() -> bool:
     """
-    التحقق من وجود ImageMagick (اختياري - للـ Subtitles).
+    التحقق من وجود ImageMagick (اختياري - الـ Subtitles لم تعد تحتاجه، تُرسم بـ Pillow).
     """
     return shutil.which('magick') is not None or shutil.which('convert') is not None
 
@@ -112,10 +114,20 @@ def validate_dependencies() -> Dict[str, bool]:
     }
 
 def get_ffmpeg_path() -> Optional[str]:
-    """الحصول على المسار الكامل لـ FFmpeg."""
+    """
+    الحصول على المسار الكامل لـ FFmpeg.
+    آخر حل: نسخة FFmpeg اللي بتنزل مع MoviePy (imageio-ffmpeg).
+    """
     if FFMPEG_EXE.exists():
         return str(FFMPEG_EXE)
-    return shutil.which('ffmpeg')
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
 
 # ==================== Configuration Settings ====================
 
@@ -160,15 +172,11 @@ def setup_environment():
     """
     إعداد البيئة تلقائياً عند استيراد الوحدة.
     - إضافة FFmpeg للـ PATH
-    - إنشاء المجلدات المطلوبة
+    (المجلدات مبقتش بتتعمل هنا عشان وقت التشغيل: get_output_dir / get_temp_dir عند الحاجة)
     """
     # إضافة FFmpeg للـ PATH
     if FFMPEG_EXE.exists():
         os.environ['PATH'] = str(BASE_DIR) + os.pathsep + os.environ.get('PATH', '')
-    
-    # إنشاء المجلدات
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    TEMP_DIR.mkdir(parents=True, exist_ok=True)
 
 # تشغيل الإعداد التلقائي
 setup_environment()
@@ -184,6 +192,7 @@ def print_config_info():
     print(f"Data Dir:     {DATA_DIR}")
     print(f"Output Dir:   {OUTPUT_DIR}")
     print(f"Temp Dir:     {TEMP_DIR}")
+    print(f"Media Dir:    {MEDIA_DIR}")
     print(f"Cache DB:     {DB_CACHE_PATH}")
     print(f"Sessions DB:  {DB_SESSIONS_PATH}")
     print(f"FFmpeg:       {get_ffmpeg_path() or 'NOT FOUND'}")
@@ -0,0 +1,90 @@
+"""
+Encoder Profile: توزيع أنوية المعالج على عمليات التصدير الشغالة في نفس الوقت.
+
+كل تصدير بيسجل نفسه في registry مشترك (thread-safe)، وعدد الـ threads والـ preset
+بيتحدد حسب عدد الأنوية ÷ عدد العمليات الشغالة، عشان مجموع الـ threads
+ما يزيدش عن الأنوية (oversubscription) في الـ Batch والـ Parallel Render.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Codec الصورة والصوت لكل صيغة تصدير (MoviePy و FFmpeg مباشرة)
+FORMAT_CODECS = {
+    "mp4": ("libx264", "aac"),
+    "webm": ("libvpx-vp9", "libvorbis"),
+}
+
+MAX_BATCH_JOBS = 4          # كل job بيفتح FFmpeg reader + writer (ذاكرة)
+MIN_THREADS_PER_JOB = 2
+
+# libx264: كل ما الـ threads المتاحة للـ job قلت، preset أسرع (الـ throughput الإجمالي أعلى)
+X264_PRESETS = ((8, "medium"), (4, "fast"), (2, "faster"), (1, "veryfast"))
+# libvpx-vp9: cpu-used أعلى = أسرع (الافتراضي 0 بطيء جداً)
+VP9_CPU_USED = ((8, 2), (4, 3), (2, 4), (1, 5))
+
+_lock = threading.Lock()
+_active = 0
+_reserved = 0
+
+def cpu_count() -> int:
+    return os.cpu_count() or 1
+
+def concurrent_jobs() -> int:
+    """عدد عمليات التصدير الحالية (الشغالة أو المحجوزة لـ Batch)."""
+    with _lock:
+        return max(1, _active, _reserved)
+
+@contextmanager
+def reserve(jobs: int):
+    """حجز مكان لعدد jobs متوقعة (Batch) قبل ما تبدأ فعلاً."""
+    global _reserved
+    with _lock:
+        _reserved += jobs
+    try:
+        yield
+    finally:
+        with _lock:
+            _reserved -= jobs
+
+@contextmanager
+def job_slot():
+    """تسجيل تصدير شغال؛ يرجع عدد العمليات المتزامنة وقت البدء."""
+    global _active
+    with _lock:
+        _active += 1
+        jobs = max(_active, _reserved)
+    try:
+        yield jobs
+    finally:
+        with _lock:
+            _active -= 1
+
+def _pick(table, threads: int):
+    return next(value for minimum, value in table if threads >= minimum)
+
+def threads_per_job(jobs: int, cores: int = None) -> int:
+    return max(1, (cores or cpu_count()) // max(1, jobs))
+
+def plan(codec: str, jobs: int = None, cores: int = None) -> Dict:
+    """
+    إعدادات write_videofile (threads / preset / ffmpeg_params) لتصدير واحد
+    من ضمن jobs عمليات متزامنة.
+    """
+    threads = threads_per_job(jobs or concurrent_jobs(), cores)
+    if codec == "libx264":
+        return {'threads': threads, 'preset': _pick(X264_PRESETS, threads)}
+    if codec.startswith("libvpx"):
+        tile_columns = min(4, threads.bit_length() - 1)
+        params: List[str] = ['-deadline', 'good', '-cpu-used', str(_pick(VP9_CPU_USED, threads)),
+                             '-row-mt', '1', '-tile-columns', str(tile_columns)]
+        return {'threads': threads, 'ffmpeg_params': params}
+    return {'threads': threads}
+
+def batch_workers(total: int, cores: int = None, requested: Optional[int] = None) -> int:
+    """عدد الـ jobs المتوازية في الـ Batch (على الأقل MIN_THREADS_PER_JOB لكل job)."""
+    if requested:
+        return max(1, min(requested, total))
+    by_cores = (cores or cpu_count()) // MIN_THREADS_PER_JOB
+    return max(1, min(total, MAX_BATCH_JOBS, by_cores))
@@ -0,0 +1,161 @@
+"""
+Frame Kernels: دمج كل تعديلات البكسل (crop / rotate / black_white) لتعديل واحد
+في دالة واحدة بدل سلسلة MoviePy fx (كل fx كان بيعمل array جديد لكل فريم).
+
+- crop: slicing (view بدون نسخ).
+- rotate بزوايا قائمة: np.rot90 (view بدون نسخ).
+- black_white: grayscale بأوزان صحيحة (BT.601 × 256) في buffers محجوزة مسبقاً.
+في الحالة المستقرة لا يتم حجز أي ذاكرة جديدة لكل فريم.
+"""
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+
+PIXEL_ACTIONS = ("crop", "rotate", "black_white")
+GRAY_WEIGHTS = (77, 150, 29)  # 0.299 / 0.587 / 0.114 × 256
+RING_SIZE = 2  # عدد buffers الإخراج (المستهلك ممكن يحتفظ بآخر فريم)
+
+def crop_box(ratio: str, w: int, h: int) -> Optional[Tuple[int, int, int, int]]:
+    """حساب مستطيل القص (x, y, width, height) لنسبة العرض للارتفاع المطلوبة."""
+    if ratio == "1:1":
+        side = min(w, h)
+        x1, y1, cw, ch = (w - side) / 2, (h - side) / 2, side, side
+    elif ratio == "16:9":
+        new_h = w / (16 / 9)
+        if new_h > h:
+            return None
+        x1, y1, cw, ch = 0, (h - new_h) / 2, w, new_h
+    elif ratio == "9:16":
+        new_w = h * (9 / 16)
+        if new_w <= w:
+            x1, y1, cw, ch = (w - new_w) / 2, 0, new_w, h
+        else:
+            new_h = w / (9 / 16)
+            x1, y1, cw, ch = 0, (h - new_h) / 2, w, new_h
+    else:
+        return None
+    # نفس التقريب اللي بيعمله MoviePy crop
+    return int(x1), int(y1), int(x1 + cw) - int(x1), int(y1 + ch) - int(y1)
+
+def _rotation_turns(step: Dict) -> Optional[int]:
+    """عدد لفات 90° عكس عقارب الساعة، أو None لو الزاوية مش قائمة."""
+    angle = int(step.get("angle", 90))
+    return (angle // 90) % 4 if angle % 90 == 0 else None
+
+def _unrotate_box(box: Tuple[int, int, int, int], turns: int, region_w: int, region_h: int) -> Tuple[int, int, int, int]:
+    """
+    تحويل مستطيل قص على صورة ملفوفة (rot90 × turns) إلى مستطيل على الصورة قبل اللف.
+    بكده أي تسلسل crop/rotate يتحول لـ crop واحد ثم rotate واحد.
+    """
+    x, y, w, h = box
+    for turn in range(turns, 0, -1):
+        # عرض الصورة قبل آخر لفة
+        width_before = region_w if (turn - 1) % 2 == 0 else region_h
+        x, y, w, h = width_before - y - h, x, h, w
+    return x, y, w, h
+
+class FrameKernel:
+    """دالة فريم مدمجة لكل خطوات البكسل بالترتيب، بـ buffers محجوزة مسبقاً."""
+
+    def __init__(self, steps: List[Dict], size: Tuple[int, int]):
+        w, h = size
+        # المنطقة بإحداثيات الفريم الأصلي + عدد اللفات المطلوبة بعدها
+        self.region = (0, 0, w, h)
+        self.turns = 0
+        self.gray = False
+        for step in steps:
+            self._add_step(step)
+
+        rx, ry, rw, rh = self.region
+        self.size = (rh, rw) if self.turns % 2 else (rw, rh)
+        out_w, out_h = self.size
+        self._outputs = [np.empty((out_h, out_w, 3), dtype=np.uint8) for _ in range(RING_SIZE)]
+        self._acc = np.empty((rh, rw), dtype=np.uint16)
+        self._tmp = np.empty((rh, rw), dtype=np.uint16)
+        self._next = 0
+
+    def _add_step(self, step: Dict):
+        action = step.get("action")
+        rx, ry, rw, rh = self.region
+        if action == "crop":
+            visible = (rh, rw) if self.turns % 2 else (rw, rh)
+            box = crop_box(step.get("aspect_ratio", "9:16"), *visible)
+            if box:
+                bx, by, bw, bh = _unrotate_box(box, self.turns, rw, rh)
+                self.region = (rx + bx, ry + by, bw, bh)
+        elif action == "rotate":
+            self.turns = (self.turns + (_rotation_turns(step) or 0)) % 4
+        elif action == "black_white":
+            # الـ grayscale نقطي فيتبدل مع القص/التدوير: نطبقه مرة واحدة
+            self.gray = True
+
+    def _crop(self, frame: np.ndarray) -> np.ndarray:
+        x, y, w, h = self.region
+        return frame[y:y + h, x:x + w]
+
+    def _grayscale(self, region: np.ndarray, out: np.ndarray):
+        """grayscale بأوزان صحيحة على المنطقة (صفوف متصلة) ثم لف واحد عند الكتابة."""
+        acc, tmp = self._acc, self._tmp
+        np.multiply(region[..., 0], GRAY_WEIGHTS[0], out=acc, dtype=np.uint16)
+        np.multiply(region[..., 1], GRAY_WEIGHTS[1], out=tmp, dtype=np.uint16)
+        np.add(acc, tmp, out=acc)
+        np.multiply(region[..., 2], GRAY_WEIGHTS[2], out=tmp, dtype=np.uint16)
+        np.add(acc, tmp, out=acc)
+        np.right_shift(acc, 8, out=acc)
+        rotated = np.rot90(acc, self.turns)
+        for channel in range(3):
+            np.copyto(out[..., channel], rotated, casting="unsafe")
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        region = self._crop(frame)
+        if not self.gray:
+            # crop/rotate فقط: view بدون أي نسخ (الـ writer بيقرأ الـ bytes مباشرة)
+            return np.rot90(region, self.turns)[..., :3]
+        out = self._outputs[self._next]
+        self._next = (self._next + 1) % RING_SIZE
+        self._grayscale(region, out)
+        return out
+
+    def apply_batch(self, frames: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """تطبيق الـ kernel على دفعة فريمات (N, H, W, 3) في buffer إخراج واحد."""
+        w, h = self.size
+        if out is None:
+            out = np.empty((len(frames), h, w, 3), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            region = self._crop(frame)
+            if self.gray:
+                self._grayscale(region, out[i])
+            else:
+                np.copyto(out[i], np.rot90(region, self.turns)[..., :3])
+        return out
+
+def build_kernel(steps: List[Dict], size: Tuple[int, int]) -> Optional[FrameKernel]:
+    """بناء kernel مدمج، أو None لو فيه خطوة مش مدعومة (زاوية غير قائمة)."""
+    pixel_steps = [s for s in steps if s.get("action") in PIXEL_ACTIONS]
+    if not pixel_steps:
+        return None
+    if any(s.get("action") == "rotate" and _rotation_turns(s) is None for s in pixel_steps):
+        return None
+    return FrameKernel(pixel_steps, size)
+
+def apply_fx_chain(clip, steps: List[Dict]):
+    """الطريقة القديمة: سلسلة MoviePy fx (للزوايا غير القائمة وللمقارنة في الـ Benchmark)."""
+    from moviepy.editor import vfx
+    from moviepy.video.fx.all import crop
+    for step in steps:
+        action = step.get("action")
+        if action == "rotate":
+            clip = clip.rotate(int(step.get("angle", 90)))
+        elif action == "crop":
+            box = crop_box(step.get("aspect_ratio", "9:16"), *clip.size)
+            if box:
+                clip = crop(clip, x1=box[0], y1=box[1], width=box[2], height=box[3])
+        elif action == "black_white":
+            clip = clip.fx(vfx.blackwhite)
+    return clip
+
+def apply_pixel_actions(clip, steps: List[Dict]):
+    """تطبيق خطوات البكسل على الكليب: kernel مدمج لو ممكن وإلا سلسلة fx."""
+    kernel = build_kernel(steps, clip.size)
+    if kernel is None:
+        return apply_fx_chain(clip, [s for s in steps if s.get("action") in PIXEL_ACTIONS])
+    return clip.fl_image(kernel)
@@ -0,0 +1,239 @@
+"""
+Job Store: طابور تصدير مشترك لأكتر من جهاز (render farm) في ملف SQLite على storage مشترك.
+
+- enqueue(): job لكل فيديو، والـ render plan (template_plans) بتتعمل مرة واحدة وتتخزن مع الـ jobs،
+  فالـ workers ما بيعملوش planning.
+- claim(): أقدم job في الطابور بيتاخد بـ lease (BEGIN IMMEDIATE = worker واحد بس ياخده).
+  الـ worker بيمد الـ lease بـ heartbeat()، ولو وقف (crash / الجهاز وقع / الشبكة قطعت) الـ lease
+  بتخلص وأي claim بعدها بيرجّع الـ job للطابور (requeue_expired) لحد max_attempts.
+- complete() / fail() بيتقبلوا بس من الـ worker اللي ماسك الـ lease دلوقتي: worker "ميت" رجع
+  بعد ما الـ job اتاخدت منه ما يقدرش يكتب فوق نتيجة غيره. heartbeat() بترجع False ساعتها
+  (أو لو الـ job اتلغت) عشان الـ worker يوقف الريندر.
+- node_stats(): عرض الـ coordinator — لكل worker: حي/ميت، الـ job الحالية، وخلص كام في الساعة
+  و realtime factor (ثواني ميديا ÷ ثواني ريندر) في آخر window.
+- journal عادي (مش WAL): WAL محتاج shared memory على نفس الجهاز ومش بيشتغل على network filesystems.
+  الوقت time.time() بتاع كل worker، فالساعات لازم تكون متزامنة (NTP) والـ lease أطول بكتير من الفرق.
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from . import action_schema, template_plans
+from .config import DATA_DIR
+
+DB_PATH = os.getenv("RENDER_FARM_DB") or str(DATA_DIR / "render_farm.db")
+
+LEASE_SECONDS = 60.0
+HEARTBEAT_SECONDS = 15.0
+DEAD_AFTER = 3 * HEARTBEAT_SECONDS   # worker من غير heartbeat المدة دي = ميت في الـ stats
+MAX_ATTEMPTS = 3
+FINISHED = ("done", "failed", "cancelled")
+
+_initialized = set()
+
+def init_database():
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_path TEXT NOT NULL, music_path TEXT, output_dir TEXT,
+                format TEXT NOT NULL DEFAULT 'mp4', template TEXT, plan_json TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',     -- queued / running / done / failed / cancelled
+                attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL DEFAULT 3,
+                worker TEXT, lease_until REAL, progress REAL DEFAULT 0,
+                output TEXT, error TEXT, media_seconds REAL, render_seconds REAL,
+                created_at REAL NOT NULL, started_at REAL, finished_at REAL);
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(finished_at, worker);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY, host TEXT, pid INTEGER, slots INTEGER DEFAULT 1,
+                status TEXT NOT NULL DEFAULT 'idle',       -- idle / busy / stopped
+                current_job INTEGER, started_at REAL NOT NULL, heartbeat REAL NOT NULL);
+        """)
+    finally:
+        conn.close()
+    _initialized.add(DB_PATH)
+
+@contextmanager
+def _transaction():
+    """transaction بقفل كتابة من أولها (BEGIN IMMEDIATE): القراية والتعديل من غير سباق بين الأجهزة."""
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def _connect():
+    if DB_PATH not in _initialized:
+        init_database()
+    return _transaction()
+
+def worker_name(slot: int = None) -> str:
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{name}:{slot}" if slot is not None else name
+
+# ==================== Submit ====================
+
+def enqueue(video_paths: List[str], actions: List[Dict] = None, music_path: str = None, format: str = "mp4",
+            template: str = None, output_dir: str = None, max_attempts: int = MAX_ATTEMPTS) -> List[int]:
+    """
+    إضافة job لكل فيديو (المسارات لازم تكون متشافة من كل الـ workers — storage مشترك).
+    template = اسم قالب (الـ plan المحفوظة)، وإلا actions. أوامر غلط = action_schema.ActionError.
+    """
+    if template:
+        plan = template_plans.plan_for(template)
+        if plan is None:
+            raise KeyError(f"Template not found: {template}")
+    else:
+        plan = template_plans.compile_plan(action_schema.validate(actions or []))
+    plan_json = json.dumps(plan, ensure_ascii=False)
+    now = time.time()
+    with _connect() as conn:
+        return [conn.execute(
+            "INSERT INTO jobs (video_path, music_path, output_dir, format, template, plan_json, max_attempts, "
+            "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(path), music_path, output_dir, format, template, plan_json, max_attempts, now)
+        ).lastrowid for path in video_paths]
+
+def cancel(job_id: int) -> bool:
+    """إلغاء job مستنية أو شغالة (الـ worker بيعرف مع أول heartbeat)."""
+    with _connect() as conn:
+        return conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ?, lease_until = NULL "
+                            "WHERE id = ? AND status IN ('queued', 'running')", (time.time(), job_id)).rowcount > 0
+
+# ==================== Workers ====================
+
+def register_worker(worker_id: str, slots: int = 1):
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO workers (id, host, pid, slots, status, current_job, started_at, heartbeat) "
+                     "VALUES (?, ?, ?, ?, 'idle', NULL, ?, ?)",
+                     (worker_id, socket.gethostname(), os.getpid(), slots, now, now))
+
+def unregister_worker(worker_id: str):
+    with _connect() as conn:
+        conn.execute("UPDATE workers SET status = 'stopped', current_job = NULL, heartbeat = ? WHERE id = ?",
+                     (time.time(), worker_id))
+
+def requeue_expired(conn: sqlite3.Connection, now: float) -> int:
+    """jobs الـ lease بتاعتها خلصت (worker مات): ترجع الطابور، أو failed لو خلصت المحاولات."""
+    expired = conn.execute("SELECT id, worker, attempts, max_attempts FROM jobs "
+                           "WHERE status = 'running' AND lease_until < ?", (now,)).fetchall()
+    for job in expired:
+        error = f"lease expired on {job['worker']}"
+        if job['attempts'] < job['max_attempts']:
+            conn.execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, progress = 0, "
+                         "error = ? WHERE id = ?", (error, job['id']))
+        else:
+            conn.execute("UPDATE jobs SET status = 'failed', lease_until = NULL, error = ?, finished_at = ? "
+                         "WHERE id = ?", (error, now, job['id']))
+    return len(expired)
+
+def claim(worker_id: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Dict]:
+    """أقدم job مستنية بـ lease للـ worker ده (بعد ما الـ leases المنتهية ترجع للطابور)."""
+    now = time.time()
+    with _connect() as conn:
+        requeue_expired(conn, now)
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            conn.execute("UPDATE workers SET status = 'idle', current_job = NULL, heartbeat = ? WHERE id = ?",
+                         (now, worker_id))
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                     "started_at = ?, progress = 0 WHERE id = ?", (worker_id, now + lease_seconds, now, row['id']))
+        conn.execute("UPDATE workers SET status = 'busy', current_job = ?, heartbeat = ? WHERE id = ?",
+                     (row['id'], now, worker_id))
+    job = dict(row)
+    job['plan'] = json.loads(job.pop('plan_json'))
+    job['attempts'] += 1
+    return job
+
+def heartbeat(worker_id: str, job_id: int = None, progress: float = None,
+              lease_seconds: float = LEASE_SECONDS) -> bool:
+    """
+    الـ worker لسه عايش (+ مد الـ lease على الـ job بتاعته). False = الـ job مبقتش بتاعته
+    (اتلغت، أو الـ lease خلصت واتاخدت) والريندر لازم يقف.
+    """
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("UPDATE workers SET heartbeat = ? WHERE id = ?", (now, worker_id))
+        if job_id is None:
+            return True
+        return conn.execute("UPDATE jobs SET lease_until = ?, progress = COALESCE(?, progress) "
+                            "WHERE id = ? AND worker = ? AND status = 'running'",
+                            (now + lease_seconds, progress, job_id, worker_id)).rowcount > 0
+
+def complete(job_id: int, worker_id: str, output: str, render_seconds: float, media_seconds: float = None) -> bool:
+    with _connect() as conn:
+        return conn.execute("UPDATE jobs SET status = 'done', output = ?, error = NULL, progress = 1, "
+                            "lease_until = NULL, render_seconds = ?, media_seconds = ?, finished_at = ? "
+                            "WHERE id = ? AND worker = ? AND status = 'running'",
+                            (output, render_seconds, media_seconds, time.time(), job_id, worker_id)).rowcount > 0
+
+def fail(job_id: int, worker_id: str, error: str, render_seconds: float = None) -> bool:
+    """فشل محاولة: الـ job ترجع الطابور لحد max_attempts (ممكن worker تاني ينجح فيها)."""
+    now = time.time()
+    with _connect() as conn:
+        return conn.execute("UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                            "worker = CASE WHEN attempts < max_attempts THEN NULL ELSE worker END, "
+                            "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END, "
+                            "error = ?, render_seconds = ?, lease_until = NULL "
+                            "WHERE id = ? AND worker = ? AND status = 'running'",
+                            (now, error, render_seconds, job_id, worker_id)).rowcount > 0
+
+# ==================== Coordinator ====================
+
+def get_job(job_id: int) -> Optional[Dict]:
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job.pop('plan_json')
+    return job
+
+def queue_summary() -> Dict[str, int]:
+    with _connect() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+    return {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed", "cancelled")}
+
+def node_stats(window: float = 3600.0) -> List[Dict]:
+    """لكل worker: الحالة، الـ job الحالية، وthroughput آخر window ثانية."""
+    now = time.time()
+    since = now - window
+    with _connect() as conn:
+        workers = conn.execute("SELECT * FROM workers ORDER BY host, id").fetchall()
+        finished = {row['worker']: row for row in conn.execute(
+            "SELECT worker, SUM(status = 'done') AS done, SUM(status = 'failed') AS failed, "
+            "SUM(CASE WHEN status = 'done' THEN render_seconds END) AS render_seconds, "
+            "SUM(CASE WHEN status = 'done' THEN media_seconds END) AS media_seconds "
+            "FROM jobs WHERE finished_at >= ? GROUP BY worker", (since,))}
+    stats = []
+    for worker in workers:
+        row = finished.get(worker['id'])
+        done = (row['done'] or 0) if row else 0
+        render_seconds = (row['render_seconds'] or 0.0) if row else 0.0
+        media_seconds = (row['media_seconds'] or 0.0) if row else 0.0
+        alive = worker['status'] != 'stopped' and now - worker['heartbeat'] < DEAD_AFTER
+        stats.append({
+            'worker': worker['id'], 'host': worker['host'], 'slots': worker['slots'],
+            'state': worker['status'] if alive else ('stopped' if worker['status'] == 'stopped' else 'dead'),
+            'current_job': worker['current_job'] if alive else None,
+            'last_seen': round(now - worker['heartbeat'], 1),
+            'done': done, 'failed': (row['failed'] or 0) if row else 0,
+            'jobs_per_hour': round(done * 3600.0 / window, 2),
+            'realtime_factor': round(media_seconds / render_seconds, 2) if render_seconds else None,
+        })
+    return stats
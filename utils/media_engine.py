@@ -1,20 +1,19 @@
 import os
-import tempfile
 import time
 import numpy as np
 from PIL import Image
-from moviepy.editor import VideoFileClip, vfx, AudioFileClip, CompositeAudioClip, afx
-from moviepy.video.fx.all import crop
-from . import subtitle_engine
+from moviepy.editor import VideoFileClip, vfx
+from . import action_schema, timeline, subtitle_engine, frame_kernels, audio_mixer, audio_analysis, encoder_profile, temp_manager, progress as progress_events
+from .render_profiler import stage, wrap
 from .config import OUTPUT_DIR
 
 def save_uploaded_file(uploaded_file) -> str:
-    """Saves uploaded Streamlit file to temp disk."""
+    """Saves uploaded Streamlit file to temp disk (temp_manager: بيتمسح بالـ LRU تحت الـ quota)."""
     try:
-        suffix = os.path.splitext(uploaded_file.name)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        path = temp_manager.new_path("upload", os.path.splitext(uploaded_file.name)[1])
+        with open(path, 'wb') as tmp_file:
             tmp_file.write(uploaded_file.getvalue())
-            return tmp_file.name
+        return path
     except Exception as e:
         print(f"File save error: {e}")
         return None
@@ -54,43 +53,32 @@ def extract_timeline_frames(video_path: str, num_frames: int = 8, max_duration:
         return []
 
 def validate_actions(actions: list, video_path: str = None) -> str:
-    """التحقق من صحة الأوامر."""
-    if not actions:
-        return ""
-    
-    for i, step in enumerate(actions):
-        action = step.get("action")
-        
-        if action == "trim":
-            start = float(step.get("start", 0))
-            end = float(step.get("end", 0))
-            if start < 0 or (end > 0 and end <= start):
-                return f"خطأ في القص: التوقيت غير منطقي."
-        
-        elif action == "crop":
-            ar = step.get("aspect_ratio")
-            if ar and ar not in ["9:16", "16:9", "1:1"]:
-                return f"الأبعاد {ar} غير مدعومة حالياً."
-    
-    return ""
+    """التحقق من صحة الأوامر (action_schema: نفس الـ validator بتاع كل المداخل)."""
+    return action_schema.check(actions, video_path)
 
-def apply_edit_actions(clip: VideoFileClip, actions: list, music_path: str = None) -> VideoFileClip:
+def apply_edit_actions(clip: VideoFileClip, actions: list, music_path: str = None,
+                       profiler=None) -> VideoFileClip:
     """
     Applies JSON actions including Rotate, Crop, Volume.
     
     Note: This function modifies the clip in-place and returns it.
     The caller is responsible for closing the final clip.
+    profiler (اختياري): RenderProfiler لقياس وقت كل مرحلة وكل تعديل لكل فريم.
     """
     # 1. تطبيق التعديلات البصرية والزمنية
+    # (خطوات البكسل مستقلة عن الزمن فتأجيلها بعد trim/speed لا يغير النتيجة)
+    source_path = getattr(clip, 'filename', None)
+    actions = timeline.resolve(actions, clip.duration)  # trim_last → trim
+    pixel_steps = []
+    normalize_step, gain_before = None, 1.0
+    clip = wrap(profiler, clip, "decode")
     for step in actions:
         action = step.get("action")
         
         if action == "trim":
-            start = float(step.get("start", 0))
-            end = float(step.get("end", clip.duration))
-            if end > clip.duration:
-                end = clip.duration
-            clip = clip.subclip(start, end)
+            # end فاضي أو 0 = لحد آخر الفيديو (زي action_schema / timeline)
+            start, end = timeline.trim_bounds(step)
+            clip = clip.subclip(start, clip.duration if end is None else min(end, clip.duration))
             
         elif action == "mute":
             clip = clip.without_audio()
@@ -98,92 +86,151 @@ def apply_edit_actions(clip: VideoFileClip, actions: list, music_path: str = Non
         elif action == "volume":
             vol = float(step.get("level", 1.0))
             clip = clip.volumex(vol)
+            if normalize_step is None:
+                gain_before *= vol
+        
+        elif action == "normalize":
+            # يتطبق بعد القص/السرعة لأن القياس على الجزء المستخدم فقط
+            normalize_step = step
 
         elif action == "speed":
             factor = float(step.get("factor", 1.0))
             clip = clip.fx(vfx.speedx, factor)
             
-        elif action == "rotate":
-            angle = int(step.get("angle", 90))
-            clip = clip.rotate(angle)
+        elif action in frame_kernels.PIXEL_ACTIONS:
+            # خطوات البكسل تتجمع وتتطبق مرة واحدة كـ kernel مدمج
+            pixel_steps.append(step)
 
-        elif action == "crop":
-            ratio = step.get("aspect_ratio", "9:16")
-            w, h = clip.size
-            
-            if ratio == "9:16":
-                target_ratio = 9/16
-                new_w = h * target_ratio
-                if new_w <= w:
-                    x1 = (w / 2) - (new_w / 2)
-                    clip = crop(clip, x1=x1, y1=0, width=new_w, height=h)
-                else:
-                    new_h = w / target_ratio
-                    y1 = (h / 2) - (new_h / 2)
-                    clip = crop(clip, x1=0, y1=y1, width=w, height=new_h)
-            
-            elif ratio == "1:1":
-                min_dim = min(w, h)
-                x1 = (w / 2) - (min_dim / 2)
-                y1 = (h / 2) - (min_dim / 2)
-                clip = crop(clip, x1=x1, y1=y1, width=min_dim, height=min_dim)
-                
-            elif ratio == "16:9":
-                target_ratio = 16/9
-                new_h = w / target_ratio
-                if new_h <= h:
-                    y1 = (h / 2) - (new_h / 2)
-                    clip = crop(clip, x1=0, y1=y1, width=w, height=new_h)
-
-        elif action == "black_white":
-            clip = clip.fx(vfx.blackwhite)
+    if pixel_steps:
+        clip = frame_kernels.apply_pixel_actions(clip, pixel_steps)
+        clip = wrap(profiler, clip, "pixels: " + "+".join(s["action"] for s in pixel_steps))
+
+    if normalize_step and clip.audio is not None and source_path:
+        target = float(normalize_step.get("target", audio_analysis.TARGET_LUFS))
+        with stage(profiler, "audio analysis: normalize"):
+            gain = audio_analysis.normalize_gain(source_path, actions, clip.duration, target)
+        # الـ volume قبل normalize بيتلغي، واللي بعده يفضل نسبي للمستوى الموحد
+        clip = clip.volumex(gain / gain_before if gain_before > 0 else gain)
 
     # 2. تطبيق Subtitles
     subtitle_actions = [s for s in actions if s.get("action") == "subtitle"]
-    if subtitle_actions:
-        subtitles = []
-        for sub_action in subtitle_actions:
-            subtitles.append({
-                'text': sub_action.get('text', ''),
-                'start': float(sub_action.get('start', 0)),
-                'end': float(sub_action.get('end', 0)),
-                'position': sub_action.get('position', 'bottom'),
-                'fontsize': sub_action.get('fontsize', 50),
-                'color': sub_action.get('color', 'white'),
-                'bg_color': sub_action.get('bg_color', 'black')
-            })
+    subtitles = []
+    for sub_action in subtitle_actions:
+        subtitles.append({
+            'text': sub_action.get('text', ''),
+            'start': float(sub_action.get('start', 0)),
+            'end': float(sub_action.get('end', 0)),
+            'position': sub_action.get('position', 'bottom'),
+            'fontsize': sub_action.get('fontsize', 50),
+            'color': sub_action.get('color', 'white'),
+            'bg_color': sub_action.get('bg_color', 'black')
+        })
+
+    # ملفات SRT/VTT: توقيتاتها بزمن الفيديو الأصلي فنحولها لزمن الناتج
+    soft_cues = []
+    for file_action in [s for s in actions if s.get("action") == "subtitle_file"]:
+        with stage(profiler, "subtitle file: load + retime"):
+            cues = subtitle_engine.retime_cues(subtitle_engine.load_subtitle_file(file_action['path']), actions)
+        if file_action.get("mode", "burn") == "soft":
+            soft_cues.extend(cues)
+        else:
+            subtitles.extend({**cue, 'position': file_action.get('position', 'bottom'),
+                              'fontsize': file_action.get('fontsize', 40)} for cue in cues)
+
+    if subtitles:
         clip = subtitle_engine.add_subtitles(clip, subtitles)
+        clip = wrap(profiler, clip, "subtitles")
 
-    # 3. تطبيق الموسيقى الخلفية
+    # 3. تطبيق الموسيقى الخلفية (تُدمج وقت التصدير على دفعات عبر audio_mixer)
     music_action = next((x for x in actions if x.get("action") == "music"), None)
     if music_action and music_path:
-        background_music = None
-        try:
-            background_music = AudioFileClip(music_path)
-            bg_volume = float(music_action.get("volume", 0.3))
-            background_music = background_music.volumex(bg_volume)
-            
-            if background_music.duration < clip.duration:
-                background_music = afx.audio_loop(background_music, duration=clip.duration)
-            else:
-                background_music = background_music.subclip(0, clip.duration)
-                
-            final_audio = CompositeAudioClip([clip.audio, background_music]) if clip.audio else background_music
-            clip = clip.set_audio(final_audio)
-        except Exception as e:
-            print(f"Music Error: {e}")
-        finally:
-            # تنظيف AudioFileClip
-            if background_music:
-                background_music.close()
+        with stage(profiler, "audio analysis: ducking"):
+            clip = attach_music(clip, music_action, music_path, source_path, actions)
+
+    # الترجمة الـ soft تُضاف بعد التصدير (stream copy) في export_video
+    if soft_cues:
+        clip.soft_subtitles = sorted(soft_cues, key=lambda c: c['start'])
 
     return clip
 
-def export_video(clip: VideoFileClip, output_dir: str = None, format: str = "mp4") -> str:
+FORMAT_CODECS = encoder_profile.FORMAT_CODECS
+
+def attach_music(clip: VideoFileClip, music_action: dict, music_path: str,
+                 source_path: str = None, actions: list = ()) -> VideoFileClip:
     """
-    Exports the final video.
-    ✅ FIXED: Uses config.py for output directory.
+    تسجيل الموسيقى الخلفية على الكليب (path + volume + ducking).
+    الدمج الفعلي يتم في write_clip بدون تحميل المسارات كاملة في الذاكرة.
+    لو الفيديو فيه كلام، الموسيقى تنخفض تلقائياً وقت الكلام (منحنى من audio_analysis).
+    """
+    speech = None
+    if clip.audio is not None and source_path and music_action.get("duck", 1) > 0:
+        speech = audio_analysis.output_speech_envelope(source_path, list(actions), clip.duration)
+    default_duck = audio_analysis.DEFAULT_DUCK if speech is not None else 0.0
+    
+    clip = clip.copy()
+    clip.music_mix = {
+        'path': music_path,
+        'volume': float(music_action.get("volume", 0.3)),
+        'duck': float(music_action.get("duck", default_duck)),
+        'speech': speech
+    }
+    return clip
+
+def render_audio_track(clip: VideoFileClip, output_path: str, audio_codec: str = "aac") -> str:
+    """
+    تصدير الصوت النهائي (أصلي + موسيقى إن وجدت) كملف صوت واحد.
+    None = الكليب مالوش صوت أصلاً؛ فشل FFmpeg بيرمي (مفيش رجوع لفيديو من غير صوت).
     """
+    mix = getattr(clip, 'music_mix', None) or {}
+    if clip.audio is None and not mix:
+        return None
+    return audio_mixer.render_mixed_audio(
+        clip.audio, clip.duration, output_path,
+        mix.get('path'), mix.get('volume', 0.3), mix.get('duck', 0.0), audio_codec,
+        speech=mix.get('speech'), speech_step=audio_analysis.STEP_SECONDS
+    )
+
+def write_clip(clip: VideoFileClip, output_path: str, format: str = "mp4", profiler=None,
+               progress=None, **kwargs) -> str:
+    """
+    كتابة الكليب بالـ codecs المناسبة للصيغة (الموسيقى تُدمج بشكل متدفق).
+    threads / preset بتتحدد من encoder_profile حسب العمليات المتزامنة (kwargs تغلب).
+    progress: callback اختياري بياخد progress events (فريم / bytes / fps / ETA).
+    """
+    logger = progress_events.tracker(progress, output_path)
+    if format == "gif":
+        with stage(profiler, "write_video") as info:
+            clip.write_gif(output_path, logger=logger)
+            info['bytes'] = os.path.getsize(output_path)
+        return output_path
+    
+    codec, audio_codec = FORMAT_CODECS[format]
+    with encoder_profile.job_slot() as jobs:
+        kwargs = {**encoder_profile.plan(codec, jobs), **kwargs}
+        # ملف الصوت المؤقت بتاع MoviePy في TEMP_DIR بدل مجلد التشغيل (صاحبه الـ process ده)
+        owner = f"process:{os.getpid()}"
+        extension = audio_mixer.AUDIO_EXTENSIONS[audio_codec]
+        snd_path = temp_manager.new_path("render", extension, owner)
+        kwargs.setdefault('temp_audiofile', snd_path)
+        audio = None
+        if getattr(clip, 'music_mix', None):
+            audio = temp_manager.new_path("render", extension, owner)
+        try:
+            if audio:
+                with stage(profiler, "mix_audio") as info:
+                    kwargs['audio'] = render_audio_track(clip, audio, audio_codec)
+                    info['bytes'] = os.path.getsize(kwargs['audio'])
+            with stage(profiler, "write_video", codec=codec, threads=kwargs.get('threads')) as info:
+                clip.write_videofile(output_path, codec=codec, audio_codec=audio_codec, logger=logger, **kwargs)
+                info['bytes'] = os.path.getsize(output_path)
+        finally:
+            for path in (audio, snd_path):
+                if path:
+                    temp_manager.remove(path)
+    return output_path
+
+def make_output_path(output_dir: str = None, format: str = "mp4") -> str:
+    """مسار ملف الإخراج (video_<timestamp>.<format>) مع إنشاء المجلد."""
     if output_dir is None:
         output_dir = str(OUTPUT_DIR)
     
@@ -191,19 +238,70 @@ def export_video(clip: VideoFileClip, output_dir: str = None, format: str = "mp4
         os.makedirs(output_dir)
     
     timestamp = time.strftime("%Y%m%d-%H%M%S")
+    # حجز الاسم (O_EXCL) عشان الـ jobs المتزامنة في نفس الثانية ما تكتبش على نفس الملف
+    for n in range(1000):
+        suffix = f"_{n}" if n else ""
+        path = os.path.join(output_dir, f"video_{timestamp}{suffix}.{format}")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            continue
+    return path
+
+def export_video(clip: VideoFileClip, output_dir: str = None, format: str = "mp4", profiler=None,
+                 progress=None) -> str:
+    """
+    Exports the final video.
+    ✅ FIXED: Uses config.py for output directory.
+    لو التصدير فشل أو اتلغى، الملف الناقص بيتمسح.
+    """
+    if format not in FORMAT_CODECS and format != "gif":
+        format = "mp4"
+    output_path = make_output_path(output_dir, format)
+    try:
+        write_clip(clip, output_path, format, profiler=profiler, progress=progress)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
     
-    if format == "gif":
-        output_path = os.path.join(output_dir, f"video_{timestamp}.gif")
-        clip.write_gif(output_path, logger=None)
-    elif format == "webm":
-        output_path = os.path.join(output_dir, f"video_{timestamp}.webm")
-        clip.write_videofile(output_path, codec='libvpx-vp9', audio_codec='libvorbis', logger=None)
-    else:
-        output_path = os.path.join(output_dir, f"video_{timestamp}.mp4")
-        clip.write_videofile(output_path, codec='libx264', audio_codec='aac', logger=None)
+    soft_cues = getattr(clip, 'soft_subtitles', None)
+    if soft_cues and format != "gif":
+        with stage(profiler, "mux_soft_subtitles"):
+            subtitle_engine.mux_soft_subtitles(output_path, soft_cues)
         
     return output_path
 
+def is_soft_subtitle_only(actions: list) -> bool:
+    """كل الأوامر ملفات ترجمة soft (مفيش أي تعديل على الصورة أو الصوت أو الزمن)."""
+    return bool(actions) and all(s.get("action") == "subtitle_file" and s.get("mode") == "soft" for s in actions)
+
+def remux_soft_subtitles(video_path: str, actions: list, output_dir: str = None, format: str = "mp4",
+                         profiler=None) -> str:
+    """
+    أوامر soft subtitles بس: المصدر بيتنسخ stream copy ومعاه مسار الترجمة (من غير MoviePy ولا إعادة ترميز).
+    يرجع None لو الأوامر فيها حاجة تانية أو الصيغة غير امتداد المصدر (stream copy مش ممكن)،
+    فالتصدير العادي يكمل؛ فشل FFmpeg بيرمي.
+    """
+    extension = os.path.splitext(video_path)[1].lower()
+    if not is_soft_subtitle_only(actions) or extension != f".{format}" or extension not in subtitle_engine.SOFT_SUB_CODECS:
+        return None
+    cues = []
+    with stage(profiler, "subtitle file: load + retime"):
+        for step in actions:
+            cues.extend(subtitle_engine.load_subtitle_file(step['path']))
+    if not cues:
+        return None
+    output_path = make_output_path(output_dir, format)
+    with stage(profiler, "mux_soft_subtitles") as info:
+        if not subtitle_engine.mux_soft_subtitles(video_path, sorted(cues, key=lambda c: c['start']), output_path):
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise RuntimeError("Soft subtitle mux failed")
+        info['bytes'] = os.path.getsize(output_path)
+    return output_path
+
 def export_multiple_formats(clip: VideoFileClip, formats: list = ["mp4"], output_dir: str = None) -> dict:
     """
     Export video in multiple formats.
@@ -0,0 +1,224 @@
+"""
+Parallel Render: تقسيم فيديو طويل واحد إلى أجزاء (chunks) عند الـ Keyframes
+وتصدير كل جزء في Process منفصل، ثم الدمج بدون إعادة ترميز (concat demuxer).
+
+- كل جزء يُطبق عليه نفس الأوامر كاملة ثم يُقص من زمن الناتج، لذلك توقيت
+  الـ Subtitles والسرعة يظل صحيحاً عند حدود الأجزاء.
+- الصوت (الأصلي + الموسيقى) يُصدر مرة واحدة كمسار متصل ثم يُضاف أثناء الدمج.
+"""
+import multiprocessing
+import os
+import queue
+import re
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import List, Dict, Optional, Tuple
+from moviepy.editor import VideoFileClip
+from . import action_schema, media_engine, subtitle_engine, timeline, audio_mixer, encoder_profile, temp_manager, progress as progress_events
+from .config import get_ffmpeg_path
+from .render_profiler import stage
+
+MIN_CHUNK_SECONDS = 30.0      # أقل طول لكل جزء (أقصر من كده التقسيم مش مجدي)
+MIN_PARALLEL_DURATION = 120.0  # فيديوهات أقصر من كده تتصدر بالطريقة العادية
+
+_PTS_RE = re.compile(r'pts_time:\s*([\d.]+)')
+
+def default_workers() -> int:
+    """عدد الـ Processes الافتراضي حسب عدد الأنوية."""
+    return max(1, min(encoder_profile.cpu_count(), 8))
+
+def output_duration(video_path: str, actions: List[Dict]) -> Optional[float]:
+    """مدة الناتج من metadata المصدر + خطوات trim / speed (من غير decode ولا بناء الكليب)."""
+    duration = (action_schema.media_info(video_path) or {}).get('duration')
+    if not duration:
+        return None
+    mapped = timeline.map_interval(0.0, duration, timeline.resolve(actions, duration))
+    return mapped[1] - mapped[0] if mapped else 0.0
+
+def find_keyframes(video_path: str) -> List[float]:
+    """أوقات الـ Keyframes في الفيديو الأصلي (فك ترميز الـ Keyframes فقط)."""
+    ffmpeg = get_ffmpeg_path()
+    if not ffmpeg:
+        return []
+    proc = subprocess.run(
+        [ffmpeg, '-hide_banner', '-skip_frame', 'nokey', '-i', video_path,
+         '-map', '0:v:0', '-vf', 'showinfo', '-f', 'null', '-'],
+        capture_output=True, text=True, errors='replace'
+    )
+    return [float(t) for t in _PTS_RE.findall(proc.stderr)]
+
+def plan_chunks(keyframes: List[float], actions: List[Dict], duration: float,
+                fps: float, num_chunks: int) -> List[Tuple[float, float]]:
+    """
+    تقسيم زمن الناتج [0, duration) إلى أجزاء متقاربة.
+    نقاط التقسيم = أقرب Keyframe (بعد تحويله لزمن الناتج) مقربة لحدود الفريمات.
+    """
+    candidates = sorted({
+        round(mapped * fps) / fps
+        for mapped in (timeline.source_to_output(k, actions) for k in keyframes)
+        if mapped is not None and 0 < mapped < duration
+    })
+    if not candidates:
+        candidates = [round(duration * i / num_chunks * fps) / fps for i in range(1, num_chunks)]
+
+    cuts = []
+    for i in range(1, num_chunks):
+        target = duration * i / num_chunks
+        cut = min(candidates, key=lambda c: abs(c - target))
+        if cut not in cuts and (not cuts or cut > cuts[-1]):
+            cuts.append(cut)
+
+    bounds = [0.0] + cuts + [duration]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]]
+
+def _render_chunk(job: Dict, cancel=None, events=None) -> str:
+    """
+    تصدير جزء واحد (صورة فقط) - يعمل داخل Process منفصل.
+    cancel / events (Manager proxies): مع كل progress event الإلغاء بيتشاف وعدد الفريمات بيتبعت للأب.
+    """
+    def on_event(event):
+        if cancel is not None and cancel.is_set():
+            raise progress_events.RenderCancelled()
+        if events is not None:
+            events.put((job['index'], event['done']))
+
+    if cancel is not None and cancel.is_set():
+        raise progress_events.RenderCancelled()
+    clip = VideoFileClip(job['video_path'])
+    final = media_engine.apply_edit_actions(clip, job['actions'])
+    try:
+        # نقص نص فريم من النهاية حتى لا يتكرر الفريم الحدودي في الجزء التالي
+        end = job['end'] if job['last'] else job['end'] - 0.5 / job['fps']
+        part = final.subclip(job['start'], min(end, final.duration)).without_audio()
+        part.write_videofile(job['output'], fps=job['fps'], codec=job['codec'], audio=False,
+                             logger=progress_events.tracker(on_event), **job['encoder'])
+        return job['output']
+    finally:
+        final.close()
+        clip.close()
+
+def _render_audio(final, audio_codec: str, work_dir: str) -> str:
+    """تصدير الصوت النهائي (أصلي + موسيقى) كمسار واحد متصل (None = الفيديو مالوش صوت؛ الفشل بيرمي)."""
+    audio_path = os.path.join(work_dir, f"audio{audio_mixer.AUDIO_EXTENSIONS.get(audio_codec, '.m4a')}")
+    return media_engine.render_audio_track(final, audio_path, audio_codec)
+
+def _drain(events, frames: List[int], jobs: List[Dict]):
+    """آخر عدد فريمات وصل من كل جزء."""
+    while True:
+        try:
+            index, done = events.get_nowait()
+        except queue.Empty:
+            return
+        frames[index] = max(frames[index], min(done, jobs[index]['frames']))
+
+def _render_chunks(jobs: List[Dict], workers: int, progress=None) -> List[str]:
+    """
+    تصدير الأجزاء بالتوازي (workers process بالكتير).
+    التقدم: فريمات كل الأجزاء مجمعة في event واحد (stage = 'video') كل MIN_INTERVAL.
+    الإلغاء / فشل جزء: cancel بيتشاف جوه الـ processes مع كل progress event، فالأجزاء الشغالة
+    بتقف خلال MIN_INTERVAL تقريباً بدل ما تكمل لآخرها.
+    """
+    started = time.perf_counter()
+    total = sum(job['frames'] for job in jobs)
+    frames = [0] * len(jobs)
+    with multiprocessing.Manager() as manager:
+        cancel, events = manager.Event(), manager.Queue()
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as executor:
+            futures = {executor.submit(_render_chunk, job, cancel, events): job['index'] for job in jobs}
+            try:
+                pending = set(futures)
+                while pending:
+                    finished, pending = wait(pending, timeout=progress_events.MIN_INTERVAL,
+                                             return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()  # جزء فشل → الباقي يقف فوراً
+                        frames[futures[future]] = jobs[futures[future]]['frames']
+                    _drain(events, frames, jobs)
+                    if progress:
+                        # كل دورة (حتى من غير فريمات جديدة) عشان الإلغاء يتشاف من غير ما يستنى جزء يخلص
+                        progress(progress_events.make_event("video", sum(frames), total, started))
+            except BaseException:
+                cancel.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            return [future.result() for future in futures]
+
+def concat_chunks(chunk_paths: List[str], output_path: str, audio_path: str = None) -> str:
+    """دمج الأجزاء بـ concat demuxer (stream copy) + إضافة مسار الصوت."""
+    list_path = os.path.join(os.path.dirname(chunk_paths[0]), 'chunks.txt')
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in chunk_paths:
+            f.write(f"file '{path}'\n")
+
+    cmd = [get_ffmpeg_path(), '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_path:
+        cmd += ['-i', audio_path, '-map', '0:v', '-map', '1:a']
+    cmd += ['-c', 'copy', output_path]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return output_path
+
+def _render_chunked(video_path: str, actions: List[Dict], final, chunks: List[Tuple[float, float]],
+                    format: str, output_path: str, workers: int, profiler=None, progress=None):
+    """الأجزاء (Processes) + مسار الصوت + الدمج في output_path."""
+    codec, audio_codec = media_engine.FORMAT_CODECS[format]
+    # الأجزاء محجوزة كـ jobs في encoder_profile: أي تصدير تاني بيبدأ في نفس الوقت بياخد threads أقل
+    with encoder_profile.reserve(len(chunks)), temp_manager.scratch(kind="render") as work_dir:
+        os.makedirs(work_dir)
+        encoder = encoder_profile.plan(codec, encoder_profile.concurrent_jobs())
+        jobs = [{
+            'index': i, 'video_path': video_path, 'actions': actions, 'fps': final.fps,
+            'frames': max(1, round((end - start) * final.fps)),
+            'start': start, 'end': end, 'last': i == len(chunks) - 1,
+            'codec': codec, 'encoder': encoder,
+            'output': os.path.join(work_dir, f"chunk_{i:03d}.{format}")
+        } for i, (start, end) in enumerate(chunks)]
+
+        with stage(profiler, "render_chunks", chunks=len(jobs)) as info:
+            chunk_paths = _render_chunks(jobs, workers, progress)
+            info['bytes'] = sum(os.path.getsize(p) for p in chunk_paths)
+        with stage(profiler, "mix_audio"):
+            audio_path = _render_audio(final, audio_codec, work_dir)
+        with stage(profiler, "concat") as info:
+            concat_chunks(chunk_paths, output_path, audio_path)
+            info['bytes'] = os.path.getsize(output_path)
+
+def render_parallel(video_path: str, actions: List[Dict], music_path: str = None,
+                    output_dir: str = None, format: str = "mp4", workers: int = None,
+                    profiler=None, progress=None) -> str:
+    """
+    تصدير فيديو واحد طويل على عدة أنوية.
+    يرجع للتصدير العادي لو الفيديو قصير أو الصيغة GIF.
+    profiler (اختياري): الأجزاء بتتقاس كمراحل (الفريمات جوه الـ Processes مش بتتقاس).
+    progress (اختياري): events فريمات مجمعة من كل الأجزاء؛ لو رمى RenderCancelled الأجزاء الشغالة بتقف.
+    """
+    workers = workers or default_workers()
+    clip = VideoFileClip(video_path)
+    actions = timeline.resolve(actions, clip.duration)  # trim_last → trim (للـ keyframes والأجزاء)
+    final = media_engine.apply_edit_actions(clip, actions, music_path, profiler)
+    try:
+        num_chunks = min(workers, int(final.duration // MIN_CHUNK_SECONDS))
+        if format not in media_engine.FORMAT_CODECS or num_chunks < 2:
+            return media_engine.export_video(final, output_dir, format, profiler, progress)
+
+        with stage(profiler, "find_keyframes"):
+            keyframes = find_keyframes(video_path)
+        chunks = plan_chunks(keyframes, actions, final.duration, final.fps, num_chunks)
+        output_path = media_engine.make_output_path(output_dir, format)
+
+        try:
+            _render_chunked(video_path, actions, final, chunks, format, output_path, workers, profiler, progress)
+        except BaseException:
+            # فشل أو إلغاء: مفيش ملف ناقص في مجلد الإخراج
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+        soft_cues = getattr(final, 'soft_subtitles', None)
+        if soft_cues:
+            with stage(profiler, "mux_soft_subtitles"):
+                subtitle_engine.mux_soft_subtitles(output_path, soft_cues)
+        return output_path
+    finally:
+        final.close()
+        clip.close()
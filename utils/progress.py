@@ -0,0 +1,72 @@
+"""
+Progress Events: تقدم التصدير الحقيقي من طبقة الريندر (بدل logger=None).
+
+كل event عبارة عن dict:
+    {'stage': 'video' | 'audio', 'done': 120, 'total': 300, 'progress': 0.4,
+     'fps': 58.3, 'eta': 3.1, 'bytes': 1048576, 'elapsed': 2.06}
+
+- ProgressTracker: proglog logger بيتمرر لـ MoviePy ويحول الـ bars لـ events.
+- الـ events بتتبعت كل MIN_INTERVAL ثانية بالكتير (الفريم الأخير دايماً بيتبعت)،
+  فتكلفة التقرير على الريندر = مقارنة وقت واحدة لكل فريم.
+- الـ callback ممكن يرمي RenderCancelled لإيقاف الريندر.
+"""
+import os
+import time
+from typing import Callable, Dict, Optional
+import proglog
+
+MIN_INTERVAL = 0.25
+BAR_STAGES = {'t': 'video', 'chunk': 'audio'}  # أسماء الـ bars في MoviePy
+
+class RenderCancelled(Exception):
+    """الريندر اتلغى (بيترمي من الـ progress callback)."""
+
+def make_event(stage: str, done: int, total: int, started: float, output_path: str = None) -> Dict:
+    """بناء event تقدم (fps / ETA محسوبين من بداية المرحلة)."""
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    event = {
+        'stage': stage, 'done': done, 'total': total,
+        'progress': min(1.0, done / total) if total else 0.0,
+        'fps': round(rate, 1),
+        'eta': round((total - done) / rate, 1) if rate and total else None,
+        'elapsed': round(elapsed, 2), 'bytes': None,
+    }
+    if output_path and os.path.exists(output_path):
+        event['bytes'] = os.path.getsize(output_path)
+    return event
+
+class ProgressTracker(proglog.ProgressBarLogger):
+    """proglog logger → progress events (throttled)."""
+
+    def __init__(self, callback: Callable[[Dict], None], output_path: str = None,
+                 min_interval: float = MIN_INTERVAL):
+        super().__init__(logged_bars=None)  # بدون تخزين رسالة لكل فريم
+        self.on_event = callback  # (proglog بيستخدم self.callback داخلياً)
+        self.output_path = output_path
+        self.min_interval = min_interval
+        self._totals: Dict[str, int] = {}
+        self._started: Dict[str, float] = {}
+        self._last = 0.0
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        stage = BAR_STAGES.get(bar)
+        if stage is None:
+            return
+        if attr == 'total':
+            self._totals[bar] = value
+            self._started[bar] = time.perf_counter()
+            return
+        if attr != 'index':
+            return
+        total = self._totals.get(bar, 0)
+        done = min(value + 1, total) if total else value + 1
+        now = time.perf_counter()
+        if now - self._last < self.min_interval and done < total:
+            return
+        self._last = now
+        self.on_event(make_event(stage, done, total, self._started.get(bar, now), self.output_path))
+
+def tracker(callback: Optional[Callable], output_path: str = None) -> Optional[ProgressTracker]:
+    """ProgressTracker لو فيه callback، وإلا None (MoviePy بدون أي logger)."""
+    return ProgressTracker(callback, output_path) if callback else None
@@ -0,0 +1,215 @@
+"""
+Project Bundles: نقل مشروع كامل لجهاز تاني كملف واحد (.aivproj = zip).
+
+محتوى الـ bundle:
+  manifest.json        — الاسم، الـ actions، نسخ المشروع (diff عن النسخة اللي قبلها)، تاريخ Undo،
+                         والميديا كمراجع sha256 (مفيش ولا مسار محلي).
+  media/<sha256><ext>  — كل محتوى مرة واحدة (لو الموسيقى والفيديو نفس الملف = entry واحد)، ZIP_STORED.
+
+- التصدير والاستيراد streaming بـ chunks: الميديا عمرها ما بتتحمل في الذاكرة (يشتغل على ملف أو file object).
+- الاستيراد بيحط الميديا في MEDIA_DIR/<hash[:2]>/<hash><ext>؛ لو الـ hash موجود (مشروع تاني بنفس الفيديو)
+  مفيش ولا byte بيتنسخ، فالوقت على قد الـ manifest.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import zipfile
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+from . import session_manager
+from .config import MEDIA_DIR
+
+BUNDLE_EXT = ".aivproj"
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+CHUNK = 1024 * 1024
+MEDIA_ROLES = ("video_path", "music_path")
+
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+_EXT_RE = re.compile(r"(\.[A-Za-z0-9]{1,8})?")
+_hashes: Dict[Tuple[str, int, int], str] = {}
+
+# ==================== Media Store ====================
+
+def file_hash(path: str) -> str:
+    """sha256 للملف بالـ chunks (محفوظ بمفتاح path + size + mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK), b''):
+                digest.update(chunk)
+        _hashes[key] = digest.hexdigest()
+    return _hashes[key]
+
+def media_path(digest: str, ext: str = "") -> str:
+    return str(MEDIA_DIR / digest[:2] / f"{digest}{ext.lower()}")
+
+def find_media(digest: str) -> Optional[str]:
+    """مسار المحتوى ده لو موجود في الـ store (بأي امتداد)."""
+    folder = MEDIA_DIR / digest[:2]
+    if folder.is_dir():
+        for entry in os.scandir(folder):
+            if entry.name.startswith(digest) and not entry.name.endswith(".part"):
+                return entry.path
+    return None
+
+def _extract(zf: zipfile.ZipFile, digest: str, ext: str) -> str:
+    """فك entry ميديا للـ store مع التحقق من الـ hash أثناء النسخ (atomic: .part ثم replace)."""
+    target = media_path(digest, ext)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    partial = f"{target}.{os.getpid()}.part"
+    check = hashlib.sha256()
+    try:
+        with zf.open(f"media/{digest}{ext}") as src, open(partial, 'wb') as dst:
+            for chunk in iter(lambda: src.read(CHUNK), b''):
+                check.update(chunk)
+                dst.write(chunk)
+        if check.hexdigest() != digest:
+            raise ValueError(f"Media hash mismatch: {digest}")
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return target
+
+# ==================== Export ====================
+
+def _version_records(session_id: int) -> List[Dict]:
+    """نسخ المشروع كـ diffs متتالية (كل واحدة عن اللي قبلها)."""
+    records, previous = [], []
+    for version in session_manager.iter_versions(session_id):
+        keep, tail = session_manager.diff_actions(previous, version['actions'])
+        records.append({'keep': keep, 'tail': tail, 'command_text': version['command_text'],
+                        'created_at': version['created_at']})
+        previous = version['actions']
+    return records
+
+def _undo_records(refs: Dict[str, str]) -> Dict:
+    """تاريخ Undo (مربوط بمحتوى الفيديو) من غير ملفات الريندر — مكانها على الجهاز ده بس."""
+    video = refs.get('video_path')
+    saved = session_manager.history_load(session_manager.history_key(video)) if video else {'states': []}
+    states, cursor = [], None
+    for seq, state_json in saved['states']:
+        state = json.loads(state_json)
+        if seq == saved.get('cursor'):
+            cursor = len(states)
+        states.append({'actions': state.get('actions', []),
+                       'music': refs.get('music_path') if state.get('music_path') else None})
+    return {'states': states, 'cursor': cursor}
+
+def export_bundle(session_id: int, dest: Union[str, BinaryIO]) -> Optional[Dict]:
+    """
+    كتابة المشروع كـ bundle في dest (مسار أو file object قابل للكتابة، حتى لو مش seekable).
+    بيرجع الـ manifest، أو None لو المشروع مش موجود.
+    """
+    session = session_manager.load_session(session_id)
+    if not session:
+        return None
+    media, sources, refs = {}, {}, {}
+    for role in MEDIA_ROLES:
+        path = session.get(role)
+        if path and os.path.isfile(path):
+            digest = file_hash(path)
+            refs[role] = digest
+            if digest not in media:
+                media[digest] = {'ext': os.path.splitext(path)[1].lower(), 'size': os.path.getsize(path),
+                                 'name': os.path.basename(path)}
+                sources[digest] = path
+    manifest = {
+        'format': FORMAT_VERSION,
+        'name': session['name'],
+        'actions': session['actions'],
+        'media': media,
+        'refs': refs,
+        'versions': _version_records(session_id),
+        'undo': _undo_records(refs),
+        'exported_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with zipfile.ZipFile(dest, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+        for digest, info in media.items():
+            entry = zipfile.ZipInfo(f"media/{digest}{info['ext']}", date_time=time.localtime()[:6])
+            entry.compress_type = zipfile.ZIP_STORED  # فيديو/صوت مضغوط أصلاً
+            entry.file_size = info['size']            # عشان zip64 يتحدد للملفات > 4GB
+            with open(sources[digest], 'rb') as src, zf.open(entry, 'w') as dst:
+                shutil.copyfileobj(src, dst, CHUNK)
+    return manifest
+
+# ==================== Import ====================
+
+def read_manifest(source: Union[str, BinaryIO]) -> Dict:
+    """قراية الـ manifest بس (من غير لمس الميديا)."""
+    with zipfile.ZipFile(source) as zf:
+        return _load_manifest(zf)
+
+def _load_manifest(zf: zipfile.ZipFile) -> Dict:
+    manifest = json.loads(zf.read(MANIFEST))
+    if manifest.get('format', 0) > FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format: {manifest.get('format')}")
+    for digest, info in manifest.get('media', {}).items():
+        if not _DIGEST_RE.fullmatch(digest) or not _EXT_RE.fullmatch(info.get('ext', '')):
+            raise ValueError(f"Invalid media entry: {digest}")
+    return manifest
+
+def _replay(actions: List[Dict], record: Dict) -> List[Dict]:
+    return actions[:record.get('keep', 0)] + record.get('tail', [])
+
+def import_bundle(source: Union[str, BinaryIO], name: str = None) -> Optional[int]:
+    """
+    استيراد bundle كمشروع جديد: الميديا الموجودة في الـ store بتتربط بالـ hash والناقصة بس بتتفك.
+    بيرجع id المشروع الجديد.
+    """
+    with zipfile.ZipFile(source) as zf:
+        manifest = _load_manifest(zf)
+        stored = {}
+        for digest, info in manifest.get('media', {}).items():
+            stored[digest] = find_media(digest) or _extract(zf, digest, info.get('ext', ''))
+
+    refs = manifest.get('refs', {})
+    video_path = stored.get(refs.get('video_path'), '')
+    music_path = stored.get(refs.get('music_path'))
+    name = name or manifest.get('name') or 'Imported Session'
+
+    versions = manifest.get('versions') or [{'keep': 0, 'tail': manifest.get('actions', [])}]
+    actions = _replay([], versions[0])
+    session_id = session_manager.create_session(name, video_path, actions, music_path,
+                                                versions[0].get('command_text'))
+    if session_id is None:
+        return None
+    for record in versions[1:]:
+        actions = _replay(actions, record)
+        session_manager.save_version(session_id, actions, record.get('command_text'))
+    if actions != manifest.get('actions', actions):
+        session_manager.save_version(session_id, manifest['actions'])
+
+    if video_path:
+        _restore_undo(manifest.get('undo') or {}, refs['video_path'], video_path, stored)
+    return session_id
+
+def _restore_undo(undo: Dict, digest: str, video_path: str, stored: Dict[str, str]):
+    """
+    تاريخ Undo بيترجع بـ history_key(sha256 الفيديو) — نفس المفتاح اللي الواجهة بتربط بيه
+    لما نفس الفيديو يترفع تاني. لو الفيديو ليه تاريخ هنا أصلاً بيفضل زي ما هو (الـ bundle مبيمسحش حاجة).
+    """
+    states = undo.get('states') or []
+    if not states:
+        return
+    key = session_manager.history_key(digest)
+    if session_manager.history_load(key)['states']:
+        return
+    seqs = []
+    for state in states:
+        state_json = json.dumps({'video_path': video_path, 'actions': state.get('actions', []),
+                                 'music_path': stored.get(state.get('music')), 'outputs': {}, 'previews': []})
+        head = seqs[-1] if seqs else 0
+        seq = session_manager.history_append(key, state_json, head, head, len(states))
+        if seq is None:
+            return  # جلسة تانية بدأت تكتب تاريخ نفس الفيديو في نفس اللحظة
+        seqs.append(seq)
+    cursor = undo.get('cursor')
+    if cursor is not None and 0 <= cursor < len(seqs) and seqs[cursor]:
+        session_manager.history_set_cursor(key, seqs[cursor])
@@ -0,0 +1,114 @@
+"""
+Render Profiler: قياس وقت كل مرحلة في التصدير (decode / كل تعديل / subtitles / music / encode).
+
+- stage(): مرحلة عادية (setup، دمج الصوت، الكتابة...) بوقتها الكلي.
+- wrap(): طبقة حوالين get_frame بتقيس الوقت الخاص بكل تعديل لكل فريم
+  (self time = الوقت الكلي - وقت الطبقات اللي تحتها).
+- الناتج: ملف Chrome Trace JSON (يفتح في chrome://tracing أو speedscope) + جدول ملخص.
+اختياري بالكامل: لو profiler = None كل الدوال بترجع بدون أي تكلفة.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+MAX_FRAME_EVENTS = 20000  # بعدها الفريمات تتجمع في الملخص فقط (حجم ملف الـ trace)
+
+class RenderProfiler:
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.stages: Dict[str, Dict] = {}
+        self.frame_layers: Dict[str, Dict] = {}
+        self.frame_time = 0.0  # وقت سلسلة الفريمات كاملة (أعلى طبقة)
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _ts(self, t: float) -> float:
+        return round((t - self._origin) * 1e6, 1)
+
+    def _event(self, name: str, cat: str, start: float, duration: float, args: Dict = None):
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': self._ts(start),
+                 'dur': round(duration * 1e6, 1), 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    @contextmanager
+    def stage(self, name: str, **args):
+        """مرحلة بوقتها الكلي؛ args (مثل bytes) ممكن تتعدل جوه الـ with."""
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                row = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'bytes': 0})
+                row['calls'] += 1
+                row['seconds'] += duration
+                row['bytes'] += int(args.get('bytes', 0))
+                self._event(name, 'stage', start, duration, args)
+
+    def wrap(self, clip, name: str):
+        """طبقة قياس حوالين get_frame للكليب."""
+        layer = self.frame_layers.setdefault(name, {'frames': 0, 'seconds': 0.0})
+
+        def timed(get_frame, t):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            frame = get_frame(t)
+            elapsed = time.perf_counter() - start
+            own = elapsed - stack.pop()
+            with self._lock:
+                layer['frames'] += 1
+                layer['seconds'] += own
+                if stack:
+                    stack[-1] += elapsed
+                else:
+                    self.frame_time += elapsed
+                if len(self.events) < MAX_FRAME_EVENTS:
+                    self._event(name, 'frame', start, elapsed, {'t': round(t, 3)})
+            return frame
+
+        return clip.fl(timed, apply_to=[])
+
+    def summary(self) -> List[Dict]:
+        """صفوف الملخص: المراحل + الوقت الخاص بكل طبقة فريمات + الترميز (الباقي من الكتابة)."""
+        rows = [{'stage': name, 'calls': row['calls'], 'frames': None, 'seconds': round(row['seconds'], 3),
+                 'ms_per_frame': None, 'bytes': row['bytes'] or None}
+                for name, row in self.stages.items()]
+        for name, layer in self.frame_layers.items():
+            per_frame = layer['seconds'] / layer['frames'] * 1000 if layer['frames'] else None
+            rows.append({'stage': f"frames: {name}", 'calls': None, 'frames': layer['frames'],
+                         'seconds': round(layer['seconds'], 3),
+                         'ms_per_frame': round(per_frame, 2) if per_frame else None, 'bytes': None})
+        write = self.stages.get('write_video')
+        if write and self.frame_layers:
+            rows.append({'stage': 'encode + io (write - frames)', 'calls': None, 'frames': None,
+                         'seconds': round(max(0.0, write['seconds'] - self.frame_time), 3),
+                         'ms_per_frame': None, 'bytes': None})
+        return rows
+
+    def summary_table(self) -> str:
+        lines = [f"{'stage':<34}{'frames':>8}{'seconds':>10}{'ms/frame':>10}{'bytes':>12}"]
+        for row in self.summary():
+            lines.append(f"{row['stage']:<34}{row['frames'] or '':>8}{row['seconds']:>10.3f}"
+                         f"{row['ms_per_frame'] or '':>10}{row['bytes'] or '':>12}")
+        return "\n".join(lines)
+
+    def save_trace(self, path: str) -> str:
+        """Chrome Trace Event format (chrome://tracing / speedscope / Perfetto)."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+# ==================== Helpers (بدون تكلفة لو مفيش profiler) ====================
+
+def stage(profiler: Optional[RenderProfiler], name: str, **args):
+    return profiler.stage(name, **args) if profiler else nullcontext(args)
+
+def wrap(profiler: Optional[RenderProfiler], clip, name: str):
+    return profiler.wrap(clip, name) if profiler else clip
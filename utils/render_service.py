@@ -0,0 +1,180 @@
+"""
+Render Service: تصدير الفيديوهات في الخلفية (Thread Pool) بدل thread الـ Streamlit.
+
+- submit() يرجع job_id فوراً، والواجهة تسأل عن الحالة (polling) كل ثانية.
+- التقدم (فريمات / إجمالي / fps / bytes / ETA) من progress events (utils/progress.py).
+- الإلغاء: callback الـ progress بيرمي RenderCancelled عند الـ event التالي والملف الناقص بيتمسح.
+- Service واحد مشترك لكل المستخدمين (st.cache_resource)، والـ jobs بتشتغل بالتوازي
+  لحد max_workers (encoder_profile بيوزع الأنوية عليهم).
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from moviepy.editor import VideoFileClip
+from . import action_schema, media_engine, parallel_render, encoder_profile, temp_manager, template_plans
+from .progress import RenderCancelled
+from .render_profiler import RenderProfiler
+
+FINISHED = ("done", "error", "cancelled")
+
+class RenderJob:
+    """حالة job تصدير واحد (بتتحدث من thread الـ render وبتتقرا من الواجهة)."""
+
+    def __init__(self, video_path: str, actions: List[Dict], music_path: str = None,
+                 formats: List[str] = None, owner: str = None, profile: bool = False, plan: Dict = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.video_path = video_path
+        self.actions = actions
+        self.plan = plan  # render plan قالب (template_plans): fast path FFmpeg لو متاح
+        self.music_path = music_path
+        self.formats = formats or ["mp4"]
+        self.owner = owner
+        self.profiler = RenderProfiler() if profile else None
+        self.status = "queued"
+        self.format_index = 0
+        self.last_event: Dict = {}
+        self.outputs: Dict[str, str] = {}
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def progress(self) -> float:
+        """نسبة الإنجاز (0..1) على كل الصيغ المطلوبة."""
+        if self.status == "done":
+            return 1.0
+        current = self.last_event.get('progress', 0.0) if self.last_event.get('stage') != 'audio' else 0.0
+        return min(1.0, (self.format_index + current) / len(self.formats))
+
+    @property
+    def eta(self) -> Optional[float]:
+        if self.status != "running" or not self.started_at or self.progress <= 0:
+            return None
+        elapsed = time.time() - self.started_at
+        return elapsed / self.progress * (1 - self.progress)
+
+    def on_progress(self, event: Dict):
+        """استقبال progress event من طبقة الريندر (ونقطة الإلغاء)."""
+        if self.cancel_event.is_set():
+            raise RenderCancelled()
+        self.last_event = event
+
+    def snapshot(self) -> Dict:
+        event = self.last_event
+        return {
+            'id': self.id, 'status': self.status, 'progress': self.progress, 'eta': self.eta,
+            'format': self.formats[min(self.format_index, len(self.formats) - 1)],
+            'stage': event.get('stage'), 'done': event.get('done', 0), 'total': event.get('total', 0),
+            'fps': event.get('fps'), 'bytes': event.get('bytes'),
+            'outputs': dict(self.outputs), 'error': self.error,
+        }
+
+class RenderService:
+    def __init__(self, max_workers: int = None):
+        workers = max_workers or max(2, encoder_profile.batch_workers(encoder_profile.MAX_BATCH_JOBS))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.jobs: Dict[str, RenderJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, video_path: str, actions: List[Dict], music_path: str = None,
+               formats: List[str] = None, owner: str = None, profile: bool = False, plan: Dict = None) -> str:
+        """
+        إضافة job؛ الأوامر الغلط بترمي action_schema.ActionError هنا قبل ما الـ job يتعمل.
+        plan (اختياري): render plan قالب جاهزة (actions = plan['actions']).
+        """
+        actions = plan['actions'] if plan else actions
+        action_schema.validate(actions, video_path)
+        job = RenderJob(video_path, actions, music_path, formats, owner, profile, plan)
+        with self._lock:
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        return self.jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.get(job_id)
+        return job.snapshot() if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if not job or job.status in FINISHED:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def list_jobs(self, owner: str = None) -> List[RenderJob]:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [j for j in jobs if owner is None or j.owner == owner]
+
+    def forget(self, job_id: str):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    def shutdown(self):
+        for job in self.list_jobs():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False)
+
+    def _is_parallel(self, job: RenderJob) -> bool:
+        """فيديو طويل بصيغة واحدة → الأجزاء في Processes (بيتقرر من الـ metadata قبل بناء الكليب)."""
+        if len(job.formats) != 1 or job.formats[0] == "gif" or media_engine.is_soft_subtitle_only(job.actions):
+            return False
+        if job.plan and job.plan.get('ffmpeg'):
+            return False  # process FFmpeg واحد أسرع من أجزاء MoviePy
+        duration = parallel_render.output_duration(job.video_path, job.actions)
+        return bool(duration) and duration >= parallel_render.MIN_PARALLEL_DURATION
+
+    def _run(self, job: RenderJob):
+        if job.cancel_event.is_set():
+            job.status = "cancelled"
+            return
+        job.status, job.started_at = "running", time.time()
+        clip = final = None
+        owner = f"job:{job.id}"
+        for path in (job.video_path, job.music_path):
+            if path:
+                temp_manager.acquire(path, owner)  # الرفع ما يتمسحش بالـ LRU أثناء التصدير
+        try:
+            if self._is_parallel(job):
+                # render_parallel بيبني الكليب بنفسه؛ التقدم فريمات من كل الأجزاء والإلغاء بيوقف الشغالين
+                fmt = job.formats[0]
+                job.outputs[fmt] = parallel_render.render_parallel(job.video_path, job.actions, job.music_path,
+                                                                   format=fmt, profiler=job.profiler,
+                                                                   progress=job.on_progress)
+            else:
+                for i, fmt in enumerate(job.formats):
+                    job.format_index, job.last_event = i, {}
+                    if job.cancel_event.is_set():
+                        raise RenderCancelled()
+                    # ترجمة soft بس: stream copy من المصدر من غير ما الكليب يتبني
+                    output = media_engine.remux_soft_subtitles(job.video_path, job.actions, format=fmt,
+                                                               profiler=job.profiler)
+                    if output is None and fmt != "gif" and job.plan and job.plan.get('ffmpeg'):
+                        output = template_plans.render_plan(job.plan, job.video_path, format=fmt,
+                                                            music_path=job.music_path, progress=job.on_progress)
+                    if output is None:
+                        if final is None:
+                            clip = VideoFileClip(job.video_path)
+                            final = media_engine.apply_edit_actions(clip, job.actions, job.music_path, job.profiler)
+                        output = media_engine.export_video(final, format=fmt, profiler=job.profiler,
+                                                           progress=job.on_progress)
+                    job.outputs[fmt] = output
+            job.status = "done"
+        except RenderCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status, job.error = "error", f"{e}\n{traceback.format_exc()}"
+        finally:
+            temp_manager.release_owner(owner)
+            job.finished_at = time.time()
+            for c in (final, clip):
+                if c is not None:
+                    c.close()
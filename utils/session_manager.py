@@ -1,17 +1,30 @@
 """
 إدارة مشاريع Sessions: حفظ/فتح مشاريع كاملة.
+
+- كل حفظ لمشروع موجود = version جديدة بـ parent pointer وبتخزن diff بس (عدد الـ actions المشتركة
+  من الأول + الباقي)، وكل SNAPSHOT_EVERY نسخة فيه snapshot كاملة → تحميل أي نسخة قديمة = snapshot
+  + كام diff. الـ head نفسه متخزن كامل في sessions.actions_json (الفتح العادي قراية صف واحد).
+- indexes على الاسم و (updated_at, id)، والقائمة بـ keyset paging (cursor) بدل scan للجدول كله.
+- بحث FTS5 على الاسم ونص الأوامر؛ لو SQLite مبني من غير FTS5 بيرجع لـ LIKE.
 """
 import os
 import json
 import sqlite3
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, Iterator
 from datetime import datetime
 from .config import DB_SESSIONS_PATH
 
 DB_PATH = str(DB_SESSIONS_PATH)
+SNAPSHOT_EVERY = 20
+PAGE_SIZE = 50
+COMMAND_TEXT_MAX = 20000  # آخر نص أوامر بيتفهرس في البحث (مش بيكبر للأبد)
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"  # millisecond عشان الترتيب ثابت بين حفظين ورا بعض
+
+_initialized = set()
+_fts: Dict[str, bool] = {}
 
 def init_database():
-    """إنشاء قاعدة بيانات Sessions."""
+    """إنشاء قاعدة بيانات Sessions (+ migration للقواعد القديمة)."""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
@@ -26,46 +39,213 @@ def init_database():
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(sessions)")}
+    if 'head_version' not in columns:
+        cursor.execute("ALTER TABLE sessions ADD COLUMN head_version INTEGER")
+    if 'command_text' not in columns:
+        cursor.execute("ALTER TABLE sessions ADD COLUMN command_text TEXT")
+    
+    # النسخ: actions_json كامل (snapshot، depth = 0) أو diff عن الـ parent (keep + tail_json)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS session_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            parent_id INTEGER,
+            depth INTEGER NOT NULL DEFAULT 0,
+            actions_json TEXT,
+            keep INTEGER,
+            tail_json TEXT,
+            command_text TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_versions_session ON session_versions(session_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_name ON sessions(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at, id)")
+    
+    # مشاريع قديمة (قبل النسخ): الـ actions الحالية = أول snapshot
+    cursor.execute("""
+        INSERT INTO session_versions (session_id, depth, actions_json, created_at)
+        SELECT id, 0, actions_json, updated_at FROM sessions WHERE head_version IS NULL
+    """)
+    cursor.execute("""
+        UPDATE sessions SET head_version =
+            (SELECT MAX(v.id) FROM session_versions v WHERE v.session_id = sessions.id)
+        WHERE head_version IS NULL
+    """)
+    _fts[DB_PATH] = _init_fts(cursor)
+    
+    # تاريخ Undo/Redo لكل مشروع (seq بيزيد دايماً؛ الـ cursor = الحالة الحالية)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history_states (
+            history_key TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            state_json TEXT NOT NULL,
+            PRIMARY KEY (history_key, seq)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history_cursor (
+            history_key TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    """)
     
     conn.commit()
     conn.close()
+    _initialized.add(DB_PATH)
 
-def save_session(name: str, video_path: str, actions: List[Dict], music_path: str = None) -> bool:
-    """حفظ جلسة جديدة."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+def _init_fts(cursor) -> bool:
+    """جدول FTS5 (rowid = id المشروع)؛ أول مرة بيتملي من المشاريع الموجودة."""
+    try:
+        exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sessions_fts'").fetchone()
+        if not exists:
+            cursor.execute("CREATE VIRTUAL TABLE sessions_fts USING fts5("
+                           "name, command_text, tokenize = 'unicode61 remove_diacritics 2')")
+            cursor.execute("INSERT INTO sessions_fts (rowid, name, command_text) "
+                           "SELECT id, name, COALESCE(command_text, '') FROM sessions")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def _connect() -> sqlite3.Connection:
+    """اتصال بـ sessions.db (init مرة واحدة بس بدل CREATE TABLE مع كل استدعاء)."""
+    if DB_PATH not in _initialized:
+        init_database()
+    return sqlite3.connect(DB_PATH)
+
+# ==================== Versions ====================
+
+def _canonical(actions: List[Dict]) -> List[str]:
+    return [json.dumps(a, sort_keys=True, ensure_ascii=False) for a in actions]
+
+def diff_actions(parent: List[Dict], actions: List[Dict]) -> Tuple[int, List[Dict]]:
+    """(عدد الـ actions المشتركة من الأول، الباقي) — الأوامر بتتضاف في الآخر غالباً."""
+    old, new = _canonical(parent), _canonical(actions)
+    keep = 0
+    while keep < min(len(old), len(new)) and old[keep] == new[keep]:
+        keep += 1
+    return keep, actions[keep:]
+
+def _materialize(conn, version_id: int) -> Optional[List[Dict]]:
+    """الـ actions بتاعة نسخة: أقرب snapshot + الـ diffs اللي بعدها (SNAPSHOT_EVERY بالكتير)."""
+    chain = []
+    while version_id is not None:
+        row = conn.execute("SELECT parent_id, actions_json, keep, tail_json FROM session_versions WHERE id = ?",
+                           (version_id,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None:
+            actions = json.loads(row[1])
+            break
+        chain.append((row[2], json.loads(row[3])))
+        version_id = row[0]
+    else:
+        return None
+    for keep, tail in reversed(chain):
+        actions = actions[:keep] + tail
+    return actions
+
+def _fts_sync(conn, session_id: int):
+    if not _fts.get(DB_PATH):
+        return
+    conn.execute("DELETE FROM sessions_fts WHERE rowid = ?", (session_id,))
+    conn.execute("INSERT INTO sessions_fts (rowid, name, command_text) "
+                 "SELECT id, name, COALESCE(command_text, '') FROM sessions WHERE id = ?", (session_id,))
+
+def create_session(name: str, video_path: str, actions: List[Dict], music_path: str = None,
+                   command_text: str = None) -> Optional[int]:
+    """مشروع جديد بأول نسخة (snapshot)؛ بيرجع الـ id."""
+    conn = _connect()
     try:
         actions_json = json.dumps(actions, ensure_ascii=False)
-        cursor.execute("""
-            INSERT INTO sessions (name, video_path, actions_json, music_path)
-            VALUES (?, ?, ?, ?)
-        """, (name, video_path, actions_json, music_path))
+        session_id = conn.execute(f"""
+            INSERT INTO sessions (name, video_path, actions_json, music_path, command_text, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, {_NOW}, {_NOW})
+        """, (name, video_path, actions_json, music_path, command_text)).lastrowid
+        version_id = conn.execute(f"""
+            INSERT INTO session_versions (session_id, depth, actions_json, command_text, created_at)
+            VALUES (?, 0, ?, ?, {_NOW})
+        """, (session_id, actions_json, command_text)).lastrowid
+        conn.execute("UPDATE sessions SET head_version = ? WHERE id = ?", (version_id, session_id))
+        _fts_sync(conn, session_id)
         conn.commit()
-        return True
+        return session_id
     except Exception as e:
         print(f"Save session error: {e}")
-        return False
+        return None
     finally:
         conn.close()
 
-def load_session(session_id: int) -> Optional[Dict]:
-    """تحميل جلسة من ID."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+def save_version(session_id: int, actions: List[Dict], command_text: str = None,
+                 video_path: str = None, music_path: str = None) -> Optional[int]:
+    """نسخة جديدة لمشروع موجود (diff عن الـ head) + تحديث updated_at؛ بيرجع id النسخة."""
+    conn = _connect()
+    try:
+        row = conn.execute("""
+            SELECT s.actions_json, s.head_version, v.depth, s.command_text
+            FROM sessions s LEFT JOIN session_versions v ON v.id = s.head_version WHERE s.id = ?
+        """, (session_id,)).fetchone()
+        if row is None:
+            return None
+        head_json, head_id, depth, old_text = row
+        actions_json = json.dumps(actions, ensure_ascii=False)
+        if head_id is None or (depth or 0) + 1 >= SNAPSHOT_EVERY:
+            full, keep, tail, depth = actions_json, None, None, 0
+        else:
+            keep, tail = diff_actions(json.loads(head_json), actions)
+            full, tail, depth = None, json.dumps(tail, ensure_ascii=False), depth + 1
+        version_id = conn.execute(f"""
+            INSERT INTO session_versions (session_id, parent_id, depth, actions_json, keep, tail_json,
+                                          command_text, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, {_NOW})
+        """, (session_id, head_id, depth, full, keep, tail, command_text)).lastrowid
+        text = "\n".join(t for t in (old_text, command_text) if t)[-COMMAND_TEXT_MAX:] or None
+        conn.execute(f"""
+            UPDATE sessions SET actions_json = ?, head_version = ?, command_text = ?, updated_at = {_NOW},
+                video_path = COALESCE(?, video_path), music_path = COALESCE(?, music_path)
+            WHERE id = ?
+        """, (actions_json, version_id, text, video_path, music_path, session_id))
+        if command_text:
+            _fts_sync(conn, session_id)
+        conn.commit()
+        return version_id
+    except Exception as e:
+        print(f"Save version error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def save_session(name: str, video_path: str, actions: List[Dict], music_path: str = None,
+                 command_text: str = None, session_id: int = None) -> bool:
+    """حفظ جلسة: جديدة، أو نسخة جديدة من session_id لو اتبعت."""
+    if session_id is not None:
+        return save_version(session_id, actions, command_text, video_path, music_path) is not None
+    return create_session(name, video_path, actions, music_path, command_text) is not None
+
+def load_session(session_id: int, version_id: int = None) -> Optional[Dict]:
+    """تحميل جلسة من ID (الـ head، أو نسخة قديمة بـ version_id)."""
+    conn = _connect()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT name, video_path, actions_json, music_path FROM sessions WHERE id = ?", (session_id,))
+        cursor.execute("SELECT name, video_path, actions_json, music_path, head_version FROM sessions WHERE id = ?",
+                       (session_id,))
         row = cursor.fetchone()
         if row:
+            actions = json.loads(row[2])
+            if version_id is not None and version_id != row[4]:
+                owner = conn.execute("SELECT session_id FROM session_versions WHERE id = ?", (version_id,)).fetchone()
+                if not owner or owner[0] != session_id:
+                    return None
+                actions = _materialize(conn, version_id)
             return {
                 'id': session_id,
                 'name': row[0],
                 'video_path': row[1],
-                'actions': json.loads(row[2]),
-                'music_path': row[3]
+                'actions': actions,
+                'music_path': row[3],
+                'version_id': version_id or row[4]
             }
     except Exception as e:
         print(f"Load session error: {e}")
@@ -73,40 +253,107 @@ def load_session(session_id: int) -> Optional[Dict]:
         conn.close()
     return None
 
-def list_sessions() -> List[Dict]:
-    """قائمة بكل الجلسات المحفوظة."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def iter_versions(session_id: int) -> Iterator[Dict]:
+    """كل نسخ مشروع (الأقدم الأول) بالـ actions كاملة — بتتبني من الـ parent بدل ما كل نسخة تتبني لوحدها."""
+    conn = _connect()
+    try:
+        rows = conn.execute("""
+            SELECT id, parent_id, actions_json, keep, tail_json, command_text, created_at
+            FROM session_versions WHERE session_id = ? ORDER BY id
+        """, (session_id,)).fetchall()
+    finally:
+        conn.close()
+    built: Dict[int, List[Dict]] = {}
+    for version_id, parent_id, full, keep, tail, command_text, created_at in rows:
+        if full is not None:
+            actions = json.loads(full)
+        elif parent_id in built:
+            actions = built[parent_id][:keep] + json.loads(tail)
+        else:
+            continue
+        built[version_id] = actions
+        yield {'id': version_id, 'actions': actions, 'command_text': command_text, 'created_at': created_at}
+
+def list_versions(session_id: int) -> List[Dict]:
+    """نسخ مشروع (الأحدث الأول) من غير ما تتبني الـ actions."""
+    conn = _connect()
+    try:
+        rows = conn.execute("""
+            SELECT id, parent_id, actions_json IS NOT NULL, command_text, created_at
+            FROM session_versions WHERE session_id = ? ORDER BY id DESC
+        """, (session_id,)).fetchall()
+        return [{'id': r[0], 'parent_id': r[1], 'snapshot': bool(r[2]), 'command_text': r[3], 'created_at': r[4]}
+                for r in rows]
+    finally:
+        conn.close()
+
+# ==================== Listing / Search ====================
+
+def _fts_query(text: str) -> str:
+    """نص المستخدم → استعلام FTS5 آمن (كل كلمة prefix، والكلمات AND)."""
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+def page_sessions(limit: int = PAGE_SIZE, cursor: str = None, query: str = None) -> Dict:
+    """
+    صفحة من المشاريع (الأحدث تعديلاً الأول) بـ keyset paging على idx_sessions_updated:
+    {'items': [...], 'next_cursor': نص يتبعت للصفحة اللي بعدها أو None}.
+    query = بحث في الاسم ونص الأوامر.
+    """
+    conn = _connect()
+    where, params = [], []
+    if cursor:
+        updated, last_id = cursor.rsplit("|", 1)
+        where.append("(s.updated_at < ? OR (s.updated_at = ? AND s.id < ?))")
+        params += [updated, updated, int(last_id)]
+    if query and query.strip():
+        if _fts.get(DB_PATH):
+            where.append("s.id IN (SELECT rowid FROM sessions_fts WHERE sessions_fts MATCH ?)")
+            params.append(_fts_query(query))
+        else:
+            where.append("(s.name LIKE ? OR s.command_text LIKE ?)")
+            params += [f"%{query.strip()}%"] * 2
+    sql = "SELECT s.id, s.name, s.created_at, s.updated_at FROM sessions s"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY s.updated_at DESC, s.id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
     
     try:
-        cursor.execute("SELECT id, name, created_at, updated_at FROM sessions ORDER BY updated_at DESC")
-        rows = cursor.fetchall()
-        return [
-            {
-                'id': r[0],
-                'name': r[1],
-                'created_at': r[2],
-                'updated_at': r[3]
-            }
-            for r in rows
-        ]
+        rows = conn.execute(sql, params).fetchall()
+        more = bool(limit) and len(rows) > limit
+        rows = rows[:limit] if limit else rows
+        items = [{'id': r[0], 'name': r[1], 'created_at': r[2], 'updated_at': r[3]} for r in rows]
+        next_cursor = f"{rows[-1][3]}|{rows[-1][0]}" if more else None
+        return {'items': items, 'next_cursor': next_cursor}
     except Exception as e:
         print(f"List sessions error: {e}")
-        return []
+        return {'items': [], 'next_cursor': None}
     finally:
         conn.close()
 
+def search_sessions(query: str, limit: int = PAGE_SIZE) -> List[Dict]:
+    """بحث في أسماء المشاريع ونص أوامرها."""
+    return page_sessions(limit, query=query)['items']
+
+def list_sessions(limit: int = None, cursor: str = None) -> List[Dict]:
+    """قائمة الجلسات المحفوظة (الأحدث الأول)؛ limit/cursor للصفحات."""
+    return page_sessions(limit, cursor)['items']
+
 def delete_session(session_id: int) -> bool:
-    """حذف جلسة."""
-    init_database()
-    conn = sqlite3.connect(DB_PATH)
+    """حذف جلسة (ونسخها)."""
+    conn = _connect()
     cursor = conn.cursor()
     
     try:
         cursor.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        deleted = cursor.rowcount > 0
+        cursor.execute("DELETE FROM session_versions WHERE session_id = ?", (session_id,))
+        if _fts.get(DB_PATH):
+            cursor.execute("DELETE FROM sessions_fts WHERE rowid = ?", (session_id,))
         conn.commit()
-        return cursor.rowcount > 0
+        return deleted
     except Exception as e:
         print(f"Delete session error: {e}")
         return False
@@ -114,16 +361,19 @@ def delete_session(session_id: int) -> bool:
         conn.close()
 
 def export_session(session_id: int) -> Optional[str]:
-    """تصدير جلسة كـ JSON."""
+    """تصدير جلسة كـ JSON (مسارات محلية — للنقل لجهاز تاني: project_bundle.export_bundle)."""
     session = load_session(session_id)
     if session:
         return json.dumps(session, indent=2, ensure_ascii=False)
     return None
 
-def import_session(json_str: str) -> bool:
-    """استيراد جلسة من JSON."""
+def import_session(source) -> bool:
+    """استيراد جلسة من JSON، أو من project bundle (مسار ملف / file object — شوف project_bundle)."""
     try:
-        data = json.loads(json_str)
+        if hasattr(source, 'read') or (isinstance(source, (str, os.PathLike)) and os.path.isfile(source)):
+            from . import project_bundle
+            return project_bundle.import_bundle(source) is not None
+        data = json.loads(source)
         return save_session(
             data.get('name', 'Imported Session'),
             data.get('video_path', ''),
@@ -134,4 +384,79 @@ def import_session(json_str: str) -> bool:
         print(f"Import session error: {e}")
         return False
 
-init_database()
+# ==================== Undo/Redo History ====================
+
+HISTORY_KEY_LEN = 32
+
+def history_key(content_hash: str) -> str:
+    """
+    مفتاح تاريخ Undo/Redo لفيديو = أول 32 حرف من sha256 المحتوى: نفس المفتاح للرفع في الواجهة
+    (app_cache.history_key) وللـ bundles (project_bundle)، مهما كان اسم الملف أو مكانه.
+    """
+    return content_hash[:HISTORY_KEY_LEN].lower()
+
+def history_append(key: str, state_json: str, parent_seq: int, head_seq: int, keep: int) -> Optional[int]:
+    """
+    إضافة حالة فوق parent_seq: بيمسح فرع الـ redo (بعد parent_seq)، والحالات اللي خرجت من العمق
+    (أقدم من آخر keep)، ويحرك الـ cursor — كله في transaction واحدة. الـ seq بيتحدد هنا (آخر seq + 1).
+    head_seq = آخر seq المدير شافه؛ لو التاريخ اتغير من جلسة تانية (نفس الفيديو) بيرجع None
+    من غير ما يلمس حاجة، عشان محدش يمسح حالات التاني.
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM history_states WHERE history_key = ?",
+                            (key,)).fetchone()[0]
+        if head != head_seq:
+            conn.rollback()
+            return None
+        seq = head + 1
+        conn.execute("DELETE FROM history_states WHERE history_key = ? AND seq > ?", (key, parent_seq))
+        conn.execute("INSERT INTO history_states (history_key, seq, state_json) VALUES (?, ?, ?)",
+                     (key, seq, state_json))
+        conn.execute("""
+            DELETE FROM history_states WHERE history_key = ? AND seq <= COALESCE(
+                (SELECT seq FROM history_states WHERE history_key = ? ORDER BY seq DESC LIMIT 1 OFFSET ?), 0)
+        """, (key, key, keep))
+        conn.execute("INSERT OR REPLACE INTO history_cursor (history_key, seq) VALUES (?, ?)", (key, seq))
+        conn.commit()
+        return seq
+    finally:
+        conn.close()
+
+def history_update(key: str, seq: int, state_json: str):
+    conn = _connect()
+    try:
+        conn.execute("UPDATE history_states SET state_json = ? WHERE history_key = ? AND seq = ?",
+                     (state_json, key, seq))
+        conn.commit()
+    finally:
+        conn.close()
+
+def history_set_cursor(key: str, seq: int):
+    conn = _connect()
+    try:
+        conn.execute("INSERT OR REPLACE INTO history_cursor (history_key, seq) VALUES (?, ?)", (key, seq))
+        conn.commit()
+    finally:
+        conn.close()
+
+def history_load(key: str) -> Dict:
+    """{'states': [(seq, state_json), ...] بالترتيب، 'cursor': seq أو None}"""
+    conn = _connect()
+    try:
+        states = conn.execute("SELECT seq, state_json FROM history_states WHERE history_key = ? ORDER BY seq",
+                              (key,)).fetchall()
+        row = conn.execute("SELECT seq FROM history_cursor WHERE history_key = ?", (key,)).fetchone()
+        return {'states': states, 'cursor': row[0] if row else None}
+    finally:
+        conn.close()
+
+def history_clear(key: str):
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM history_states WHERE history_key = ?", (key,))
+        conn.execute("DELETE FROM history_cursor WHERE history_key = ?", (key,))
+        conn.commit()
+    finally:
+        conn.close()
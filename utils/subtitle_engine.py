@@ -1,15 +1,194 @@
 """
 نظام Subtitles: إضافة نص على الفيديو.
+النصوص تُرسم مرة واحدة بـ Pillow (caption_renderer) وتُدمج على الفريمات
+في تمريرة واحدة بدون ImageMagick وبدون CompositeVideoClip لكل subtitle.
+يدعم استيراد ملفات SRT / WebVTT (Parser متدفق) بطريقتين:
+- burn: حرق النص على الفريمات.
+- soft: إضافة مسار ترجمة للملف الناتج (stream copy بدون إعادة ترميز الفيديو).
 """
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
-from typing import List, Dict
+import os
+import re
+import subprocess
+from bisect import bisect_right
+from typing import List, Dict, Iterator, Optional
+from moviepy.editor import VideoFileClip
+from . import caption_renderer, timeline, temp_manager
+from .config import get_ffmpeg_path
+
+TOP_MARGIN = 50
+BOTTOM_MARGIN = 40
+
+_TIMING_RE = re.compile(
+    r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})\s*-->\s*'
+    r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})'
+)
+_TAG_RE = re.compile(r'<[^>]*>|\{\\[^}]*\}')
+
+# Codec الترجمة المناسب لكل حاوية (soft subtitles)
+SOFT_SUB_CODECS = {'.mp4': 'mov_text', '.mov': 'mov_text', '.m4v': 'mov_text',
+                   '.webm': 'webvtt', '.mkv': 'srt'}
+
+# ==================== SRT / VTT Import ====================
+
+def _to_seconds(hours, minutes, seconds, millis) -> float:
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, '0')) / 1000
+
+def iter_cues(path: str) -> Iterator[Dict]:
+    """
+    Parser متدفق لملفات SRT و WebVTT (سطر بسطر بدون تحميل الملف كله).
+    يرجع cues بالشكل: {"text": "...", "start": 1.5, "end": 3.0}
+    """
+    cue = None
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            timing = _TIMING_RE.search(line) if '-->' in line else None
+            if timing:
+                if cue and cue['text']:
+                    yield cue
+                groups = timing.groups()
+                cue = {'text': '', 'start': _to_seconds(*groups[:4]), 'end': _to_seconds(*groups[4:])}
+            elif not line:
+                if cue and cue['text']:
+                    yield cue
+                cue = None
+            elif cue is not None:
+                text = _TAG_RE.sub('', line)
+                cue['text'] = f"{cue['text']}\n{text}" if cue['text'] else text
+    if cue and cue['text']:
+        yield cue
+
+def load_subtitle_file(path: str) -> List[Dict]:
+    """تحميل كل الـ cues من ملف SRT/VTT مرتبة حسب وقت البداية."""
+    return sorted(iter_cues(path), key=lambda c: c['start'])
+
+def retime_cues(cues: List[Dict], actions: List[Dict]) -> List[Dict]:
+    """
+    تحويل توقيتات الـ cues من زمن الفيديو الأصلي إلى زمن الفيديو بعد القص/السرعة.
+    الـ cues اللي اتقصت بالكامل يتم حذفها.
+    """
+    retimed = []
+    for cue in cues:
+        mapped = timeline.map_interval(cue['start'], cue['end'], actions)
+        if mapped:
+            retimed.append({**cue, 'start': mapped[0], 'end': mapped[1]})
+    return retimed
+
+def _format_srt_time(seconds: float) -> str:
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def write_srt(cues: List[Dict], path: str) -> str:
+    """كتابة الـ cues كملف SRT."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, cue in enumerate(cues, 1):
+            f.write(f"{i}\n{_format_srt_time(cue['start'])} --> {_format_srt_time(cue['end'])}\n{cue['text']}\n\n")
+    return path
+
+def mux_soft_subtitles(video_path: str, cues: List[Dict], output_path: str = None) -> Optional[str]:
+    """
+    إضافة الـ cues كمسار ترجمة (soft subtitles) بدون إعادة ترميز الفيديو/الصوت.
+    لو output_path فاضي يتم استبدال الملف الأصلي.
+    """
+    codec = SOFT_SUB_CODECS.get(os.path.splitext(video_path)[1].lower())
+    ffmpeg = get_ffmpeg_path()
+    if not codec or not ffmpeg or not cues:
+        return None
+
+    target = output_path or f"{video_path}.subs{os.path.splitext(video_path)[1]}"
+    language = 'ara' if any(caption_renderer.is_rtl(c['text']) for c in cues[:20]) else 'eng'
+    with temp_manager.scratch('.srt') as srt_path:
+        try:
+            write_srt(cues, srt_path)
+            subprocess.run([
+                ffmpeg, '-y', '-v', 'error', '-i', video_path, '-i', srt_path,
+                '-map', '0', '-map', '1:0', '-c', 'copy', '-c:s', codec,
+                '-metadata:s:s:0', f'language={language}', target
+            ], check=True, capture_output=True)
+            if not output_path:
+                os.replace(target, video_path)
+                target = video_path
+            return target
+        except subprocess.CalledProcessError as e:
+            print(f"Soft subtitle error: {e.stderr.decode(errors='replace')}")
+            return None
+
+# ==================== Burn-in ====================
+
+def _caption_position(position: str, clip_w: int, clip_h: int, caption) -> tuple:
+    """حساب إحداثيات الركن العلوي الأيسر للـ caption."""
+    ch, cw = caption.shape[:2]
+    x = (clip_w - cw) // 2
+    if position == 'top':
+        y = TOP_MARGIN
+    elif position == 'bottom':
+        y = clip_h - ch - BOTTOM_MARGIN
+    else:
+        y = (clip_h - ch) // 2
+    return x, max(0, y)
+
+def _prepare_cue(sub: Dict, clip_w: int) -> Dict:
+    """تحويل subtitle dict إلى cue (الصورة تُرسم عند أول ظهور فقط من الـ LRU Cache)."""
+    return {
+        'start': float(sub.get('start', 0)),
+        'end': float(sub.get('end', 0)),
+        'position': sub.get('position', 'bottom'),
+        'render_args': (
+            str(sub.get('text', '')),
+            sub.get('font', 'Arial-Bold'),
+            int(sub.get('fontsize', 50)),
+            sub.get('color', 'white'),
+            sub.get('bg_color', 'black'),
+            int(clip_w * 0.9)
+        )
+    }
+
+class _CueIndex:
+    """فهرس للـ cues مرتب بوقت البداية: إيجاد النصوص الظاهرة في O(log n)."""
+
+    def __init__(self, cues: List[Dict]):
+        self.cues = sorted(cues, key=lambda c: c['start'])
+        self.starts = [c['start'] for c in self.cues]
+        self.max_length = max((c['end'] - c['start'] for c in self.cues), default=0)
+
+    def active(self, t: float) -> List[Dict]:
+        found = []
+        i = bisect_right(self.starts, t) - 1
+        while i >= 0 and self.starts[i] >= t - self.max_length:
+            if self.cues[i]['end'] > t:
+                found.append(self.cues[i])
+            i -= 1
+        found.reverse()
+        return found
+
+def _burn_cues(clip: VideoFileClip, cues: List[Dict]) -> VideoFileClip:
+    """دمج كل الـ cues على الفريمات في تمريرة واحدة."""
+    index = _CueIndex(cues)
+    clip_w, clip_h = clip.w, clip.h
+
+    def burn(get_frame, t):
+        frame = get_frame(t)
+        active = index.active(t)
+        if not active:
+            return frame
+        frame = frame.copy()
+        for cue in active:
+            caption = caption_renderer.render_caption(*cue['render_args'])
+            x, y = _caption_position(cue['position'], clip_w, clip_h, caption)
+            caption_renderer.composite_caption(frame, caption, x, y)
+        return frame
+
+    return clip.fl(burn, apply_to=[])
 
 def add_subtitle(clip: VideoFileClip, text: str, start_time: float, end_time: float,
                  position: str = 'bottom', fontsize: int = 50, color: str = 'white',
                  bg_color: str = 'black', font: str = 'Arial-Bold') -> VideoFileClip:
     """
     إضافة subtitle واحد على الفيديو.
-    
+
     Args:
         clip: الفيديو
         text: النص
@@ -18,57 +197,35 @@ def add_subtitle(clip: VideoFileClip, text: str, start_time: float, end_time: fl
         position: 'top', 'bottom', 'center'
         fontsize: حجم الخط
         color: لون النص
-        bg_color: لون الخلفية
-        font: نوع الخط
+        bg_color: لون الخلفية ('transparent' بدون خلفية)
+        font: نوع الخط (اسم أو مسار ملف .ttf)
     """
-    try:
-        # تحديد الموضع
-        if position == 'top':
-            pos = ('center', 50)
-        elif position == 'bottom':
-            pos = ('center', clip.h - 100)
-        else:
-            pos = ('center', 'center')
-        
-        # إنشاء TextClip
-        txt_clip = TextClip(
-            text,
-            fontsize=fontsize,
-            color=color,
-            font=font,
-            bg_color=bg_color,
-            size=(clip.w * 0.9, None),
-            method='caption'
-        ).set_position(pos).set_duration(end_time - start_time).set_start(start_time)
-        
-        # دمج النص مع الفيديو
-        final = CompositeVideoClip([clip, txt_clip])
-        return final
-    except Exception as e:
-        print(f"Subtitle error: {e}")
-        return clip
+    return add_subtitles(clip, [{
+        'text': text,
+        'start': start_time,
+        'end': end_time,
+        'position': position,
+        'fontsize': fontsize,
+        'color': color,
+        'bg_color': bg_color,
+        'font': font
+    }])
 
 def add_subtitles(clip: VideoFileClip, subtitles: List[Dict]) -> VideoFileClip:
     """
     إضافة عدة subtitles.
-    
+
     subtitles format:
     [
         {"text": "مرحبا", "start": 0, "end": 5, "position": "bottom"},
         ...
     ]
     """
-    result_clip = clip
-    for sub in subtitles:
-        result_clip = add_subtitle(
-            result_clip,
-            sub.get('text', ''),
-            float(sub.get('start', 0)),
-            float(sub.get('end', 0)),
-            sub.get('position', 'bottom'),
-            sub.get('fontsize', 50),
-            sub.get('color', 'white'),
-            sub.get('bg_color', 'black'),
-            sub.get('font', 'Arial-Bold')
-        )
-    return result_clip
+    try:
+        cues = [_prepare_cue(sub, clip.w) for sub in subtitles if sub.get('text')]
+        if not cues:
+            return clip
+        return _burn_cues(clip, cues)
+    except Exception as e:
+        print(f"Subtitle error: {e}")
+        return clip
@@ -0,0 +1,259 @@
+"""
+Temp Manager: دورة حياة الملفات المؤقتة في config.TEMP_DIR بحجم ديسك محدود.
+
+- كل ملف مؤقت متسجل في registry (SQLite جوه TEMP_DIR) بنوعه (upload / preview / render ...)
+  و"أصحابه" (owners) — عدد الأصحاب = reference count.
+  أمثلة owners: "session:<id>"، "job:<id>"، "preview:<session_id>"، "process:<pid>" (scratch).
+- enforce_quota(): لو الإجمالي عدى QUOTA_BYTES، الملفات اللي مالهاش أصحاب بتتمسح الأقدم استخداماً (LRU).
+  الملفات اللي ليها أصحاب عمرها ما بتتمسح؛ مرجع جلسة متساب أكتر من REF_TTL بيسقط لوحده.
+  register() مش بيعمل الـ scan الكامل (stat لكل صف) كل مرة: إجمالي تقريبي في الـ process بيزيد بحجم
+  كل ملف جديد، والـ scan بيحصل لما يعدي الـ quota أو كل QUOTA_RESCAN ثانية (الملفات بتكبر بعد التسجيل).
+- sweep_orphans() (مرة واحدة مع أول استخدام في الـ process): مراجع processes ماتت، صفوف من غير ملفات،
+  وملفات/مجلدات في TEMP_DIR مش متسجلة (crash) أقدم من ORPHAN_GRACE.
+"""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+from .config import TEMP_DIR
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = TEMP_DIR
+REGISTRY = ROOT / "registry.db"
+QUOTA_BYTES = 5 * 1024 ** 3
+REF_TTL = 12 * 3600          # جلسة مفيش منها touch من 12 ساعة = اتقفلت
+ORPHAN_GRACE = 10 * 60       # ملف مش متسجل ممكن يكون لسه بيتكتب
+TOUCH_INTERVAL = 60
+QUOTA_RESCAN = 60            # أقصى مدة بين scan كامل والتاني وقت التسجيل
+SCRATCH_KINDS = ("render", "scratch")  # بتتمسح فوراً لما صاحبها يموت
+
+_lock = threading.Lock()
+_ready = False
+_touched: Dict[tuple, float] = {}
+_estimate: Optional[int] = None  # إجمالي TEMP_DIR من آخر scan + الملفات المتسجلة بعده (None = لسه ما اتحسبش)
+_scanned_at = 0.0
+
+@contextmanager
+def _connect():
+    """اتصال بالـ registry (commit + close في الآخر)؛ WAL عشان threads الريندر والواجهة."""
+    conn = sqlite3.connect(str(REGISTRY), timeout=10)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+def _ensure():
+    """إنشاء المجلد والجداول + sweep مرة واحدة لكل process."""
+    global _ready
+    if _ready:
+        return
+    with _lock:
+        if _ready:
+            return
+        ROOT.mkdir(parents=True, exist_ok=True)
+        with _connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY, kind TEXT NOT NULL, size INTEGER DEFAULT 0,
+                    created_at REAL NOT NULL, last_used REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS refs (
+                    path TEXT NOT NULL, owner TEXT NOT NULL, pid INTEGER, touched REAL NOT NULL,
+                    PRIMARY KEY (path, owner));
+                CREATE INDEX IF NOT EXISTS idx_refs_owner ON refs(owner);
+                CREATE INDEX IF NOT EXISTS idx_files_lru ON files(last_used);
+            """)
+        _ready = True
+    sweep_orphans()
+
+# ==================== Registration ====================
+
+def new_path(kind: str, suffix: str = "", owner: str = None) -> str:
+    """مسار جديد فريد في TEMP_DIR/<kind> (بديل NamedTemporaryFile(delete=False).name)."""
+    _ensure()
+    folder = ROOT / kind
+    folder.mkdir(parents=True, exist_ok=True)
+    path = str(folder / f"{uuid.uuid4().hex}{suffix}")
+    register(path, kind, owner)
+    return path
+
+def register(path: str, kind: str, owner: str = None) -> str:
+    """تسجيل ملف (موجود أو هيتكتب) في الـ registry، ومعاه owner اختياري."""
+    _ensure()
+    now = time.time()
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    with _connect() as conn:
+        conn.execute("INSERT INTO files (path, kind, size, created_at, last_used) VALUES (?, ?, ?, ?, ?) "
+                     "ON CONFLICT(path) DO UPDATE SET last_used = excluded.last_used, size = excluded.size",
+                     (path, kind, size, now, now))
+        if owner:
+            _add_ref(conn, path, owner, now)
+    _check_quota(size)
+    return path
+
+def _check_quota(added: int):
+    """scan كامل بس لو الإجمالي التقريبي عدى الـ quota أو آخر scan قديم."""
+    global _estimate
+    if _estimate is not None:
+        _estimate += added
+        if _estimate <= QUOTA_BYTES and time.time() - _scanned_at < QUOTA_RESCAN:
+            return
+    enforce_quota()
+
+def _add_ref(conn, path: str, owner: str, now: float):
+    conn.execute("INSERT OR REPLACE INTO refs (path, owner, pid, touched) VALUES (?, ?, ?, ?)",
+                 (path, owner, os.getpid(), now))
+
+def acquire(path: str, owner: str):
+    _ensure()
+    with _connect() as conn:
+        _add_ref(conn, path, owner, time.time())
+
+def release(path: str, owner: str):
+    _ensure()
+    with _connect() as conn:
+        conn.execute("DELETE FROM refs WHERE path = ? AND owner = ?", (path, owner))
+
+def release_owner(owner: str) -> int:
+    """إسقاط كل مراجع owner (جلسة اتقفلت / job اتشال / previews قديمة). الملفات بتفضل لحد الـ LRU."""
+    _ensure()
+    with _connect() as conn:
+        return conn.execute("DELETE FROM refs WHERE owner = ?", (owner,)).rowcount
+
+def touch(path: str, owner: str = None):
+    """تحديث آخر استخدام (مرة كل TOUCH_INTERVAL بالكتير لكل ملف/owner — بيتنادى مع كل rerun)."""
+    now = time.time()
+    if now - _touched.get((path, owner), 0) < TOUCH_INTERVAL:
+        return
+    _touched[(path, owner)] = now
+    _ensure()
+    with _connect() as conn:
+        conn.execute("UPDATE files SET last_used = ? WHERE path = ?", (now, path))
+        if owner:
+            _add_ref(conn, path, owner, now)
+
+def remove(path: str):
+    """مسح الملف وكل مراجعه فوراً."""
+    _ensure()
+    with _connect() as conn:
+        conn.execute("DELETE FROM refs WHERE path = ?", (path,))
+        conn.execute("DELETE FROM files WHERE path = ?", (path,))
+    _delete(path)
+
+@contextmanager
+def scratch(suffix: str = "", kind: str = "scratch"):
+    """ملف مؤقت لعملية واحدة (صاحبه الـ process الحالي) بيتمسح في الآخر حتى لو حصل خطأ."""
+    path = new_path(kind, suffix, owner=f"process:{os.getpid()}")
+    try:
+        yield path
+    finally:
+        remove(path)
+
+# ==================== Quota / Sweep ====================
+
+def _delete(path: str):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Temp cleanup error: {e}")
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid or pid == os.getpid():
+        return True
+    if psutil:
+        return psutil.pid_exists(pid)
+    if os.name == "posix":
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+    return True  # Windows بدون psutil: REF_TTL هو اللي بيسقط المرجع
+
+def usage() -> Dict:
+    _ensure()
+    with _connect() as conn:
+        files, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        referenced = conn.execute("SELECT COUNT(DISTINCT path) FROM refs").fetchone()[0]
+    return {'files': files, 'bytes': total, 'referenced': referenced, 'quota': QUOTA_BYTES}
+
+def enforce_quota(quota: int = None) -> int:
+    """تحديث الأحجام ومسح الملفات اللي مالهاش أصحاب (LRU) لحد ما الإجمالي يبقى تحت الـ quota."""
+    global _estimate, _scanned_at
+    _ensure()
+    quota = QUOTA_BYTES if quota is None else quota
+    freed = 0
+    with _lock, _connect() as conn:
+        _scanned_at = time.time()
+        conn.execute("DELETE FROM refs WHERE touched < ?", (time.time() - REF_TTL,))
+        rows = conn.execute("SELECT path, size FROM files").fetchall()
+        sizes = {path: os.path.getsize(path) if os.path.isfile(path) else size for path, size in rows}
+        conn.executemany("UPDATE files SET size = ? WHERE path = ?", [(s, p) for p, s in sizes.items()])
+        total = sum(sizes.values())
+        _estimate = total
+        if total <= quota:
+            return 0
+        candidates = conn.execute("SELECT path FROM files WHERE path NOT IN (SELECT path FROM refs) "
+                                  "ORDER BY last_used").fetchall()
+        for (path,) in candidates:
+            if total <= quota:
+                break
+            _delete(path)
+            conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            total -= sizes[path]
+            freed += sizes[path]
+        _estimate = total
+    return freed
+
+def sweep_orphans() -> Dict:
+    """تنظيف بقايا processes ماتت / crash (بيتنادى تلقائياً مع أول استخدام)."""
+    stats = {'refs': 0, 'rows': 0, 'files': 0}
+    with _lock, _connect() as conn:
+        dead = [(p, o) for p, o, pid in conn.execute("SELECT path, owner, pid FROM refs") if not _pid_alive(pid)]
+        conn.executemany("DELETE FROM refs WHERE path = ? AND owner = ?", dead)
+        stats['refs'] = len(dead)
+
+        placeholders = ",".join("?" * len(SCRATCH_KINDS))
+        for (path,) in conn.execute(f"SELECT path FROM files WHERE kind IN ({placeholders}) "
+                                    "AND path NOT IN (SELECT path FROM refs)", SCRATCH_KINDS).fetchall():
+            _delete(path)
+        rows = conn.execute("SELECT path FROM files").fetchall()
+        missing = [(p,) for (p,) in rows if not os.path.exists(p)]
+        conn.executemany("DELETE FROM files WHERE path = ?", missing)
+        stats['rows'] = len(missing)
+
+        registered = {p for (p,) in rows}
+        cutoff = time.time() - ORPHAN_GRACE
+        for entry in _walk_unregistered(registered):
+            if entry.stat().st_mtime < cutoff:
+                _delete(entry.path)
+                stats['files'] += 1
+    enforce_quota()
+    return stats
+
+def _walk_unregistered(registered):
+    """ملفات/مجلدات TEMP_DIR (مستويين: الجذر ومجلدات الأنواع) اللي مش في الـ registry."""
+    skip = {REGISTRY.name, f"{REGISTRY.name}-wal", f"{REGISTRY.name}-shm"}
+    for entry in os.scandir(ROOT):
+        if entry.name in skip or entry.path in registered:
+            continue
+        if entry.is_dir() and not entry.name.startswith("tmp"):
+            for child in os.scandir(entry.path):
+                if child.path not in registered:
+                    yield child
+        else:
+            yield entry
@@ -0,0 +1,263 @@
+"""
+Template Plans: القالب بيتعمله compile مرة واحدة لـ render plan بتتحفظ جنبه في command_cache.db.
+
+- actions محسّنة: كل خطوات الزمن (trim / speed) بتتجمع لـ trim واحد بزمن المصدر + speed واحدة،
+  والخطوات اللي ملهاش تأثير (speed 1 / volume 1 / rotate 0 / mute مكرر) بتتشال.
+- filtergraph FFmpeg (seek على الـ input + -vf / -af) لو كل الخطوات ليها مقابل مباشر في FFmpeg:
+  التصدير بيبقى process FFmpeg واحد من غير فك الفريمات في Python (fast path). غير كده MoviePy عادي.
+  نفس نتيجة MoviePy: speed بتغير الـ pitch (asetrate مش atempo) والـ grayscale بأوزان frame_kernels.
+- encode profile لكل صيغة (codec / audio codec)؛ threads / preset بيتحددوا وقت التشغيل من encoder_profile.
+- plan_for(name): الـ plan المحفوظة لو مفتاحها (hash الـ actions + PLAN_VERSION) لسه صالح، فتشغيل
+  قالب متكرر مفيهوش أي planning.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+from . import command_cache, encoder_profile, progress as progress_events
+from .encoder_profile import FORMAT_CODECS
+from .audio_mixer import SAMPLE_RATE
+from .frame_kernels import GRAY_WEIGHTS
+from .config import get_ffmpeg_path
+
+PLAN_VERSION = 2
+MAX_SPEED = 10.0
+FFMPEG_ACTIONS = {"trim", "speed", "crop", "rotate", "black_white", "mute", "volume"}
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v")
+
+# زي frame_kernels.crop_box: مستطيل في النص، الأبعاد زوجية عشان yuv420p
+_CROP_FILTERS = {
+    "9:16": "crop=w='trunc(min(iw,ih*9/16)/2)*2':h='trunc(min(ih,iw*16/9)/2)*2'",
+    "16:9": "crop=w='trunc(iw/2)*2':h='trunc(if(lte(iw*9/16,ih),iw*9/16,ih)/2)*2'",
+    "1:1": "crop=w='trunc(min(iw,ih)/2)*2':h='trunc(min(iw,ih)/2)*2'",
+}
+_TURN_FILTERS = {1: "transpose=2", 2: "transpose=2,transpose=2", 3: "transpose=1"}  # عكس عقارب الساعة
+
+# ==================== Compile ====================
+
+def plan_key(actions: List[Dict]) -> str:
+    text = json.dumps(actions, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{PLAN_VERSION}:{text}".encode()).hexdigest()[:32]
+
+def _turns(step: Dict) -> Optional[int]:
+    angle = int(float(90 if step.get("angle") is None else step["angle"]))
+    return (angle // 90) % 4 if angle % 90 == 0 else None
+
+def optimize(actions: List[Dict]) -> List[Dict]:
+    """
+    نفس الناتج بخطوات أقل: trim(a, b) بعد speed(f) = trim(a·f, b·f) بزمن المصدر، فكل خطوات الزمن
+    بتتحول لـ [trim, speed] في الأول (timeline / subtitle_engine بيحسبوا نفس التوقيتات).
+    """
+    if any(step.get("action") == "trim_last" for step in actions):
+        return list(actions)  # بيعتمد على مدة كل فيديو: الترتيب يفضل زي ما هو (MoviePy بيحوله لـ trim)
+    start, end, factor = 0.0, None, 1.0
+    timed, others, muted, gray = False, [], False, False
+    for step in actions:
+        action = step.get("action")
+        if action == "trim":
+            b = step.get("end")
+            new_end = start + float(b) * factor if b else None
+            if end is not None:
+                new_end = end if new_end is None else min(end, new_end)
+            start, end = start + float(step.get("start") or 0) * factor, new_end
+            timed = True
+        elif action == "speed":
+            factor *= float(step.get("factor") or 1.0)
+            timed = True
+        elif action == "mute":
+            if not muted:
+                others.append(step)
+            muted = True
+        elif action == "black_white":
+            if not gray:
+                others.append(step)
+            gray = True
+        elif action == "volume" and float(step.get("level", 1.0)) == 1.0:
+            continue
+        elif action == "rotate" and _turns(step) is not None:
+            previous = others[-1] if others and others[-1].get("action") == "rotate" else None
+            if previous is not None and _turns(previous) is not None:
+                turns = (_turns(previous) + _turns(step)) % 4
+                others.pop()
+            else:
+                turns = _turns(step)
+            if turns:
+                others.append({"action": "rotate", "angle": turns * 90})
+        else:
+            others.append(step)
+    head = []
+    if timed and (start > 0 or end is not None):
+        head.append({"action": "trim", "start": round(start, 6), **({"end": round(end, 6)} if end is not None else {})})
+    while timed and factor > MAX_SPEED:  # حد action_schema للخطوة الواحدة
+        head.append({"action": "speed", "factor": MAX_SPEED})
+        factor /= MAX_SPEED
+    if timed and round(factor, 6) != 1.0:
+        head.append({"action": "speed", "factor": round(factor, 6)})
+    return head + others
+
+# نفس grayscale الـ kernel (frame_kernels.GRAY_WEIGHTS) على القنوات التلاتة
+_GRAY_FILTER = "format=rgb24,colorchannelmixer=" + ":".join(
+    f"{out}{src}={w / 256:.6f}" for out in "rgb" for src, w in zip("rgb", GRAY_WEIGHTS))
+
+def build_filtergraph(actions: List[Dict]) -> Optional[Dict]:
+    """أوامر FFmpeg للـ actions المحسّنة، أو None لو فيه خطوة ملهاش مقابل (موسيقى / ترجمة / normalize ...)."""
+    if any(s.get("action") not in FFMPEG_ACTIONS for s in actions):
+        return None
+    if any(s.get("action") == "rotate" and _turns(s) is None for s in actions):
+        return None
+    graph = {'seek': None, 'duration': None, 'vf': [], 'af': [], 'mute': False, 'speed': 1.0}
+    for step in actions:
+        action = step["action"]
+        if action == "trim":
+            graph['seek'] = float(step.get("start") or 0)
+            if step.get("end") is not None:
+                graph['duration'] = float(step["end"]) - graph['seek']
+        elif action == "speed":
+            graph['speed'] *= float(step["factor"])
+        elif action == "crop":
+            graph['vf'].append(_CROP_FILTERS[step.get("aspect_ratio", "9:16")])
+        elif action == "rotate":
+            graph['vf'].append(_TURN_FILTERS[_turns(step)])
+        elif action == "black_white":
+            graph['vf'].append(_GRAY_FILTER)
+        elif action == "mute":
+            graph['mute'] = True
+        elif action == "volume":
+            graph['af'].append(f"volume={float(step.get('level', 1.0)):g}")
+    if graph['speed'] != 1.0:
+        graph['vf'].append(f"setpts=PTS/{graph['speed']:.6f}")
+    graph['vf'].append("format=yuv420p")
+    return graph
+
+def compile_plan(actions: List[Dict]) -> Dict:
+    optimized = optimize(actions)
+    return {
+        'version': PLAN_VERSION,
+        'actions': optimized,
+        'ffmpeg': build_filtergraph(optimized),
+        'encode': {fmt: {'codec': codec, 'audio_codec': audio} for fmt, (codec, audio) in FORMAT_CODECS.items()},
+        'compiled_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def plan_for(name: str) -> Optional[Dict]:
+    """الـ plan بتاعة القالب (محفوظة، أو بتتعمل وتتحفظ أول مرة / لو القالب اتعدل)."""
+    template = command_cache.get_template(name)
+    if template is None:
+        return None
+    key = plan_key(template['actions'])
+    if template['plan'] and template['plan_key'] == key:
+        return template['plan']
+    plan = compile_plan(template['actions'])
+    command_cache.save_template_plan(name, key, plan)
+    return plan
+
+# ==================== Render ====================
+
+def _ffmpeg_command(graph: Dict, video_path: str, output_path: str, format: str, encoder: Dict,
+                    audio_rate: int = None) -> List[str]:
+    codec, audio_codec = FORMAT_CODECS[format]
+    af = list(graph['af'])
+    if graph['speed'] != 1.0:
+        # زي speedx في MoviePy (fl_time): الصوت بيتسرّع والـ pitch بيتغير معاه، مش atempo
+        rate = audio_rate or SAMPLE_RATE
+        af += [f"asetrate={rate * graph['speed']:.3f}", f"aresample={SAMPLE_RATE}"]
+    cmd = [get_ffmpeg_path(), '-y', '-v', 'error', '-nostats', '-progress', 'pipe:1']
+    if graph['seek']:
+        cmd += ['-ss', f"{graph['seek']:.6f}"]
+    if graph['duration']:
+        cmd += ['-t', f"{graph['duration']:.6f}"]
+    cmd += ['-i', video_path, '-map', '0:v:0', '-vf', ",".join(graph['vf']), '-c:v', codec]
+    if encoder.get('preset'):
+        cmd += ['-preset', encoder['preset']]
+    cmd += ['-threads', str(encoder.get('threads', 0))] + encoder.get('ffmpeg_params', [])
+    if graph['mute']:
+        cmd += ['-an']
+    else:
+        cmd += ['-map', '0:a:0?', '-c:a', audio_codec]
+        if af:
+            cmd += ['-af', ",".join(af)]
+    return cmd + [output_path]
+
+def _run_ffmpeg(cmd: List[str], total_seconds: float, fps: float, output_path: str, progress: Callable = None):
+    """تشغيل FFmpeg مع progress events من -progress (out_time)؛ الـ callback ممكن يلغي."""
+    total = int(total_seconds * fps) if total_seconds and fps else 0
+    started, last = time.perf_counter(), 0.0
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        for line in proc.stdout:
+            if not progress or not line.startswith("out_time_us="):
+                continue
+            value = line.split("=", 1)[1].strip()
+            now = time.perf_counter()
+            if not value.isdigit() or now - last < progress_events.MIN_INTERVAL:
+                continue
+            last = now
+            done = min(int(int(value) / 1e6 * fps), total) if total else 0
+            progress(progress_events.make_event('video', done, total, started, output_path))
+        if proc.wait() != 0:
+            raise RuntimeError(f"FFmpeg failed: {proc.stderr.read().strip()[-500:]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    if progress and total:
+        progress(progress_events.make_event('video', total, total, started, output_path))
+
+def render_plan(plan: Dict, video_path: str, output_dir: str = None, format: str = "mp4",
+                music_path: str = None, progress: Callable = None) -> str:
+    """تصدير فيديو بالـ plan: fast path FFmpeg لو متاح، وإلا MoviePy بالـ actions المحسّنة."""
+    from . import action_schema, media_engine
+    graph = plan.get('ffmpeg')
+    if not graph or format not in FORMAT_CODECS or not get_ffmpeg_path():
+        from moviepy.editor import VideoFileClip
+        with VideoFileClip(video_path) as clip:
+            final = media_engine.apply_edit_actions(clip, plan['actions'], music_path)
+            try:
+                return media_engine.export_video(final, output_dir, format, progress=progress)
+            finally:
+                final.close()
+
+    info = action_schema.media_info(video_path) or {}
+    span = max(0.0, info['duration'] - (graph['seek'] or 0)) if info.get('duration') else 0.0
+    if graph['duration']:
+        span = min(span, graph['duration']) if span else graph['duration']
+    duration = span / graph['speed']
+    output_path = media_engine.make_output_path(output_dir, format)
+    codec = FORMAT_CODECS[format][0]
+    try:
+        with encoder_profile.job_slot() as jobs:
+            cmd = _ffmpeg_command(graph, video_path, output_path, format, encoder_profile.plan(codec, jobs),
+                                  info.get('audio_rate'))
+            _run_ffmpeg(cmd, duration, info.get('fps') or 25.0, output_path, progress)
+    except BaseException:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return output_path
+
+# ==================== Folder Runs ====================
+
+def find_videos(folder: str, recursive: bool = False) -> List[str]:
+    """ملفات الفيديو في الفولدر (مترتبة بالاسم)."""
+    if recursive:
+        paths = [os.path.join(root, f) for root, _, files in os.walk(folder) for f in files]
+    else:
+        paths = [e.path for e in os.scandir(folder) if e.is_file()]
+    return sorted(p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS))
+
+def run_template(name: str, video_paths: List[str], output_dir: str = None, format: str = "mp4",
+                 music_path: str = None, max_workers: int = None, progress_callback: Callable = None) -> List[Dict]:
+    """تطبيق قالب على مجموعة فيديوهات عبر الـ Batch (الـ plan بتتجاب/تتعمل مرة واحدة للكل)."""
+    from . import batch_processor
+    plan = plan_for(name)
+    if plan is None:
+        raise KeyError(f"Template not found: {name}")
+    return batch_processor.batch_process(video_paths, plan['actions'], music_path, max_workers,
+                                         progress_callback, output_dir, plan=plan, format=format)
+
+def run_template_over_folder(name: str, folder: str, output_dir: str = None, format: str = "mp4",
+                             recursive: bool = False, **kwargs) -> List[Dict]:
+    """"شغّل القالب على فولدر": كل فيديو في الفولدر بيتصدر بنفس الـ plan."""
+    return run_template(name, find_videos(folder, recursive), output_dir, format, **kwargs)
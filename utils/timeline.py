@@ -0,0 +1,77 @@
+"""
+تحويل التوقيتات بين زمن الفيديو الأصلي وزمن الفيديو الناتج.
+يعتمد على الخطوات الزمنية فقط (trim / speed) بنفس ترتيب تنفيذها في media_engine.
+"""
+from typing import List, Dict, Optional, Tuple
+
+def trim_bounds(step: Dict) -> Tuple[float, Optional[float]]:
+    start = float(step.get('start') or 0)
+    end = step.get('end')
+    end = float(end) if end is not None and float(end) > start else None
+    return start, end
+
+def _speed_factor(step: Dict) -> float:
+    factor = float(step.get('factor', 1.0))
+    return factor if factor > 0 else 1.0
+
+def resolve(actions: List[Dict], duration: float) -> List[Dict]:
+    """
+    trim_last (آخر X ثانية) → trim عادي لما مدة المصدر تبقى معروفة، بمدة الكليب عند الخطوة دي
+    (بعد القص / السرعة اللي قبلها)، عشان باقي الحسابات هنا تفضل على trim / speed بس.
+    """
+    resolved = []
+    for step in actions:
+        action = step.get('action')
+        if action == 'trim_last':
+            step = {'action': 'trim', 'start': max(0.0, duration - float(step.get('duration') or 0))}
+            action = 'trim'
+        if action == 'trim':
+            start, end = trim_bounds(step)
+            duration = max(0.0, (min(end, duration) if end is not None else duration) - start)
+        elif action == 'speed':
+            duration /= _speed_factor(step)
+        resolved.append(step)
+    return resolved
+
+def map_interval(start: float, end: float, actions: List[Dict]) -> Optional[Tuple[float, float]]:
+    """
+    تحويل فترة [start, end) من زمن المصدر إلى زمن الناتج.
+    يرجع None لو الفترة اتقصت بالكامل.
+    """
+    for step in actions:
+        action = step.get('action')
+        if action == 'trim':
+            trim_start, trim_end = trim_bounds(step)
+            if trim_end is not None:
+                end = min(end, trim_end)
+            start = max(start, trim_start) - trim_start
+            end = end - trim_start
+        elif action == 'speed':
+            factor = _speed_factor(step)
+            start, end = start / factor, end / factor
+        if end <= start:
+            return None
+    return start, end
+
+def source_to_output(t: float, actions: List[Dict]) -> Optional[float]:
+    """تحويل لحظة من زمن المصدر إلى زمن الناتج (None لو اتقصت)."""
+    for step in actions:
+        action = step.get('action')
+        if action == 'trim':
+            trim_start, trim_end = trim_bounds(step)
+            if t < trim_start or (trim_end is not None and t >= trim_end):
+                return None
+            t -= trim_start
+        elif action == 'speed':
+            t /= _speed_factor(step)
+    return t
+
+def output_to_source(t: float, actions: List[Dict]) -> float:
+    """تحويل لحظة من زمن الناتج إلى زمن المصدر (عكس الخطوات)."""
+    for step in reversed(actions):
+        action = step.get('action')
+        if action == 'speed':
+            t *= _speed_factor(step)
+        elif action == 'trim':
+            t += trim_bounds(step)[0]
+    return t
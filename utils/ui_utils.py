@@ -72,4 +72,21 @@ def render_timeline_streamlit(frames: list):
         cols = st.columns(num_cols)
         for idx, (t, img) in enumerate(frames):
             with cols[idx]:
-                st.image(img, use_container_width=True, caption=f"{int(t)}s")
\ No newline at end of file
+                st.image(img, use_container_width=True, caption=f"{int(t)}s")
+
+
+def format_progress(event: dict) -> str:
+    """نص مختصر لـ progress event: فريمات • fps • حجم • الوقت المتبقي."""
+    if not event:
+        return ""
+    parts = []
+    if event.get('total'):
+        prefix = "🔊 صوت " if event.get('stage') == 'audio' else ""
+        parts.append(f"{prefix}{event['done']}/{event['total']} فريم")
+    if event.get('fps') and event.get('stage') == 'video':
+        parts.append(f"{event['fps']:.0f} fps")
+    if event.get('bytes'):
+        parts.append(f"{event['bytes'] / (1024 * 1024):.1f} MB")
+    if event.get('eta') is not None:
+        parts.append(f"متبقي ~{int(event['eta'])} ث")
+    return " • ".join(parts)
@@ -1,57 +1,218 @@
 """
 نظام Undo/Redo: التراجع والإعادة للتعديلات.
+
+- كل action بيتخزن مرة واحدة (JSON canonical في pool بـ reference count)، والحالة = tuple من
+  نصوص الـ pool → الحالات المتتالية بتشارك نفس الـ actions بدل نسخة كاملة لكل حالة.
+- العمق محدود (max_depth): أقدم حالة بتخرج أول.
+- undo / redo = تحريك مؤشر O(1)، والناتج نسخة جديدة كاملة (deep) من الـ actions.
+- persist_key (اختياري): كل تغيير بيتكتب صف واحد في sessions.db والتاريخ بيرجع بعد إعادة التشغيل.
+  الـ seq بيتحدد في الـ DB؛ لو جلسة تانية بتعدل نفس الفيديو وكتبت قبلنا، الـ append بيترفض
+  والتاريخ بيتحمل من جديد والحالة بتتضاف فوقه (محدش بيمسح حالات التاني).
+- كل حالة شايلة ملفات الريندر بتاعتها (outputs لكل صيغة + previews)، فالتراجع بيعرض الناتج القديم
+  من الديسك فوراً؛ needs_render = True بس لو الملفات اتمسحت. الـ previews (في TEMP_DIR) محجوزة
+  في temp_manager باسم التاريخ طول ما الحالة موجودة.
 """
-from typing import List, Dict, Optional
+import json
+import os
+from collections import Counter, deque
+from typing import List, Dict, Optional, NamedTuple, Tuple
+from . import session_manager, temp_manager
+
+DEFAULT_DEPTH = 50
+APPEND_RETRIES = 3
+
+class _State(NamedTuple):
+    seq: int
+    video_path: str
+    actions: Tuple[str, ...]
+    music_path: Optional[str]
+    outputs: Tuple[Tuple[str, str], ...] = ()   # ((format, path), ...)
+    previews: Tuple[str, ...] = ()
+
+def _canonical(action: Dict) -> str:
+    return json.dumps(action, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
 
 class UndoRedoManager:
     """مدير التراجع والإعادة."""
-    
-    def __init__(self):
-        self.history: List[Dict] = []  # تاريخ التعديلات
-        self.current_index: int = -1   # المؤشر الحالي
-    
-    def add_state(self, video_path: str, actions: List[Dict], music_path: str = None):
-        """إضافة حالة جديدة للتاريخ."""
-        # حذف أي حالات بعد المؤشر الحالي (عند عمل Redo ثم إضافة جديد)
-        self.history = self.history[:self.current_index + 1]
-        
-        # إضافة الحالة الجديدة
-        self.history.append({
-            'video_path': video_path,
-            'actions': actions.copy() if actions else [],
-            'music_path': music_path
+
+    def __init__(self, max_depth: int = DEFAULT_DEPTH, persist_key: str = None):
+        self.max_depth = max(1, max_depth)
+        self.history: deque = deque()   # تاريخ التعديلات (_State)
+        self.current_index: int = -1    # المؤشر الحالي
+        self.persist_key: Optional[str] = None
+        self._pool: Dict[str, str] = {}
+        self._refs: Counter = Counter()
+        self._seq = 0
+        self._head = 0                  # آخر seq في sessions.db للمفتاح ده (وقت آخر قراية/كتابة)
+        if persist_key:
+            self.bind(persist_key)
+
+    # ---------- Interning ----------
+
+    def _intern(self, action: Dict) -> str:
+        text = _canonical(action)
+        text = self._pool.setdefault(text, text)
+        self._refs[text] += 1
+        return text
+
+    def _release(self, state: _State):
+        self._hold(state.previews, False)
+        for text in state.actions:
+            self._refs[text] -= 1
+            if self._refs[text] <= 0:
+                del self._refs[text]
+                del self._pool[text]
+
+    def _make_state(self, seq: int, video_path: str, actions: List[Dict], music_path: str = None,
+                    outputs: Dict[str, str] = None, previews: List[str] = None) -> _State:
+        self._seq = max(self._seq, seq)
+        state = _State(seq, video_path, tuple(self._intern(a) for a in actions or []), music_path,
+                       tuple((outputs or {}).items()), tuple(previews or ()))
+        self._hold(state.previews, True)
+        return state
+
+    def _hold(self, paths, hold: bool):
+        """حجز الـ previews في temp_manager (عشان الـ LRU ما يمسحهاش وهي في التاريخ)."""
+        if not self.persist_key:
+            return
+        owner = f"history:{self.persist_key}"
+        for path in paths:
+            (temp_manager.acquire if hold else temp_manager.release)(path, owner)
+
+    @staticmethod
+    def _to_dict(state: _State) -> Dict:
+        outputs = {fmt: path for fmt, path in state.outputs if os.path.exists(path)}
+        return {
+            'video_path': state.video_path,
+            'actions': [json.loads(text) for text in state.actions],
+            'music_path': state.music_path,
+            'outputs': outputs,
+            'formats': [fmt for fmt, _ in state.outputs],
+            'previews': [p for p in state.previews if os.path.exists(p)],
+            'needs_render': not outputs,
+        }
+
+    @staticmethod
+    def _to_json(state: _State) -> str:
+        return json.dumps({
+            'video_path': state.video_path,
+            'actions': [json.loads(text) for text in state.actions],
+            'music_path': state.music_path,
+            'outputs': dict(state.outputs),
+            'previews': list(state.previews),
         })
+
+    def _next_seq(self, state_json: str) -> int:
+        """seq الحالة الجديدة (ومعاها الكتابة في sessions.db لو التاريخ محفوظ)."""
+        for _ in range(APPEND_RETRIES if self.persist_key else 0):
+            parent_seq = self.history[self.current_index].seq if self.current_index >= 0 else 0
+            seq = session_manager.history_append(self.persist_key, state_json, parent_seq, self._head,
+                                                 self.max_depth)
+            if seq is not None:
+                self._head = seq
+                return seq
+            # جلسة تانية كتبت في نفس التاريخ: نحمله ونضيف فوق آخر حالة فيه (مش فوق الـ cursor المشترك،
+            # عشان فرع الـ redo اللي هيتمسح ما يبقاش فيه حالات الجلسة التانية)
+            self.bind(self.persist_key)
+            self.current_index = len(self.history) - 1
+        if self.persist_key:
+            print(f"Undo history conflict: {self.persist_key} (keeping history in memory only)")
+            self.persist_key = None
+        return self._seq + 1
+
+    # ---------- History ----------
+
+    def add_state(self, video_path: str, actions: List[Dict], music_path: str = None,
+                  outputs: Dict[str, str] = None, previews: List[str] = None):
+        """إضافة حالة جديدة للتاريخ (outputs: {format: path} من التصدير)."""
+        state_json = json.dumps({'video_path': video_path, 'actions': actions or [], 'music_path': music_path,
+                                 'outputs': dict(outputs or {}), 'previews': list(previews or ())})
+        seq = self._next_seq(state_json)  # ممكن يعيد تحميل التاريخ (bind) قبل ما نضيف فوقه
+        # حذف أي حالات بعد المؤشر الحالي (عند عمل Undo ثم إضافة جديد)
+        while len(self.history) > self.current_index + 1:
+            self._release(self.history.pop())
+
+        self.history.append(self._make_state(seq, video_path, actions, music_path, outputs, previews))
+        while len(self.history) > self.max_depth:
+            self._release(self.history.popleft())
         self.current_index = len(self.history) - 1
-    
+
+    def attach_artifacts(self, outputs: Dict[str, str] = None, previews: List[str] = None):
+        """إضافة ملفات ريندر للحالة الحالية (مثلاً previews اتعملت بعد التصدير)."""
+        if self.current_index < 0:
+            return
+        state = self.history[self.current_index]
+        new_previews = tuple(p for p in previews or () if p not in state.previews)
+        self._hold(new_previews, True)
+        state = state._replace(outputs=tuple({**dict(state.outputs), **(outputs or {})}.items()),
+                               previews=state.previews + new_previews)
+        self.history[self.current_index] = state
+        if self.persist_key:
+            session_manager.history_update(self.persist_key, state.seq, self._to_json(state))
+
+    def matches_current(self, actions: List[Dict]) -> bool:
+        """هل الـ actions دي هي نفس الحالة الحالية؟ (مقارنة بالـ JSON canonical)"""
+        if self.current_index < 0:
+            return False
+        return tuple(_canonical(a) for a in actions or []) == self.history[self.current_index].actions
+
+    def _move(self, step: int) -> Optional[Dict]:
+        self.current_index += step
+        state = self.history[self.current_index]
+        if self.persist_key:
+            session_manager.history_set_cursor(self.persist_key, state.seq)
+        return self._to_dict(state)
+
     def undo(self) -> Optional[Dict]:
         """التراجع خطوة واحدة."""
-        if self.can_undo():
-            self.current_index -= 1
-            return self.history[self.current_index].copy()
-        return None
-    
+        return self._move(-1) if self.can_undo() else None
+
     def redo(self) -> Optional[Dict]:
         """الإعادة خطوة واحدة."""
-        if self.can_redo():
-            self.current_index += 1
-            return self.history[self.current_index].copy()
-        return None
-    
+        return self._move(1) if self.can_redo() else None
+
     def can_undo(self) -> bool:
         """هل يمكن التراجع؟"""
         return self.current_index > 0
-    
+
     def can_redo(self) -> bool:
         """هل يمكن الإعادة؟"""
         return self.current_index < len(self.history) - 1
-    
+
     def get_current(self) -> Optional[Dict]:
         """الحصول على الحالة الحالية."""
         if 0 <= self.current_index < len(self.history):
-            return self.history[self.current_index].copy()
+            return self._to_dict(self.history[self.current_index])
         return None
-    
+
+    def _reset(self):
+        for state in self.history:
+            self._hold(state.previews, False)
+        self.history.clear()
+        self._pool.clear()
+        self._refs.clear()
+        self.current_index = -1
+
     def clear(self):
         """مسح التاريخ."""
-        self.history = []
-        self.current_index = -1
+        self._reset()
+        if self.persist_key:
+            session_manager.history_clear(self.persist_key)
+
+    # ---------- Persistence ----------
+
+    def bind(self, persist_key: str):
+        """ربط التاريخ بمفتاح (مثلاً hash الفيديو) وتحميل المحفوظ منه في sessions.db."""
+        self._reset()
+        self.persist_key = persist_key
+        saved = session_manager.history_load(persist_key)
+        self._head = saved['states'][-1][0] if saved['states'] else 0
+        for seq, state_json in saved['states'][-self.max_depth:]:
+            data = json.loads(state_json)
+            self.history.append(self._make_state(seq, data['video_path'], data['actions'], data.get('music_path'),
+                                                 data.get('outputs'), data.get('previews')))
+            if seq == saved['cursor']:
+                self.current_index = len(self.history) - 1
+        if self.history:
+            if self.current_index < 0:
+                self.current_index = len(self.history) - 1
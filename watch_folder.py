@@ -0,0 +1,257 @@
+"""
+Watch Folder: معالجة تلقائية من غير الواجهة — حط الفيديو في فولدر الإدخال وخد الناتج في OUTPUT_DIR.
+
+    python watch_folder.py --input D:/Inbox [--rules rules.json] [--music bg.mp3] [--output DIR] [--workers 2] [--max-queue 8]
+
+- القالب بيتحدد بالقواعد (rules.json: [{"pattern": "*_reels.mp4", "template": "ريلز"}, ...] أول قاعدة
+  تطابق اسم الملف أو مساره النسبي)، ومن غير قواعد: اسم الفولدر الفرعي = اسم القالب (Inbox/ريلز/video.mp4).
+- قوالب فيها أمر music: الموسيقى من "music" في القاعدة أو --music؛ من غيرهم الملف بيفشل (مش بيتصدر من غير موسيقى).
+- الملف بيتاخد بس لما يبقى "ثابت" (نفس الحجم والـ mtime لمدة STABLE_SECONDS) وينفع يتفتح: ملفات لسه
+  بتتنسخ / بتتحمل (.part / .tmp / .crdownload) ما بتتلمسش.
+- Backpressure: أكتر من max_queue ملف شغال/مستني = الفولدر ما بيتقراش لحد ما الطابور يخف
+  (الملفات بتستنى مكانها، مفيش حاجة بتضيع).
+- المراقبة: watchdog (inotify / ReadDirectoryChangesW) لو متسطب عشان يصحى فوراً، وإلا polling كل --poll ثانية.
+- كل ملف بيخلص بيتنقل لـ processed/ أو failed/ جوه فولدر الإدخال، وسطر JSON في watch_manifest.jsonl
+  في مجلد الإخراج (الإدخال / القالب / الناتج / الحالة / الوقت).
+"""
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from utils import batch_processor, encoder_profile, template_plans
+from utils.config import OUTPUT_DIR
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+STABLE_SECONDS = 3.0
+PARTIAL_SUFFIXES = (".part", ".tmp", ".crdownload", ".download", ".partial")
+DONE_DIR, FAILED_DIR = "processed", "failed"
+MANIFEST_NAME = "watch_manifest.jsonl"
+
+def load_rules(path: Optional[str]) -> List[Dict]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    return [r for r in rules if r.get("pattern") and r.get("template")]
+
+def match_rule(relative: str, rules: List[Dict]) -> Optional[Dict]:
+    """أول قاعدة تطابق الملف (مسار نسبي لفولدر الإدخال)."""
+    name = os.path.basename(relative)
+    for rule in rules:
+        if fnmatch.fnmatch(name, rule["pattern"]) or fnmatch.fnmatch(relative.replace(os.sep, "/"), rule["pattern"]):
+            return rule
+    return None
+
+def match_template(relative: str, rules: List[Dict]) -> Optional[str]:
+    """القالب لملف (مسار نسبي لفولدر الإدخال)."""
+    rule = match_rule(relative, rules)
+    if rule:
+        return rule["template"]
+    parts = relative.split(os.sep)
+    return parts[0] if len(parts) > 1 else None
+
+def _is_candidate(name: str) -> bool:
+    lower = name.lower()
+    return (not name.startswith((".", "~")) and not lower.endswith(PARTIAL_SUFFIXES)
+            and lower.endswith(template_plans.VIDEO_EXTENSIONS))
+
+def _readable(path: str) -> bool:
+    """الملف مش مقفول عند اللي بيكتبه (على Windows الفتح بيفشل طول ما النسخ شغال)."""
+    try:
+        with open(path, "rb") as f:
+            f.read(1)
+        return True
+    except OSError:
+        return False
+
+class WatchFolder:
+    def __init__(self, input_dir: str, output_dir: str = None, rules: List[Dict] = None,
+                 workers: int = None, max_queue: int = None, poll: float = 2.0, music_path: str = None):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = str(output_dir or OUTPUT_DIR)
+        self.rules = rules or []
+        self.music_path = music_path
+        self.workers = workers or encoder_profile.batch_workers(encoder_profile.MAX_BATCH_JOBS)
+        self.max_queue = max_queue or self.workers * 2
+        self.poll = poll
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch")
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self._seen: Dict[str, Tuple[int, int, float]] = {}   # path → (size, mtime_ns, ثابت من امتى)
+        self._inflight: Dict[str, str] = {}                  # path → template
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+
+    # ---------- Scanning ----------
+
+    def _walk(self):
+        skip = {DONE_DIR, FAILED_DIR}
+        for root, dirs, files in os.walk(self.input_dir):
+            dirs[:] = [d for d in dirs if d not in skip and not d.startswith(".")]
+            for name in files:
+                if _is_candidate(name):
+                    yield os.path.join(root, name)
+
+    def _stable(self, path: str, now: float) -> bool:
+        """نفس الحجم والـ mtime من STABLE_SECONDS أو أكتر = الكتابة خلصت."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._seen.pop(path, None)
+            return False
+        key = (stat.st_size, stat.st_mtime_ns)
+        previous = self._seen.get(path)
+        if previous is None or previous[:2] != key:
+            self._seen[path] = (*key, now)
+            return False
+        return stat.st_size > 0 and now - previous[2] >= STABLE_SECONDS and _readable(path)
+
+    def scan(self) -> int:
+        """لفة على الفولدر: بيبعت الملفات الجاهزة لحد max_queue؛ بيرجع عدد الملفات اللي اتبعتت."""
+        now, submitted = time.time(), 0
+        present, complete = set(), True
+        for path in self._walk():
+            present.add(path)
+            with self._lock:
+                if path in self._inflight:
+                    continue
+                if len(self._inflight) >= self.max_queue:
+                    complete = False
+                    break  # backpressure: الباقي يستنى اللفة الجاية
+            if not self._stable(path, now):
+                continue
+            relative = os.path.relpath(path, self.input_dir)
+            template = match_template(relative, self.rules)
+            if not template:
+                continue
+            music_path = (match_rule(relative, self.rules) or {}).get("music") or self.music_path
+            with self._lock:
+                self._inflight[path] = template
+            self._seen.pop(path, None)
+            self.executor.submit(self._process, path, template, music_path)
+            submitted += 1
+        if complete:
+            # بعد لفة كاملة بس: لو الـ walk وقف بدري، الملفات اللي ما اتشافتش لسه لازم تحتفظ بحالة الثبات
+            for path in list(self._seen):
+                if path not in present:
+                    del self._seen[path]
+        return submitted
+
+    # ---------- Processing ----------
+
+    def _process(self, path: str, template: str, music_path: str = None):
+        started = time.time()
+        record = {'input': path, 'template': template, 'music': music_path, 'started': started}
+        try:
+            plan = template_plans.plan_for(template)
+            if plan is None:
+                result = {'status': 'error', 'output': None, 'error': f"Template not found: {template}"}
+            elif not music_path and any(s.get('action') == 'music' for s in plan['actions']):
+                result = {'status': 'error', 'output': None,
+                          'error': f"Template '{template}' needs music (rule \"music\" or --music)"}
+            else:
+                result = batch_processor.process_single_video(path, plan['actions'], music_path, self.output_dir,
+                                                              plan=plan)
+        except Exception as e:
+            result = {'status': 'error', 'output': None, 'error': str(e)}
+        record.update(status=result['status'], output=result.get('output'), error=result.get('error'),
+                      finished=time.time(), seconds=round(time.time() - started, 2))
+        record['archived'] = self._archive(path, DONE_DIR if result['status'] == 'success' else FAILED_DIR)
+        self._write_manifest(record)
+        icon = "✅" if result['status'] == 'success' else "❌"
+        print(f"{icon} {os.path.relpath(path, self.input_dir)} [{template}] → {record['output'] or record['error']}")
+        with self._lock:
+            self._inflight.pop(path, None)
+        self.wakeup.set()  # مكان فاضي في الطابور
+
+    def _archive(self, path: str, folder: str) -> Optional[str]:
+        target_dir = os.path.join(self.input_dir, folder, os.path.dirname(os.path.relpath(path, self.input_dir)))
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(target)
+            target = f"{stem}_{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        try:
+            shutil.move(path, target)
+            return target
+        except OSError as e:
+            print(f"Archive error: {e}")
+            return None
+
+    def _write_manifest(self, record: Dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._manifest_lock, open(os.path.join(self.output_dir, MANIFEST_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    # ---------- Loop ----------
+
+    def _start_observer(self):
+        if Observer is None:
+            return None
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.wakeup.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.input_dir, recursive=True)
+        observer.start()
+        return observer
+
+    def run(self):
+        os.makedirs(self.input_dir, exist_ok=True)
+        observer = self._start_observer()
+        mode = "watchdog" if observer else f"polling كل {self.poll:g}ث"
+        print(f"👀 Watching {self.input_dir} ({mode}) → {self.output_dir} | workers={self.workers} max_queue={self.max_queue}")
+        try:
+            while not self.stopping.is_set():
+                self.scan()
+                # حتى مع watchdog: لفة كل poll عشان فحص الثبات (الملف ممكن يخلص كتابة من غير event جديد)
+                self.wakeup.wait(self.poll)
+                self.wakeup.clear()
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+            print("⏳ مستني الملفات الشغالة تخلص...")
+            self.executor.shutdown(wait=True)
+
+    def stop(self, *_):
+        self.stopping.set()
+        self.wakeup.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="معالجة الفيديوهات تلقائياً من فولدر إدخال بالقوالب")
+    parser.add_argument("--input", required=True, help="فولدر الإدخال")
+    parser.add_argument("--output", help="مجلد الإخراج (افتراضي OUTPUT_DIR)")
+    parser.add_argument("--rules", help="ملف JSON: [{\"pattern\": \"*.mov\", \"template\": \"اسم القالب\", \"music\": \"اختياري\"}]")
+    parser.add_argument("--music", help="موسيقى القوالب اللي فيها أمر music (القاعدة ممكن تحدد \"music\" خاص بيها)")
+    parser.add_argument("--workers", type=int, help="عدد الفيديوهات المتوازية")
+    parser.add_argument("--max-queue", type=int, help="أقصى عدد ملفات شغالة/مستنية (backpressure)")
+    parser.add_argument("--poll", type=float, default=2.0, help="ثواني بين كل لفة على الفولدر")
+    args = parser.parse_args(argv)
+
+    watcher = WatchFolder(args.input, args.output, load_rules(args.rules), args.workers, args.max_queue, args.poll,
+                           args.music)
+    signal.signal(signal.SIGINT, watcher.stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, watcher.stop)
+    watcher.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())